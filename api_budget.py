@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Google Places call budget for Tradepro Finder Toronto.
+
+APIMonitor could count the month's calls, but only with a scan of api_usage,
+and nothing on the search path consulted it or logged a call, so a refresh
+storm could spend the month's quota before anyone noticed. Every Places call
+now goes through a budget scheduler:
+
+1. APIMonitor keeps a counter per (month, API) in api_usage_monthly, bumped
+   with every logged call, so the month's usage is a primary key lookup
+2. Each worker holds the rest of the month's budget in memory, seeded from
+   that counter and re-read every PLACES_BUDGET_SYNC_INTERVAL seconds so calls
+   made by other workers are counted too
+3. User-facing searches may spend the whole budget; background work (stale
+   refreshes, next-page prefetches, place details) draws from a token bucket
+   refilled at the pace that spreads the budget over the rest of the month,
+   and stops once only PLACES_BUDGET_BACKGROUND_RESERVE of it is left
+4. Once only PLACES_BUDGET_CACHE_ONLY of the budget is left, searches are
+   answered from cache alone, however old, until the month rolls over
+
+A budget of 0 (the default) never refuses a call; calls are still logged.
+
+Usage:
+    python api_budget.py status    Show this month's Places usage and budget mode
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+API_NAME = 'google_places'
+# Places calls allowed per calendar month (UTC); 0 means unlimited
+PLACES_MONTHLY_BUDGET = int(os.getenv('PLACES_MONTHLY_BUDGET', 0))
+# Share of the budget kept for user-facing searches
+BACKGROUND_RESERVE = float(os.getenv('PLACES_BUDGET_BACKGROUND_RESERVE', 0.2))
+# Share of the budget left when searches stop calling Google altogether
+CACHE_ONLY_RESERVE = float(os.getenv('PLACES_BUDGET_CACHE_ONLY', 0.02))
+# Background calls that may be made back to back before pacing applies
+BACKGROUND_BURST = float(os.getenv('PLACES_BUDGET_BACKGROUND_BURST', 20))
+SYNC_INTERVAL = float(os.getenv('PLACES_BUDGET_SYNC_INTERVAL', 30))
+
+USER = 'user'
+BACKGROUND = 'background'
+
+
+class BudgetExhaustedError(Exception):
+    """Raised instead of calling Google when the budget refuses the call."""
+
+
+def utc_now() -> datetime:
+    """Current UTC time without tzinfo, the form api_usage timestamps are written in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def seconds_left_in_month(now: Optional[datetime] = None) -> float:
+    """Seconds until the next calendar month starts (UTC)."""
+    now = now or utc_now()
+    if now.month == 12:
+        next_month = datetime(now.year + 1, 1, 1)
+    else:
+        next_month = datetime(now.year, now.month + 1, 1)
+    return max((next_month - now).total_seconds(), 1.0)
+
+
+class BudgetScheduler:
+    """Monthly call budget with user-facing calls prioritized over background work."""
+
+    def __init__(self, monitor=None, monthly_budget: int = PLACES_MONTHLY_BUDGET,
+                 background_reserve: float = BACKGROUND_RESERVE, cache_only_reserve: float = CACHE_ONLY_RESERVE,
+                 background_burst: float = BACKGROUND_BURST, sync_interval: float = SYNC_INTERVAL):
+        """Initialize the scheduler.
+
+        Args:
+            monitor: APIMonitor that logs calls and holds the monthly counters (None counts in memory only)
+            monthly_budget: Calls allowed per month; 0 means unlimited
+            background_reserve: Share of the budget background calls may not touch
+            cache_only_reserve: Share of the budget left when user calls are refused too
+            background_burst: Capacity of the background token bucket
+            sync_interval: Seconds between re-reads of the monthly counter
+        """
+        self.monitor = monitor
+        self.monthly_budget = monthly_budget
+        self.background_reserve = background_reserve
+        self.cache_only_reserve = cache_only_reserve
+        self.background_burst = background_burst
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._month: Optional[str] = None
+        self._used = 0
+        self._next_sync = 0.0
+        self._tokens = background_burst
+        self._refilled_at = time.monotonic()
+        self._mode = 'normal'
+
+        self.granted = {USER: 0, BACKGROUND: 0}
+        self.refused = {USER: 0, BACKGROUND: 0}
+        self.syncs = 0
+
+    def configure(self, monitor=None, monthly_budget: Optional[int] = None) -> None:
+        """Attach the usage monitor and set the monthly budget (e.g. at app start)."""
+        with self._lock:
+            if monitor is not None:
+                self.monitor = monitor
+            if monthly_budget is not None:
+                self.monthly_budget = monthly_budget
+            self._next_sync = 0.0
+
+    @property
+    def limited(self) -> bool:
+        return self.monthly_budget > 0
+
+    def _sync(self, now: float) -> None:
+        """Reseed usage from the monthly counter when it is due or the month changed (lock held)."""
+        month = utc_now().strftime('%Y-%m')
+        if month != self._month:
+            self._month = month
+            self._used = 0
+            self._tokens = self.background_burst
+            self._next_sync = 0.0
+        if self.monitor is None or now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        try:
+            usage = self.monitor.get_monthly_usage(API_NAME)
+        except Exception as e:
+            logger.error(f"Error reading Places usage: {str(e)}")
+            return
+        # The monitor counts calls granted here but not yet written out, so this is the whole month
+        self._used = usage["total_requests"]
+        self.syncs += 1
+
+    def _remaining(self) -> int:
+        return self.monthly_budget - self._used
+
+    def _refill(self, now: float) -> None:
+        """Top up the background bucket at the pace that lasts until the month ends (lock held)."""
+        spendable = self._remaining() - self.monthly_budget * self.background_reserve
+        rate = max(spendable, 0) / seconds_left_in_month()
+        self._tokens = min(self.background_burst, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _current_mode(self) -> str:
+        remaining = self._remaining()
+        if remaining <= max(self.monthly_budget * self.cache_only_reserve, 0):
+            return 'cache-only'
+        if remaining <= self.monthly_budget * self.background_reserve:
+            return 'user-only'
+        return 'normal'
+
+    def _allows(self, priority: str, now: float) -> bool:
+        """Whether a call of this priority may go out now (lock held)."""
+        self._sync(now)
+        if not self.limited:
+            return True
+        self._refill(now)
+        mode = self._current_mode()
+        if mode != self._mode:
+            logger.warning(f"Places budget mode {self._mode} -> {mode}: "
+                           f"{self._used} of {self.monthly_budget} calls used this month")
+            self._mode = mode
+        if mode == 'cache-only':
+            return False
+        if priority == BACKGROUND:
+            return mode == 'normal' and self._tokens >= 1
+        return True
+
+    def available(self, priority: str = USER) -> bool:
+        """Whether a call of this priority would be allowed, without taking it."""
+        with self._lock:
+            return self._allows(priority, time.monotonic())
+
+    def acquire(self, priority: str = USER) -> bool:
+        """Take budget for one call.
+
+        Args:
+            priority: USER for searches a visitor is waiting on, BACKGROUND for everything else
+
+        Returns:
+            True if the call may be made; it must then be reported with record() or refund()
+        """
+        with self._lock:
+            if not self._allows(priority, time.monotonic()):
+                self.refused[priority] += 1
+                return False
+            if self.limited and priority == BACKGROUND:
+                self._tokens -= 1
+            self._used += 1
+            if self.monitor is not None:
+                self.monitor.reserve(API_NAME)
+            self.granted[priority] += 1
+            return True
+
+    def refund(self) -> None:
+        """Give back a call that was granted but never sent (e.g. the circuit was open)."""
+        with self._lock:
+            self._used -= 1
+            if self.monitor is not None:
+                self.monitor.release(API_NAME)
+
+    def record(self, endpoint: str, response_time: float, status_code: Optional[int] = None,
+               error: Optional[str] = None) -> None:
+        """Log a granted call with the monitor.
+
+        Args:
+            endpoint: Places endpoint that was called
+            response_time: Call duration in milliseconds
+            status_code: HTTP status, if a response arrived
+            error: Error message if the call failed
+        """
+        if self.monitor is not None:
+            self.monitor.log_request(API_NAME, endpoint, int(response_time), status_code, error, reserved=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the month's usage, mode and grant/refusal counters."""
+        with self._lock:
+            self._allows(USER, time.monotonic())
+            return {
+                "month": self._month,
+                "monthly_budget": self.monthly_budget,
+                "used": self._used,
+                "remaining": self._remaining() if self.limited else None,
+                "mode": self._mode,
+                "background_tokens": round(self._tokens, 2),
+                "granted": dict(self.granted),
+                "refused": dict(self.refused),
+                "syncs": self.syncs
+            }
+
+
+# Shared budget for Google Places calls
+places_budget = BudgetScheduler()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) != 2 or sys.argv[1].lower() != 'status':
+        print("Usage:")
+        print("  Show Places usage and mode:   python api_budget.py status")
+        sys.exit(1)
+
+    from api_monitor import APIMonitor
+    places_budget.configure(monitor=APIMonitor(monthly_limit=PLACES_MONTHLY_BUDGET))
+    print(json.dumps(places_budget.stats(), indent=2))
@@ -1,21 +1,97 @@
-"""API Usage Monitoring and Rate Limiting Module."""
+"""API Usage Monitoring and Rate Limiting Module.
+
+Every call is written to the api_usage log, and analytics used to group that
+whole log by day on each request. Calls are now recorded like this:
+
+1. log_request() only queues the row; a write-behind writer inserts queued
+   rows in batches, one transaction per flush
+2. The same transaction adds each batch to rollup tables: per-minute and
+   per-day counters per endpoint (requests, errors, total and peak latency),
+   a per-day latency histogram per endpoint and the per-month counter the
+   Places budget reads (see api_budget.py)
+3. Analytics, latency percentiles (p50/p95/p99) and monthly usage read the
+   rollups, so their cost does not grow with the history; analytics write out
+   queued rows first, while monthly usage (read by the budget on the request
+   path) adds the calls it keeps count of instead: those the budget has
+   reserved but not yet logged, and those queued or being written
+4. Raw rows are kept for API_USAGE_RAW_RETENTION_DAYS and per-minute rollups
+   for API_USAGE_MINUTE_RETENTION_DAYS; daily and monthly rollups are kept
+"""
 import os
 import json
-from datetime import datetime, timedelta
+import bisect
+import itertools
+import threading
+from datetime import timedelta
 import logging
+import db_pool
+from api_budget import utc_now
 from database_manager import DatabaseManager, SQLiteDatabase
+from write_behind import WriteBehindQueue
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+RAW_RETENTION_DAYS = int(os.getenv('API_USAGE_RAW_RETENTION_DAYS', 30))
+MINUTE_RETENTION_DAYS = int(os.getenv('API_USAGE_MINUTE_RETENTION_DAYS', 7))
+FLUSH_INTERVAL_MS = float(os.getenv('API_USAGE_FLUSH_MS', 1000))
+PRUNE_INTERVAL = timedelta(hours=1)
+# Upper bounds (ms) of the latency histogram buckets; slower calls share an overflow bucket
+LATENCY_BUCKETS_MS = (10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+PERCENTILES = (50, 95, 99)
+
+
+def latency_bucket(response_time):
+    """Index of the histogram bucket holding a response time in ms."""
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, response_time or 0)
+
+
+def latency_percentiles(histogram, max_ms, percentiles=PERCENTILES):
+    """Estimate latency percentiles from a bucket histogram.
+
+    Args:
+        histogram: Request count per bucket index
+        max_ms: Slowest response time seen, the upper end of the last used bucket
+        percentiles: Percentiles to estimate
+
+    Returns:
+        {"p50": ms, ...}, interpolated linearly within the bucket holding each rank
+    """
+    total = sum(histogram.values())
+    estimates = {}
+    for percentile in percentiles:
+        if not total:
+            estimates[f"p{percentile}"] = None
+            continue
+        rank = total * percentile / 100
+        seen = 0
+        for bucket in sorted(histogram):
+            count = histogram[bucket]
+            if seen + count >= rank:
+                lower = LATENCY_BUCKETS_MS[bucket - 1] if bucket else 0
+                upper = min(LATENCY_BUCKETS_MS[bucket] if bucket < len(LATENCY_BUCKETS_MS) else max_ms, max_ms)
+                upper = max(upper, lower)
+                estimates[f"p{percentile}"] = round(lower + (upper - lower) * (rank - seen) / count, 1)
+                break
+            seen += count
+    return estimates
+
+
 class APIMonitor:
-    def __init__(self, monthly_limit=200):
+    def __init__(self, monthly_limit=200, db_path='api_usage.db', flush_interval_ms=FLUSH_INTERVAL_MS):
         """Initialize API Monitor with monthly limit."""
         self.monthly_limit = monthly_limit
         self.db = DatabaseManager()
-        self.api_db = SQLiteDatabase('api_usage.db')
+        self.api_db = SQLiteDatabase(db_path)
+        self._sequence = itertools.count()
+        self._next_prune = utc_now()
+        # Requests per API reserved, queued or being written, not yet in api_usage_monthly
+        self._unwritten = {}
+        self._unwritten_lock = threading.Lock()
         self._init_tables()
-        
+        self.writer = WriteBehindQueue(db_path, self._write, on_written=self._written,
+                                       flush_interval_ms=flush_interval_ms, max_pending=10000)
+    
     def _init_tables(self):
         self.api_db.execute('''
             CREATE TABLE IF NOT EXISTS api_usage (
@@ -28,36 +104,179 @@ class APIMonitor:
                 error TEXT
             )
         ''')
+        
+        with db_pool.connection(self.api_db.db_path) as conn:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            
+            # Retention deletes and backfills read the log by time
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_api_usage_request_time ON api_usage (request_time)')
+            
+            # Per-month request counters, so the month's usage is a key lookup rather than a scan
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS api_usage_monthly (
+                    month TEXT NOT NULL,
+                    api_name TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (month, api_name)
+                ) WITHOUT ROWID
+            ''')
+            if 'api_usage_monthly' not in existing:
+                conn.execute('''
+                    INSERT INTO api_usage_monthly (month, api_name, requests)
+                    SELECT strftime('%Y-%m', request_time), COALESCE(api_name, ''), COUNT(*)
+                    FROM api_usage WHERE request_time IS NOT NULL
+                    GROUP BY 1, 2
+                ''')
+            
+            # Per-minute and per-day counters and the per-day latency histogram
+            for table, period in (('api_usage_minute', 'minute'), ('api_usage_daily', 'day')):
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {period} TEXT NOT NULL,
+                        api_name TEXT NOT NULL,
+                        endpoint TEXT NOT NULL,
+                        requests INTEGER NOT NULL DEFAULT 0,
+                        errors INTEGER NOT NULL DEFAULT 0,
+                        total_ms INTEGER NOT NULL DEFAULT 0,
+                        max_ms INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY ({period}, api_name, endpoint)
+                    ) WITHOUT ROWID
+                ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS api_latency_daily (
+                    day TEXT NOT NULL,
+                    api_name TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, api_name, endpoint, bucket)
+                ) WITHOUT ROWID
+            ''')
+            if 'api_usage_daily' not in existing:
+                rows = conn.execute('''
+                    SELECT api_name, endpoint, request_time, response_time, status_code, error
+                    FROM api_usage WHERE request_time IS NOT NULL
+                ''').fetchall()
+                self._roll_up(conn, rows, months=False)
+                if rows:
+                    logger.info(f"Rolled up {len(rows)} logged API requests")
     
-    def log_request(self, api_name, endpoint, response_time, status_code, error=None):
-        """Log an API request with its details."""
-        try:
-            self.api_db.insert('api_usage', {
-                'api_name': api_name,
-                'endpoint': endpoint,
-                'request_time': datetime.utcnow().isoformat(),
-                'response_time': response_time,
-                'status_code': status_code,
-                'error': error
-            })
-            logger.info(f"Logged API request: {api_name} - {endpoint}")
-        except Exception as e:
-            logger.error(f"Failed to log API request: {str(e)}")
+    def _roll_up(self, conn, rows, months=True):
+        """Add logged requests to the rollup tables."""
+        minutes, days, buckets, monthly = {}, {}, {}, {}
+        for api_name, endpoint, request_time, response_time, status_code, error in rows:
+            api_name, endpoint = api_name or '', endpoint or ''
+            stamp = str(request_time).replace(' ', 'T')
+            elapsed = int(response_time or 0)
+            failed = int(bool(error) or (status_code or 0) >= 400)
+            for totals, key in ((minutes, (stamp[:16], api_name, endpoint)), (days, (stamp[:10], api_name, endpoint))):
+                requests, errors, total_ms, max_ms = totals.get(key, (0, 0, 0, 0))
+                totals[key] = (requests + 1, errors + failed, total_ms + elapsed, max(max_ms, elapsed))
+            bucket = (stamp[:10], api_name, endpoint, latency_bucket(elapsed))
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+            monthly[(stamp[:7], api_name)] = monthly.get((stamp[:7], api_name), 0) + 1
+        
+        for table, period, totals in (('api_usage_minute', 'minute', minutes), ('api_usage_daily', 'day', days)):
+            conn.executemany(f'''
+                INSERT INTO {table} ({period}, api_name, endpoint, requests, errors, total_ms, max_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT ({period}, api_name, endpoint) DO UPDATE SET
+                    requests = requests + excluded.requests, errors = errors + excluded.errors,
+                    total_ms = total_ms + excluded.total_ms, max_ms = MAX(max_ms, excluded.max_ms)
+            ''', [key + value for key, value in totals.items()])
+        conn.executemany('''
+            INSERT INTO api_latency_daily (day, api_name, endpoint, bucket, requests) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (day, api_name, endpoint, bucket) DO UPDATE SET requests = requests + excluded.requests
+        ''', [key + (count,) for key, count in buckets.items()])
+        if months:
+            conn.executemany('''
+                INSERT INTO api_usage_monthly (month, api_name, requests) VALUES (?, ?, ?)
+                ON CONFLICT (month, api_name) DO UPDATE SET requests = requests + excluded.requests
+            ''', [key + (count,) for key, count in monthly.items()])
+    
+    def _write(self, conn, rows):
+        """Write a batch of queued requests and their rollups (runs on the writer thread)."""
+        conn.executemany('''
+            INSERT INTO api_usage (api_name, endpoint, request_time, response_time, status_code, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        self._roll_up(conn, rows)
+        if utc_now() >= self._next_prune:
+            self._next_prune = utc_now() + PRUNE_INTERVAL
+            self._prune(conn)
+    
+    def _prune(self, conn):
+        """Delete raw rows and per-minute rollups past their retention."""
+        now = utc_now()
+        raw = conn.execute(
+            'DELETE FROM api_usage WHERE request_time < ?',
+            ((now - timedelta(days=RAW_RETENTION_DAYS)).isoformat(),)
+        ).rowcount
+        minutes = conn.execute(
+            'DELETE FROM api_usage_minute WHERE minute < ?',
+            ((now - timedelta(days=MINUTE_RETENTION_DAYS)).isoformat()[:16],)
+        ).rowcount
+        if raw or minutes:
+            logger.info(f"Pruned {raw} logged API requests and {minutes} per-minute rollups")
+        return {"requests": raw, "minutes": minutes}
+    
+    def prune(self):
+        """Apply retention now; returns the number of rows deleted per table."""
+        self.writer.flush()
+        with db_pool.connection(self.api_db.db_path) as conn:
+            return self._prune(conn)
     
-    def get_monthly_usage(self):
-        """Get current month's API usage statistics."""
-        current_month = datetime.utcnow().strftime('%Y-%m')
+    def _count_unwritten(self, api_name, change):
+        with self._unwritten_lock:
+            self._unwritten[api_name or ''] = self._unwritten.get(api_name or '', 0) + change
+
+    def _written(self, rows):
+        """Stop counting a batch as unwritten once its transaction has ended."""
+        for row in rows:
+            self._count_unwritten(row[0], -1)
+
+    def reserve(self, api_name):
+        """Count a call that is about to be made, before it is logged (see api_budget.py)."""
+        self._count_unwritten(api_name, 1)
+
+    def release(self, api_name):
+        """Stop counting a reserved call that was never made."""
+        self._count_unwritten(api_name, -1)
+
+    def log_request(self, api_name, endpoint, response_time, status_code, error=None, reserved=False):
+        """Log an API request with its details; reserved calls are already counted."""
+        if not reserved:
+            self._count_unwritten(api_name, 1)
+        queued = self.writer.put(next(self._sequence), (
+            api_name, endpoint, utc_now().isoformat(), response_time, status_code, error
+        ))
+        if queued:
+            logger.debug(f"Logged API request: {api_name} - {endpoint}")
+        else:
+            self._count_unwritten(api_name, -1)
+            logger.error(f"Failed to log API request: {api_name} - {endpoint}")
+    
+    def get_monthly_usage(self, api_name=None):
+        """Get current month's API usage statistics, for one API or all of them."""
+        current_month = utc_now().strftime('%Y-%m')
         
         try:
-            # Get total requests this month
-            result = self.api_db.fetch_one('''
-                SELECT COUNT(*) 
-                FROM api_usage 
-                WHERE strftime('%Y-%m', request_time) = ?
-            ''', (current_month,))
+            # Get total requests this month from the monthly counters
+            if api_name is None:
+                result = self.api_db.fetch_one('''
+                    SELECT COALESCE(SUM(requests), 0) FROM api_usage_monthly WHERE month = ?
+                ''', (current_month,))
+            else:
+                result = self.api_db.fetch_one('''
+                    SELECT requests FROM api_usage_monthly WHERE month = ? AND api_name = ?
+                ''', (current_month, api_name))
             
             total_requests = result[0] if result else 0
             
+            # Count queued requests too, without writing them out on the caller's thread
+            with self._unwritten_lock:
+                total_requests += sum(self._unwritten.values()) if api_name is None else self._unwritten.get(api_name, 0)
+            
             # Calculate remaining quota
             remaining = self.monthly_limit - total_requests
             
@@ -65,7 +284,7 @@ class APIMonitor:
                 "month": current_month,
                 "total_requests": total_requests,
                 "remaining_quota": remaining,
-                "usage_percent": round((total_requests / self.monthly_limit * 100), 2)
+                "usage_percent": round((total_requests / self.monthly_limit * 100), 2) if self.monthly_limit else 0
             }
         except Exception as e:
             logger.error(f"Failed to get monthly usage: {str(e)}")
@@ -87,27 +306,25 @@ class APIMonitor:
     
     def get_usage_analytics(self, days=30):
         """Get detailed API usage analytics for the past N days."""
-        start_date = datetime.utcnow() - timedelta(days=days)
+        start_day = (utc_now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
         try:
-            results = self.api_db.execute('''
-                SELECT 
-                    STRFTIME('%Y-%m-%d', request_time) AS date,
-                    COUNT(*) AS count,
-                    AVG(response_time) AS avg_response_time
-                FROM api_usage
-                WHERE request_time >= ?
-                GROUP BY date
-                ORDER BY date ASC
-            ''', (start_date,)).fetchall()
+            self.writer.flush()
+            results = self.api_db.fetch_all('''
+                SELECT day, SUM(requests), SUM(errors), SUM(total_ms)
+                FROM api_usage_daily
+                WHERE day >= ?
+                GROUP BY day
+                ORDER BY day ASC
+            ''', (start_day,))
             
             # Format results
             analytics = {}
-            for result in results:
-                date = result[0]
-                analytics[date] = {
-                    "api_requests": result[1],
-                    "avg_response_time": round(result[2], 3)
+            for day, requests, errors, total_ms in results:
+                analytics[day] = {
+                    "api_requests": requests,
+                    "errors": errors,
+                    "avg_response_time": round(total_ms / requests, 3) if requests else 0
                 }
             
             return analytics
@@ -115,6 +332,74 @@ class APIMonitor:
             logger.error(f"Failed to get usage analytics: {str(e)}")
             return None
     
+    def get_recent_usage(self, minutes=60):
+        """Get per-minute API usage for the past N minutes."""
+        start_minute = (utc_now() - timedelta(minutes=minutes)).isoformat()[:16]
+        
+        try:
+            self.writer.flush()
+            results = self.api_db.fetch_all('''
+                SELECT minute, SUM(requests), SUM(errors), SUM(total_ms)
+                FROM api_usage_minute
+                WHERE minute >= ?
+                GROUP BY minute
+                ORDER BY minute ASC
+            ''', (start_minute,))
+            return {
+                minute: {
+                    "api_requests": requests,
+                    "errors": errors,
+                    "avg_response_time": round(total_ms / requests, 3) if requests else 0
+                }
+                for minute, requests, errors, total_ms in results
+            }
+        except Exception as e:
+            logger.error(f"Failed to get recent usage: {str(e)}")
+            return None
+    
+    def get_latency_percentiles(self, days=30, api_name=None):
+        """Get request counts and p50/p95/p99 latency per endpoint for the past N days."""
+        start_day = (utc_now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        api_filter = '' if api_name is None else ' AND api_name = ?'
+        params = (start_day,) if api_name is None else (start_day, api_name)
+        
+        try:
+            self.writer.flush()
+            totals = self.api_db.fetch_all(f'''
+                SELECT api_name, endpoint, SUM(requests), SUM(errors), SUM(total_ms), MAX(max_ms)
+                FROM api_usage_daily
+                WHERE day >= ?{api_filter}
+                GROUP BY api_name, endpoint
+            ''', params)
+            histograms = {}
+            for name, endpoint, bucket, requests in self.api_db.fetch_all(f'''
+                SELECT api_name, endpoint, bucket, SUM(requests)
+                FROM api_latency_daily
+                WHERE day >= ?{api_filter}
+                GROUP BY api_name, endpoint, bucket
+            ''', params):
+                histograms.setdefault((name, endpoint), {})[bucket] = requests
+            
+            endpoints = []
+            for name, endpoint, requests, errors, total_ms, max_ms in totals:
+                endpoints.append(dict({
+                    "api_name": name,
+                    "endpoint": endpoint,
+                    "requests": requests,
+                    "errors": errors,
+                    "avg_response_time": round(total_ms / requests, 3) if requests else 0,
+                    "max_response_time": max_ms
+                }, **latency_percentiles(histograms.get((name, endpoint), {}), max_ms)))
+            endpoints.sort(key=lambda entry: entry["requests"], reverse=True)
+            return endpoints
+        except Exception as e:
+            logger.error(f"Failed to get latency percentiles: {str(e)}")
+            return None
+    
+    def stats(self):
+        """Return the request log writer's queue counters."""
+        return self.writer.stats()
+    
     def export_monthly_report(self, output_dir="reports"):
         """Export monthly API usage report to JSON file."""
         try:
@@ -126,7 +411,8 @@ class APIMonitor:
             report = {
                 "monthly_summary": usage,
                 "daily_analytics": analytics,
-                "generated_at": datetime.utcnow().isoformat()
+                "latency": self.get_latency_percentiles(),
+                "generated_at": utc_now().isoformat()
             }
             
             filename = f"api_usage_{usage['month']}.json"
@@ -4,6 +4,7 @@ Flask application for Tradepro Finder Toronto.
 
 import os
 import sys
+import atexit
 import logging
 from datetime import datetime
 from flask import Flask, request, redirect
@@ -15,6 +16,7 @@ from config import config
 from routes import main as main_blueprint
 from local_cache import LocalCache
 from api_monitor import APIMonitor
+from api_budget import PLACES_MONTHLY_BUDGET, places_budget
 from database_manager import DatabaseManager
 from init_db import init_service_providers_db, init_search_cache_db
 from security import init_security
@@ -22,6 +24,13 @@ from error_handlers import init_error_handling
 from rollback_manager import RollbackManager
 from logging.handlers import RotatingFileHandler
 import sqlite3
+import db_pool
+from schema import migrate
+from page_cache import service_pages
+from http_client import places_client
+from cache_backend import shared_cache
+from search_cache import search_cache_writer, ensure_table as ensure_search_cache_table
+import places_replay
 # Import Google Places API and Search Service
 from google_places_api import GooglePlacesAPI
 from search_service import SearchService
@@ -53,58 +62,10 @@ def init_service_providers_db():
     conn = None
     try:
         conn = sqlite3.connect('service_providers.db')
-        cursor = conn.cursor()
-        
-        # Create service providers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS service_providers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                location TEXT NOT NULL,
-                address TEXT,
-                phone TEXT,
-                email TEXT,
-                website TEXT,
-                description TEXT,
-                rating REAL,
-                reviews INTEGER,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Create quote requests table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quote_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                service TEXT NOT NULL,
-                location TEXT NOT NULL,
-                description TEXT,
-                timestamp TEXT NOT NULL
-            )
-        ''')
         
-        # Create professional registrations table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS professional_registrations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                company TEXT NOT NULL,
-                service TEXT NOT NULL,
-                location TEXT NOT NULL,
-                description TEXT,
-                timestamp TEXT NOT NULL,
-                status TEXT NOT NULL
-            )
-        ''')
+        # Create or upgrade the provider, quote and registration tables
+        migrate(conn)
         
-        conn.commit()
         conn.close()
         print("Service providers database initialized successfully")
     except Exception as e:
@@ -118,19 +79,9 @@ def init_search_cache_db():
     conn = None
     try:
         conn = sqlite3.connect('data/search_cache.db')
-        cursor = conn.cursor()
         
-        # Create search cache table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS search_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service TEXT NOT NULL,
-                location TEXT NOT NULL,
-                results TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                UNIQUE(service, location)
-            )
-        ''')
+        # Create (or rebuild) the search cache table
+        ensure_search_cache_table(conn)
         
         conn.commit()
         conn.close()
@@ -182,10 +133,36 @@ def create_app(config_name='development'):
     # Load configuration
     app.config.from_object(config[config_name])
     
+    # Size the SQLite connection pools before anything opens a connection
+    db_pool.configure(
+        max_size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT']
+    )
+    
     # Initialize databases
     init_service_providers_db()
     init_search_cache_db()
     
+    # Apply rendered page cache limits
+    service_pages.max_bytes = app.config['PAGE_CACHE_MAX_BYTES']
+    service_pages.ttl = app.config['PAGE_CACHE_TTL']
+    service_pages.compress = app.config['PAGE_CACHE_GZIP']
+    
+    # Bound Google Places calls by the configured deadline and retry budget
+    places_client.configure(
+        timeout=app.config['API_TIMEOUT'],
+        max_retries=app.config['MAX_RETRIES']
+    )
+    # Serve Places calls from a recording instead of Google (load tests, offline benchmarks)
+    places_replay.install_from_env()
+    
+    # Share cached responses between instances (Redis in production, SQLite only otherwise)
+    shared_cache.configure(
+        cache_type=app.config['CACHE_TYPE'],
+        redis_url=app.config['CACHE_REDIS_URL'],
+        default_timeout=app.config['CACHE_DEFAULT_TIMEOUT']
+    )
+    
     # Initialize extensions
     init_security(app)
     init_error_handling(app)
@@ -200,15 +177,21 @@ def create_app(config_name='development'):
     
     # Initialize cache
     cache = LocalCache()
+    app.local_cache = cache
     
-    # Initialize API monitor
-    api_monitor = APIMonitor()
+    # Initialize API monitor and take every Google Places call from its monthly budget
+    api_monitor = APIMonitor(monthly_limit=PLACES_MONTHLY_BUDGET)
+    places_budget.configure(monitor=api_monitor, monthly_budget=PLACES_MONTHLY_BUDGET)
+    atexit.register(api_monitor.writer.drain)
     
     # Initialize Google Places API and search service
-    google_api_key = os.environ.get('GOOGLE_PLACES_API_KEY')
+    google_api_key = os.environ.get('GOOGLE_PLACES_API_KEY') or ('replay' if places_replay.active else None)
     app.google_places = GooglePlacesAPI(api_key=google_api_key)
     app.search_service = SearchService(db_manager=db, api_key=google_api_key)
     
+    # Write out queued search cache rows when the worker shuts down
+    atexit.register(search_cache_writer.drain)
+    
     # Register blueprint
     app.register_blueprint(main_blueprint)
 
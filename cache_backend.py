@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Shared cache backend for Tradepro Finder Toronto.
+
+GooglePlacesAPI, the place details cache and LocalCache keep their data in
+SQLite files that belong to one instance, so every Railway instance had to
+warm its own copy. This module lets them share one cache in front of SQLite:
+
+1. CacheBackend is the interface: get_many/set_many/delete by namespace and
+   key, with a TTL per write (get and set are single-key shortcuts); the base
+   class stores nothing, leaving each component on its own SQLite store
+2. RedisBackend reads many keys in one MGET round trip, writes through a
+   pipeline with SET PX so expiry is enforced by the server, and stores values
+   with serialization (json+zlib unless CACHE_SERIALIZER says otherwise)
+3. CACHE_TYPE = 'redis' with CACHE_REDIS_URL selects Redis; any other type, a
+   missing redis package or no URL falls back to SQLite only
+4. Redis errors never fail a request: the backend answers with misses, skips
+   Redis for CACHE_REDIS_RETRY seconds, and callers carry on with SQLite
+
+Usage:
+    python cache_backend.py ping [redis_url]    Check Redis and show counters
+"""
+
+import os
+import sys
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional
+import serialization
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('CACHE_REDIS_URL') or os.getenv('REDIS_URL')
+DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 600))
+SOCKET_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT', 0.25))
+RETRY_AFTER = float(os.getenv('CACHE_REDIS_RETRY', 30))
+KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'tradepro:')
+
+
+class CacheBackend:
+    """A backend that shares nothing; every component reads and writes only its own SQLite store."""
+
+    name = 'sqlite'
+    shared = False
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the cached values found for the given keys.
+
+        Args:
+            namespace: Component the keys belong to (e.g. 'places')
+            keys: Keys to look up
+
+        Returns:
+            Dictionary of key -> value for the keys that were found
+        """
+        return {}
+
+    def set_many(self, namespace: str, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Store values that expire after ttl seconds (the default timeout if None)."""
+
+    def delete(self, namespace: str, *keys: str) -> None:
+        """Remove keys from the cache."""
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return one cached value, or None."""
+        return self.get_many(namespace, [key]).get(key)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store one value that expires after ttl seconds."""
+        self.set_many(namespace, {key: value}, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the backend name and its counters."""
+        return {"backend": self.name, "shared": self.shared}
+
+
+class RedisBackend(CacheBackend):
+    """Cache shared by every worker and instance through one Redis server."""
+
+    name = 'redis'
+    shared = True
+
+    def __init__(self, client, prefix: str = KEY_PREFIX, default_timeout: float = DEFAULT_TIMEOUT,
+                 retry_after: float = RETRY_AFTER, fmt: Optional[str] = None):
+        """Initialize the backend.
+
+        Args:
+            client: redis.Redis (or compatible) client
+            prefix: Prefix for every key, so several apps can share one server
+            default_timeout: TTL in seconds for writes that do not give one
+            retry_after: Seconds to skip Redis after a connection error
+            fmt: Serialization format for values (defaults to CACHE_SERIALIZER)
+        """
+        self.client = client
+        self.prefix = prefix
+        self.default_timeout = default_timeout
+        self.retry_after = retry_after
+        self.fmt = fmt
+        self._down_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, socket_timeout: float = SOCKET_TIMEOUT, **kwargs) -> 'RedisBackend':
+        """Create a backend for a redis:// or rediss:// URL.
+
+        Args:
+            url: Redis server URL
+            socket_timeout: Connect and read timeout per command, in seconds
+            **kwargs: Passed on to RedisBackend
+        """
+        client = redis.Redis.from_url(url, socket_timeout=socket_timeout,
+                                      socket_connect_timeout=socket_timeout, health_check_interval=30)
+        return cls(client, **kwargs)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f'{self.prefix}{namespace}:{key}'
+
+    @property
+    def available(self) -> bool:
+        """False while Redis is being skipped after an error."""
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        if redis is not None and isinstance(error, redis.RedisError):
+            self._down_until = time.monotonic() + self.retry_after
+            logger.warning(f"[REDIS] {action} failed, using SQLite only for {self.retry_after:.0f}s: {str(error)}")
+        else:
+            logger.error(f"[REDIS] {action} failed: {str(error)}")
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        if not keys or not self.available:
+            return {}
+        try:
+            values = self.client.mget([self._key(namespace, key) for key in keys])
+        except Exception as e:
+            self._failed('read', e)
+            return {}
+
+        found = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            try:
+                found[key] = serialization.loads(value)
+            except Exception as e:
+                logger.warning(f"[REDIS] Ignoring undecodable value for {namespace}:{key}: {str(e)}")
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, namespace: str, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items or not self.available:
+            return
+        ttl_ms = int((self.default_timeout if ttl is None else ttl) * 1000)
+        if ttl_ms <= 0:
+            # Already expired; make sure no older copy keeps being served
+            self.delete(namespace, *items)
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(self._key(namespace, key), serialization.dumps(value, self.fmt), px=ttl_ms)
+            pipe.execute()
+            self.writes += len(items)
+        except Exception as e:
+            self._failed('write', e)
+
+    def delete(self, namespace: str, *keys: str) -> None:
+        if not keys or not self.available:
+            return
+        try:
+            self.client.delete(*(self._key(namespace, key) for key in keys))
+        except Exception as e:
+            self._failed('delete', e)
+
+    def ping(self) -> bool:
+        """Return True if the server answers."""
+        try:
+            return bool(self.client.ping())
+        except Exception as e:
+            self._failed('ping', e)
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            super().stats(),
+            available=self.available,
+            hits=self.hits,
+            misses=self.misses,
+            writes=self.writes,
+            errors=self.errors
+        )
+
+
+class SharedCache:
+    """Process-wide handle on the configured backend; configure() swaps the backend in place."""
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend or CacheBackend()
+
+    def configure(self, cache_type: Optional[str] = None, redis_url: Optional[str] = REDIS_URL,
+                  default_timeout: float = DEFAULT_TIMEOUT) -> CacheBackend:
+        """Select the backend (e.g. from the Flask config).
+
+        Args:
+            cache_type: 'redis' for the shared Redis cache; anything else keeps SQLite only
+            redis_url: Redis server URL
+            default_timeout: TTL in seconds for writes that do not give one
+
+        Returns:
+            The backend now in use
+        """
+        if (cache_type or '').lower() != 'redis':
+            self.backend = CacheBackend()
+        elif redis is None:
+            logger.warning("CACHE_TYPE is redis but the redis package is not installed; using SQLite only")
+            self.backend = CacheBackend()
+        elif not redis_url:
+            logger.warning("CACHE_TYPE is redis but CACHE_REDIS_URL is not set; using SQLite only")
+            self.backend = CacheBackend()
+        else:
+            self.backend = RedisBackend.from_url(redis_url, default_timeout=default_timeout)
+            if self.backend.ping():
+                logger.info("Sharing cached responses through Redis")
+        return self.backend
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+
+shared_cache = SharedCache()
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Check Redis and show counters:  python cache_backend.py ping [redis_url]")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'ping':
+        print_usage()
+        sys.exit(1)
+
+    url = sys.argv[2] if len(sys.argv) > 2 else REDIS_URL
+    backend = shared_cache.configure('redis', url)
+    if not backend.shared:
+        sys.exit(1)
+    reachable = backend.ping()
+    print(f"{url}: {'reachable' if reachable else 'unreachable'}")
+    print(backend.stats())
+    sys.exit(0 if reachable else 1)
@@ -31,10 +31,16 @@ class BaseConfig:
     # Database
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DATABASE_CONNECT_OPTIONS = {}
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
     
     # Caching
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 600))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL') or os.getenv('REDIS_URL')
+    PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 600))
+    PAGE_CACHE_GZIP = os.getenv('PAGE_CACHE_GZIP', 'true').lower() == 'true'
     
     # Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -2,6 +2,8 @@ import sqlite3
 import json
 from datetime import datetime
 import logging
+import db_pool
+from schema import migrate
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,10 @@ class DatabaseManager:
         # Initialize all tables
         self._init_tables()
     
+    def connection(self):
+        """Check out a pooled connection to the service providers database."""
+        return db_pool.connection(self.service_providers.db_path)
+    
     def _init_tables(self):
         # Cache table
         self.cache_results.initialize_cache_database()
@@ -44,19 +50,9 @@ class DatabaseManager:
             )
         ''')
         
-        # Service providers table
-        self.service_providers.execute('''
-            CREATE TABLE IF NOT EXISTS service_providers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                business_name TEXT,
-                contact_name TEXT,
-                email TEXT,
-                phone TEXT,
-                service_types TEXT,
-                locations TEXT,
-                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Service providers table (schema owned by schema.py)
+        with db_pool.connection(self.service_providers.db_path) as conn:
+            migrate(conn)
 
 class SQLiteDatabase:
     def __init__(self, db_path):
@@ -64,17 +60,16 @@ class SQLiteDatabase:
         logger.info(f"Initializing SQLite database: {db_path}")
     
     def execute(self, query, params=()):
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             conn.execute(query, params)
-            conn.commit()
     
     def fetch_one(self, query, params=()):
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             cursor = conn.execute(query, params)
             return cursor.fetchone()
     
     def fetch_all(self, query, params=()):
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             cursor = conn.execute(query, params)
             return cursor.fetchall()
     
@@ -83,10 +78,9 @@ class SQLiteDatabase:
         placeholders = ', '.join(['?' for _ in data])
         query = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(query, list(data.values()))
-            conn.commit()
-            return conn.lastrowid
+        with db_pool.connection(self.db_path) as conn:
+            cursor = conn.execute(query, list(data.values()))
+            return cursor.lastrowid
             
     def find_one(self, query):
         """MongoDB-like find_one method"""
@@ -133,12 +127,13 @@ class SQLiteDatabase:
         '''
         update_params = list(replacement.values()) + params
         
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             cursor = conn.execute(update_query, update_params)
-            if cursor.rowcount == 0 and upsert:
-                # If no rows were updated and upsert is True, insert new record
-                self.insert_one(replacement)
-            conn.commit()
+            updated = cursor.rowcount
+        
+        if updated == 0 and upsert:
+            # If no rows were updated and upsert is True, insert new record
+            self.insert_one(replacement)
             
     def delete_one(self, filter_dict):
         """MongoDB-like delete_one method"""
@@ -152,9 +147,8 @@ class SQLiteDatabase:
         where_clause = ' AND '.join(where_conditions)
         query = f'DELETE FROM cached_results WHERE {where_clause} LIMIT 1'
         
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             conn.execute(query, params)
-            conn.commit()
             
     def delete_many(self, filter_dict=None):
         """MongoDB-like delete_many method"""
@@ -172,9 +166,8 @@ class SQLiteDatabase:
             query = 'DELETE FROM cached_results'
             params = []
         
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             conn.execute(query, params)
-            conn.commit()
 
     def initialize_cache_database(self):
         """Initialize the cache database with required tables."""
@@ -0,0 +1,255 @@
+"""
+SQLite connection pooling for Tradepro Finder Toronto.
+
+Every request used to open (and tear down) its own sqlite3 connection, so a
+single search paid for several connects plus the pragma setup each time. This
+module keeps a small pool of reusable connections per database file:
+
+1. Connections are created lazily, up to ``max_size`` per database
+2. Tuning pragmas (WAL, synchronous=NORMAL, mmap, page cache) are applied once
+   when a connection is created, not on every checkout
+3. Pools are discarded after a fork so gunicorn workers never share handles
+4. Checkout counts, reuse counts and wait times are tracked for diagnostics
+
+Usage:
+    with db_pool.connection('service_providers.db') as conn:
+        conn.execute(...)
+"""
+
+import os
+import queue
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DEFAULT_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+# Pragmas applied once per new connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    f"PRAGMA mmap_size={int(os.getenv('DB_MMAP_SIZE', 64 * 1024 * 1024))}",
+    f"PRAGMA cache_size={-int(os.getenv('DB_CACHE_KB', 16 * 1024))}",
+    'PRAGMA busy_timeout=5000',
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became available in time."""
+
+
+class ConnectionPool:
+    """A bounded pool of reusable SQLite connections for one database file."""
+
+    def __init__(self, db_path: str, max_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_POOL_TIMEOUT):
+        """Initialize the pool.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection before giving up
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._reuses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._in_use = 0
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new connection and apply the tuning pragmas."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.timeout)
+        for pragma in CONNECTION_PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.Error as e:
+                # mmap/WAL are not available on every filesystem; keep going
+                logger.warning(f"Could not apply '{pragma}' to {self.db_path}: {str(e)}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, open a new one, or wait for one."""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._reuses += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool exhausted: wait for a connection to be released
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No connection to {self.db_path} available after {self.timeout}s")
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._reuses += 1
+            self._waits += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool in a clean state."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+        except sqlite3.Error:
+            # Broken connection: drop it so a fresh one can be created
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block.
+
+        The block's work is committed on success and rolled back on error,
+        matching the semantics of ``with sqlite3.connect(...) as conn``.
+        """
+        conn = self._acquire()
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and usage counters."""
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "open_connections": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "reuses": self._reuses,
+                "reuse_ratio": round(self._reuses / self._checkouts, 3) if self._checkouts else 0.0,
+                "waits": self._waits,
+                "total_wait_ms": round(self._wait_time * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "timeouts": self._timeouts
+            }
+
+
+# Pools are per process; a forked gunicorn worker must not reuse its parent's handles
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+_pool_size = DEFAULT_POOL_SIZE
+_pool_timeout = DEFAULT_POOL_TIMEOUT
+
+
+def configure(max_size: Optional[int] = None, timeout: Optional[float] = None) -> None:
+    """Set the size and checkout timeout used for pools created from now on."""
+    global _pool_size, _pool_timeout
+    if max_size is not None:
+        _pool_size = max_size
+    if timeout is not None:
+        _pool_timeout = timeout
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Get (or create) the pool for a database file in this process."""
+    global _pools, _pools_pid
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked: forget the parent's connections without closing them
+            _pools = {}
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, max_size=_pool_size, timeout=_pool_timeout)
+            _pools[key] = pool
+        return pool
+
+
+def connection(db_path: str):
+    """Check out a pooled connection to ``db_path`` (use as a context manager)."""
+    return get_pool(db_path).connection()
+
+
+def close_all() -> None:
+    """Close every idle pooled connection in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return stats for every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        "pid": os.getpid(),
+        "pools": [pool.stats() for pool in pools]
+    }
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Place details enrichment for Tradepro Finder Toronto.
+
+Text Search results carry no phone number or website; those need a details
+call per place, which was too slow to do one by one. This module:
+
+1. Caches details per place_id in place_details_cache with a long TTL, so each
+   place is looked up once; places with neither phone nor website are cached
+   for a shorter TTL, and failed lookups are not cached so they are retried
+2. Fetches missing details for a whole result page concurrently on a bounded
+   thread pool
+3. Can run inline with a latency budget (whatever has not arrived in time
+   keeps running in the background and is stored when it lands), or as a
+   backfill over service_providers rows missing contact info
+4. Shares cached details between instances through the configured cache
+   backend, reading a whole page of place IDs in one round trip
+
+Usage:
+    python enrichment.py backfill [limit]
+"""
+
+import os
+import sys
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import db_pool
+from cache_backend import shared_cache
+from ranking import rank_pair
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ENRICH_MODE = os.getenv('PLACES_ENRICH_MODE', 'inline')  # inline, background or off
+ENRICH_BUDGET = float(os.getenv('PLACES_ENRICH_BUDGET', 1.5))
+ENRICH_WORKERS = int(os.getenv('PLACES_ENRICH_WORKERS', 8))
+DETAILS_TTL_DAYS = int(os.getenv('PLACES_DETAILS_TTL_DAYS', 365))
+# Places without contact info may add it, so that answer is asked again sooner
+EMPTY_DETAILS_TTL_DAYS = int(os.getenv('PLACES_EMPTY_DETAILS_TTL_DAYS', 30))
+
+
+def ensure_details_table(conn) -> None:
+    """Create the per-place details cache.
+
+    Args:
+        conn: Open connection to the service providers database
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS place_details_cache (
+            place_id TEXT PRIMARY KEY,
+            phone TEXT,
+            website TEXT,
+            fetched_at TEXT NOT NULL
+        )
+    ''')
+
+
+class PlaceEnricher:
+    """Fills in phone and website for place results using cached or fetched details."""
+
+    def __init__(self, google_places, db_path: str = 'service_providers.db', mode: str = ENRICH_MODE,
+                 budget: float = ENRICH_BUDGET, max_workers: int = ENRICH_WORKERS,
+                 details_ttl_days: int = DETAILS_TTL_DAYS,
+                 empty_details_ttl_days: int = EMPTY_DETAILS_TTL_DAYS):
+        """Initialize the enricher.
+
+        Args:
+            google_places: GooglePlacesAPI used for details lookups
+            db_path: Path to the database holding place_details_cache
+            mode: 'inline' (wait up to budget), 'background' (never wait) or 'off'
+            budget: Seconds an inline enrichment may add to a request
+            max_workers: Concurrent details lookups
+            details_ttl_days: How long cached details stay valid
+            empty_details_ttl_days: How long an answer with neither phone nor website stays valid
+        """
+        self.google_places = google_places
+        self.db_path = db_path
+        self.mode = mode
+        self.budget = budget
+        self.max_workers = max_workers
+        self.details_ttl = timedelta(days=details_ttl_days)
+        self.empty_details_ttl = timedelta(days=min(empty_details_ttl_days, details_ttl_days))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.fetched = 0
+        self.fetch_failures = 0
+        self.deferred = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='places-details')
+            return self._executor
+
+    def _load_cached(self, place_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """Load unexpired cached details for the given place IDs (shared cache first, then SQLite)."""
+        if not place_ids:
+            return {}
+        now = datetime.now()
+        oldest_allowed = (now - self.details_ttl).isoformat()
+        oldest_empty_allowed = (now - self.empty_details_ttl).isoformat()
+        found = {
+            place_id: {"phone": entry["phone"], "website": entry["website"]}
+            for place_id, entry in shared_cache.get_many('details', place_ids).items()
+            if entry["fetched_at"] > (oldest_allowed if entry["phone"] or entry["website"] else oldest_empty_allowed)
+        }
+        missing = [place_id for place_id in place_ids if place_id not in found]
+        if not missing:
+            return found
+
+        placeholders = ', '.join('?' for _ in missing)
+        with db_pool.connection(self.db_path) as conn:
+            rows = conn.execute(
+                f'SELECT place_id, phone, website, fetched_at FROM place_details_cache '
+                f'WHERE place_id IN ({placeholders}) AND fetched_at > CASE '
+                f"WHEN COALESCE(phone, '') = '' AND COALESCE(website, '') = '' THEN ? ELSE ? END",
+                (*missing, oldest_empty_allowed, oldest_allowed)
+            ).fetchall()
+        for place_id, phone, website, _ in rows:
+            found[place_id] = {"phone": phone or "", "website": website or ""}
+        if rows and shared_cache.shared:
+            shared_cache.set_many('details', {
+                row[0]: {"phone": row[1] or "", "website": row[2] or "", "fetched_at": row[3]} for row in rows
+            }, ttl=self.details_ttl.total_seconds())
+        return found
+
+    def _store(self, place_id: str, details: Dict[str, str]) -> None:
+        """Cache details and copy them onto matching service_providers rows."""
+        phone = details.get("phone", "")
+        website = details.get("website", "")
+        fetched_at = datetime.now().isoformat()
+        with db_pool.connection(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO place_details_cache (place_id, phone, website, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (place_id) DO UPDATE SET
+                    phone = excluded.phone, website = excluded.website, fetched_at = excluded.fetched_at
+            ''', (place_id, phone, website, fetched_at))
+            if phone or website:
+                updated = conn.execute('''
+                    UPDATE service_providers
+                    SET phone = COALESCE(NULLIF(?, ''), phone), website = COALESCE(NULLIF(?, ''), website)
+                    WHERE place_id = ? AND (COALESCE(phone, '') = '' OR COALESCE(website, '') = '')
+                ''', (phone, website, place_id)).rowcount
+                if updated:
+                    # Keep the touched pairs' rankings current before the write commits
+                    for category, location in conn.execute(
+                        'SELECT DISTINCT category, location FROM service_providers WHERE place_id = ?', (place_id,)
+                    ).fetchall():
+                        rank_pair(conn, category, location)
+        ttl = self.details_ttl if phone or website else self.empty_details_ttl
+        shared_cache.set('details', place_id, {"phone": phone, "website": website, "fetched_at": fetched_at},
+                         ttl=ttl.total_seconds())
+
+    def _fetch(self, place_id: str) -> Dict[str, str]:
+        """Fetch details for one place and cache them (runs on the pool)."""
+        try:
+            details = self.google_places.get_place_details(place_id)
+            if details:
+                self._store(place_id, details)
+                self.fetched += 1
+            else:
+                # Lookup failed; leave uncached so a later request retries it
+                self.fetch_failures += 1
+            return details
+        except Exception as e:
+            self.fetch_failures += 1
+            logger.error(f"Error enriching place {place_id}: {str(e)}")
+            return {}
+        finally:
+            with self._lock:
+                self._pending.pop(place_id, None)
+
+    def _submit(self, place_id: str) -> Future:
+        """Start (or join) the details lookup for a place."""
+        executor = self._get_executor()
+        with self._lock:
+            future = self._pending.get(place_id)
+            if future is None:
+                future = executor.submit(self._fetch, place_id)
+                self._pending[place_id] = future
+            return future
+
+    def enrich(self, results: List[Dict[str, Any]], budget: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Fill phone and website on results in place.
+
+        Args:
+            results: Formatted place results (with place_id)
+            budget: Seconds to wait for lookups; defaults to the configured budget
+                    in inline mode and 0 in background mode
+
+        Returns:
+            The same list, with whatever details were available in time
+        """
+        if self.mode == 'off' or getattr(self.google_places, 'returns_contact_info', False):
+            # Nothing to do, or the search already asked for phone and website
+            return results
+        if budget is None:
+            budget = self.budget if self.mode == 'inline' else 0.0
+
+        missing = [r for r in results if r.get("place_id") and not (r.get("phone") and r.get("website"))]
+        if not missing:
+            return results
+
+        try:
+            cached = self._load_cached(list({r["place_id"] for r in missing}))
+        except Exception as e:
+            logger.error(f"Error reading place details cache: {str(e)}")
+            cached = {}
+        self.cache_hits += len(cached)
+
+        futures = {}
+        for result in missing:
+            details = cached.get(result["place_id"])
+            if details is not None:
+                self._apply(result, details)
+            elif result["place_id"] not in futures:
+                futures[result["place_id"]] = self._submit(result["place_id"])
+
+        if futures and budget > 0:
+            done, not_done = wait(list(futures.values()), timeout=budget)
+            self.deferred += len(not_done)
+            for result in missing:
+                future = futures.get(result["place_id"])
+                if future in done and not future.exception():
+                    self._apply(result, future.result())
+        elif futures:
+            self.deferred += len(futures)
+
+        return results
+
+    @staticmethod
+    def _apply(result: Dict[str, Any], details: Dict[str, str]) -> None:
+        if details.get("phone") and not result.get("phone"):
+            result["phone"] = details["phone"]
+        if details.get("website") and not result.get("website"):
+            result["website"] = details["website"]
+
+    def backfill(self, limit: int = 100) -> int:
+        """Enrich stored providers that have a place_id but no contact info.
+
+        Args:
+            limit: Maximum number of providers to process
+
+        Returns:
+            Number of providers looked up
+        """
+        with db_pool.connection(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT DISTINCT sp.place_id FROM service_providers sp
+                LEFT JOIN place_details_cache d ON d.place_id = sp.place_id
+                WHERE sp.place_id IS NOT NULL AND d.place_id IS NULL
+                  AND (COALESCE(sp.phone, '') = '' OR COALESCE(sp.website, '') = '')
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        futures = [self._submit(row[0]) for row in rows]
+        wait(futures)
+        logger.info(f"Backfilled details for {len(futures)} places")
+        return len(futures)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache hit, fetch and deferral counters."""
+        return {
+            "mode": self.mode,
+            "budget": self.budget,
+            "cache_hits": self.cache_hits,
+            "fetched": self.fetched,
+            "fetch_failures": self.fetch_failures,
+            "deferred": self.deferred,
+            "pending": len(self._pending)
+        }
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Backfill contact info:  python enrichment.py backfill [limit]")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'backfill':
+        print_usage()
+        sys.exit(1)
+
+    from google_places_api import GooglePlacesAPI
+
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    enricher = PlaceEnricher(GooglePlacesAPI())
+    print(f"Looked up {enricher.backfill(limit)} places")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Full-text provider search for Tradepro Finder Toronto.
+
+The query parameter of /api/search was only forwarded to Google; locally the
+search service could only list a (category, location) pair, so every search
+with a query needed Google. Providers are now indexed with SQLite FTS5:
+
+1. provider_fts is an external-content FTS5 table over service_providers
+   name, category, address and description, so the text is not stored twice
+2. Triggers on service_providers keep it in sync; rating and review updates
+   do not touch the index
+3. Queries are split into words, filler words dropped and plural/trade
+   suffixes trimmed, and each word is matched as a prefix ("plumber" finds
+   "Plumbing" and "plumbers"); every word must match
+4. Matches are ordered by bm25 with the name weighted highest, then by review
+   count; the search service answers from them when there are enough and asks
+   Google only when local recall is poor (FULLTEXT_MIN_RESULTS)
+
+If the SQLite build has no FTS5 the index is skipped and searches fall back to
+the pair listing.
+
+Usage:
+    python fulltext.py rebuild                              Re-index every provider
+    python fulltext.py search <query> [category location]   Print matching providers
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import logging
+from typing import Any, Dict, List, Optional
+import db_pool
+from taxonomy import normalize_term
+from resolver import FILLER_WORDS, STEM_SUFFIXES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'service_providers.db'
+FULLTEXT_LIMIT = int(os.getenv('FULLTEXT_LIMIT', 50))
+# Local matches needed before a search with a query skips Google
+FULLTEXT_MIN_RESULTS = int(os.getenv('FULLTEXT_MIN_RESULTS', 5))
+# bm25 weights for name, category, address, description
+COLUMN_WEIGHTS = (10.0, 2.0, 4.0, 1.0)
+
+
+def ensure_fulltext(conn) -> None:
+    """Create provider_fts and its sync triggers, and index every existing provider.
+
+    Args:
+        conn: Open connection to the service providers database
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS provider_fts USING fts5(
+                name, category, address, description,
+                content='service_providers', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search unavailable (SQLite without FTS5?): {str(e)}")
+        return
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_fts_insert AFTER INSERT ON service_providers
+        BEGIN
+            INSERT INTO provider_fts (rowid, name, category, address, description)
+            VALUES (new.id, new.name, new.category, new.address, new.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_fts_delete AFTER DELETE ON service_providers
+        BEGIN
+            INSERT INTO provider_fts (provider_fts, rowid, name, category, address, description)
+            VALUES ('delete', old.id, old.name, old.category, old.address, old.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_fts_update
+        AFTER UPDATE OF name, category, address, description ON service_providers
+        BEGIN
+            INSERT INTO provider_fts (provider_fts, rowid, name, category, address, description)
+            VALUES ('delete', old.id, old.name, old.category, old.address, old.description);
+            INSERT INTO provider_fts (rowid, name, category, address, description)
+            VALUES (new.id, new.name, new.category, new.address, new.description);
+        END
+    ''')
+    conn.execute("INSERT INTO provider_fts (provider_fts) VALUES ('rebuild')")
+
+
+def _prefix(word: str) -> str:
+    """Trim a plural or trade suffix so the rest matches every form as a prefix."""
+    for suffix in STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Build an FTS5 MATCH expression requiring a prefix of every meaningful word.
+
+    Returns:
+        The expression, or None if the query has only filler words ("near me")
+    """
+    words = re.findall(r'\w+', normalize_term(query))
+    prefixes = dict.fromkeys(_prefix(word) for word in words if word not in FILLER_WORDS)
+    if not prefixes:
+        return None
+    return ' '.join(f'"{prefix}"*' for prefix in prefixes)
+
+
+def search_providers(conn, query: str, category: Optional[str] = None, location: Optional[str] = None,
+                     limit: int = FULLTEXT_LIMIT) -> Optional[List[Dict[str, Any]]]:
+    """Find providers matching a free-text query, most relevant first.
+
+    Args:
+        conn: Open connection to the service providers database
+        query: Free-text query
+        category: Only return providers in this category
+        location: Only return providers in this location
+        limit: Maximum number of providers
+
+    Returns:
+        service_providers rows as dictionaries, or None if the index is unavailable or
+        the query has nothing to match on
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return None
+
+    sql = '''
+        SELECT sp.* FROM provider_fts
+        JOIN service_providers sp ON sp.id = provider_fts.rowid
+        WHERE provider_fts MATCH ?
+    '''
+    params: List[Any] = [expression]
+    if category is not None:
+        sql += ' AND sp.category = ?'
+        params.append(category)
+    if location is not None:
+        sql += ' AND sp.location = ?'
+        params.append(location)
+    sql += f" ORDER BY bm25(provider_fts, {', '.join(map(str, COLUMN_WEIGHTS))}), COALESCE(sp.reviews, 0) DESC LIMIT ?"
+    params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    try:
+        cursor.execute(sql, params)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search failed for {query!r}: {str(e)}")
+        return None
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Re-index every provider:      python fulltext.py rebuild")
+    print("  Print matching providers:     python fulltext.py search <query> [category location]")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == 'rebuild':
+        with db_pool.connection(DB_PATH) as conn:
+            ensure_fulltext(conn)
+            print(f"Indexed {conn.execute('SELECT COUNT(*) FROM service_providers').fetchone()[0]} providers")
+
+    elif command == 'search' and len(sys.argv) in (3, 5):
+        category, location = (sys.argv[3], sys.argv[4]) if len(sys.argv) == 5 else (None, None)
+        with db_pool.connection(DB_PATH) as conn:
+            providers = search_providers(conn, sys.argv[2], category, location)
+        if providers is None:
+            print("Nothing to match on, or the full-text index is not available (python fulltext.py rebuild)")
+            sys.exit(1)
+        for position, provider in enumerate(providers, 1):
+            print(f"{position:>3}. {provider['name']} - {provider['category']}, {provider['address']}")
+
+    else:
+        print_usage()
+        sys.exit(1)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Geospatial provider search for Tradepro Finder Toronto.
+
+Providers only had free-text location and address columns, so a search for
+plumbers around Vaughan could only match providers stored under "Vaughan" and
+asked Google again for every neighbouring municipality. Providers now have
+coordinates:
+
+1. service_providers gains latitude and longitude, filled from the location
+   Google returns with each place
+2. provider_geo is an R*Tree over those points, kept in sync by triggers, so
+   a radius search reads only the providers inside its bounding box; exact
+   distances are then computed for those candidates alone
+3. Locations are placed with the coordinates in the cities CSV (municipalities
+   and neighbourhoods) or, for boroughs such as North York, the centres in
+   locations.py
+4. /api/search takes radius_km (and optionally lat/lng) to return the
+   providers of a category within that distance, nearest first
+
+If the SQLite build has no R*Tree module the index is skipped and radius
+searches find nothing locally.
+
+Usage:
+    python geo.py rebuild                                      Re-index provider coordinates
+    python geo.py near <category> <location> <radius_km>       Print providers near a location
+"""
+
+import os
+import sys
+import math
+import sqlite3
+import logging
+from typing import Any, Dict, List, Optional
+import db_pool
+from locations import location_point
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'service_providers.db'
+GEO_LIMIT = int(os.getenv('GEO_LIMIT', 50))
+GEO_MAX_RADIUS_KM = float(os.getenv('GEO_MAX_RADIUS_KM', 50))
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+# R*Tree coordinates are 32-bit floats; widen boxes so rounding never drops an edge point
+BOX_PADDING = 0.0001
+
+
+def ensure_geo_index(conn) -> None:
+    """Add provider coordinates and the provider_geo R*Tree with its sync triggers.
+
+    Args:
+        conn: Open connection to the service providers database
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(service_providers)')]
+    for column in ('latitude', 'longitude'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE service_providers ADD COLUMN {column} REAL')
+
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS provider_geo USING rtree(
+                id, min_lat, max_lat, min_lng, max_lng
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Radius search unavailable (SQLite without R*Tree?): {str(e)}")
+        return
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_geo_insert AFTER INSERT ON service_providers
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO provider_geo (id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_geo_update
+        AFTER UPDATE OF latitude, longitude ON service_providers
+        BEGIN
+            DELETE FROM provider_geo WHERE id = old.id;
+            INSERT INTO provider_geo (id, min_lat, max_lat, min_lng, max_lng)
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_provider_geo_delete AFTER DELETE ON service_providers
+        BEGIN
+            DELETE FROM provider_geo WHERE id = old.id;
+        END
+    ''')
+    conn.execute('DELETE FROM provider_geo')
+    conn.execute('''
+        INSERT INTO provider_geo (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, latitude, latitude, longitude, longitude FROM service_providers
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ''')
+
+
+def distance_km(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    """Great-circle (haversine) distance between two points, in kilometres."""
+    lat1, lat2 = math.radians(latitude), math.radians(other_latitude)
+    dlat = lat2 - lat1
+    dlng = math.radians(other_longitude - longitude)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def providers_within(conn, latitude: float, longitude: float, radius_km: float,
+                     category: Optional[str] = None, limit: int = GEO_LIMIT) -> List[Dict[str, Any]]:
+    """Find providers within a radius of a point, nearest first.
+
+    Args:
+        conn: Open connection to the service providers database
+        latitude: Latitude of the centre
+        longitude: Longitude of the centre
+        radius_km: Search radius in kilometres
+        category: Only return providers in this category
+        limit: Maximum number of providers
+
+    Returns:
+        service_providers rows as dictionaries with a distance_km field
+    """
+    lat_delta = radius_km / KM_PER_DEGREE + BOX_PADDING
+    lng_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)) + BOX_PADDING
+    sql = '''
+        SELECT sp.* FROM provider_geo g
+        JOIN service_providers sp ON sp.id = g.id
+        WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lng >= ? AND g.max_lng <= ?
+    '''
+    params: List[Any] = [latitude - lat_delta, latitude + lat_delta, longitude - lng_delta, longitude + lng_delta]
+    if category is not None:
+        sql += ' AND sp.category = ?'
+        params.append(category)
+
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    try:
+        cursor.execute(sql, params)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Radius search failed: {str(e)}")
+        return []
+
+    nearby = []
+    for row in cursor.fetchall():
+        provider = dict(row)
+        distance = distance_km(latitude, longitude, provider['latitude'], provider['longitude'])
+        if distance <= radius_km:
+            provider['distance_km'] = round(distance, 2)
+            nearby.append(provider)
+    nearby.sort(key=lambda provider: (provider['distance_km'], -(provider['rating'] or 0)))
+    return nearby[:limit]
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Re-index provider coordinates: python geo.py rebuild")
+    print("  Print providers near a place:  python geo.py near <category> <location> <radius_km>")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == 'rebuild':
+        with db_pool.connection(DB_PATH) as conn:
+            ensure_geo_index(conn)
+            print(f"Indexed {conn.execute('SELECT COUNT(*) FROM provider_geo').fetchone()[0]} providers")
+
+    elif command == 'near' and len(sys.argv) == 5:
+        point = location_point(sys.argv[3])
+        if point is None:
+            print(f"Unknown location: {sys.argv[3]}")
+            sys.exit(1)
+        with db_pool.connection(DB_PATH) as conn:
+            for provider in providers_within(conn, *point, float(sys.argv[4]), category=sys.argv[2]):
+                print(f"{provider['distance_km']:>6.2f} km  {provider['name']} ({provider['location']})")
+
+    else:
+        print_usage()
+        sys.exit(1)
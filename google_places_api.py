@@ -5,125 +5,606 @@ This module handles Google Places API requests with a caching system that:
 1. Checks for cached results before making API calls
 2. Stores API results in the database for future use
 3. Only refreshes cached results after 6 months
+4. Can serve stale results immediately while refreshing them in the background
+   (stale-while-revalidate), with soft/hard TTLs configurable per category
+5. Caches result pages individually together with their next_page_token, and
+   prefetches the following page in the background once the token activates
+6. Can use either the legacy Text Search endpoint or Places API (New)
+   places:searchText, which returns only the fields we render (phone and
+   website included, so no per-place details calls) biased to the location
+7. Keeps one cache row per page, keyed by a hash of the case/whitespace-folded
+   search and upserted on refresh, with periodic deletion of expired rows
+   (VACUUM is left to the compact command below, e.g. from cron)
+8. Shares pages between instances through the configured cache backend
+   (Redis when CACHE_TYPE is 'redis'), with SQLite as each instance's store
+9. Takes every call from the monthly budget (see api_budget.py): searches a
+   visitor is waiting on come first, refreshes, prefetches and details calls
+   are paced, and near the end of the budget searches are served from cache
+
+Usage:
+    python google_places_api.py status     Show cache row count and size
+    python google_places_api.py compact    Drop expired rows and reclaim space
 """
 
 import os
+import sys
 import json
-import sqlite3
+import time
+import hashlib
 import logging
-import requests
+import threading
+import db_pool
+import serialization
+from cache_backend import shared_cache
+from http_client import CircuitOpenError, HTTPClient, places_client
+from api_budget import BACKGROUND, USER, BudgetExhaustedError, BudgetScheduler, places_budget
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from taxonomy import normalize_term
+from locations import LOCATION_CENTERS, TORONTO_CENTER
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Cache freshness: results younger than the soft TTL are fresh, results between
+# the soft and hard TTL are stale (served while refreshing), older ones are ignored
+DEFAULT_SOFT_TTL_DAYS = int(os.getenv('PLACES_CACHE_SOFT_TTL_DAYS', 180))
+DEFAULT_HARD_TTL_DAYS = int(os.getenv('PLACES_CACHE_HARD_TTL_DAYS', 365))
+# Per-category overrides as JSON, e.g. {"Moving": [30, 90]}
+CATEGORY_TTL_DAYS = json.loads(os.getenv('PLACES_CACHE_CATEGORY_TTLS', '{}'))
+STALE_WHILE_REVALIDATE = os.getenv('PLACES_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+REFRESH_WORKERS = int(os.getenv('PLACES_REFRESH_WORKERS', 2))
+MAX_PENDING_REFRESHES = int(os.getenv('PLACES_MAX_PENDING_REFRESHES', 50))
+# Rows older than this are deleted by compaction (kept past the hard TTL as a
+# last resort while the circuit breaker is open)
+CACHE_RETENTION_DAYS = int(os.getenv('PLACES_CACHE_RETENTION_DAYS', 730))
+COMPACT_INTERVAL_HOURS = float(os.getenv('PLACES_CACHE_COMPACT_INTERVAL_HOURS', 24))
+# Compaction rebuilds the database file once this share of its pages is free
+VACUUM_FREE_RATIO = 0.25
+PREFETCH_NEXT_PAGE = os.getenv('PLACES_PREFETCH_NEXT_PAGE', 'true').lower() == 'true'
+# Google rejects a next_page_token for a short while after issuing it
+PAGE_TOKEN_DELAY = float(os.getenv('PLACES_PAGE_TOKEN_DELAY', 2))
+# Tokens are short-lived; older ones are renewed by refetching the previous page
+PAGE_TOKEN_MAX_AGE = float(os.getenv('PLACES_PAGE_TOKEN_MAX_AGE', 300))
+# Text Search returns at most three pages of 20 results
+MAX_PAGES = 3
+
+# 'legacy' (maps/api/place/textsearch) or 'v1' (Places API (New) places:searchText)
+API_BACKEND = os.getenv('PLACES_API_BACKEND', 'legacy').lower()
+V1_SEARCH_URL = "https://places.googleapis.com/v1/places:searchText"
+V1_PLACE_URL = "https://places.googleapis.com/v1/places/{place_id}"
+# Only the fields a result card shows; photos and opening hours are left out
+V1_SEARCH_FIELDS = ','.join([
+    'places.id',
+    'places.displayName',
+    'places.formattedAddress',
+    'places.rating',
+    'places.userRatingCount',
+    'places.nationalPhoneNumber',
+    'places.websiteUri',
+    'places.location',
+    'nextPageToken'
+])
+V1_DETAILS_FIELDS = 'nationalPhoneNumber,websiteUri'
+
+# locationBias circles for the GTA municipalities; other locations (mostly
+# Toronto neighbourhoods) are biased to the wider city
+GTA_BIAS_RADIUS = 50000.0
+MUNICIPALITY_BIAS_RADIUS = 15000.0
+
+
+def cache_key(query: str, category: str, location: str, page: int = 1) -> str:
+    """Hash the normalized search so case and spacing variants share one cache row."""
+    normalized = '|'.join(normalize_term(part) for part in (category, location, query))
+    return hashlib.sha1(f"{normalized}|{page}".encode('utf-8')).hexdigest()
+
+
+def search_text(query: str, category: str, location: str) -> str:
+    """Build the Text Search query string, e.g. "emergency Plumbing in Toronto"."""
+    text = f"{category} in {location}"
+    return f"{query} {text}" if query else text
+
+
+def location_bias(location: str) -> Dict[str, Any]:
+    """Build the places:searchText locationBias circle for a location."""
+    center = LOCATION_CENTERS.get(normalize_term(location))
+    latitude, longitude = center or TORONTO_CENTER
+    radius = MUNICIPALITY_BIAS_RADIUS if center and center != TORONTO_CENTER else GTA_BIAS_RADIUS
+    return {
+        "circle": {
+            "center": {"latitude": latitude, "longitude": longitude},
+            "radius": radius
+        }
+    }
+
+
 class GooglePlacesAPI:
     """Google Places API client with caching functionality."""
     
-    def __init__(self, api_key: str = None, db_path: str = 'service_providers.db'):
+    def __init__(self, api_key: str = None, db_path: str = 'service_providers.db',
+                 stale_while_revalidate: bool = STALE_WHILE_REVALIDATE,
+                 category_ttls: Optional[Dict[str, Tuple[int, int]]] = None,
+                 http: Optional[HTTPClient] = None, backend: str = API_BACKEND,
+                 budget: Optional[BudgetScheduler] = None):
         """Initialize the Google Places API client.
         
         Args:
             api_key: Google Places API key. If None, will try to get from environment.
             db_path: Path to the SQLite database for caching.
+            stale_while_revalidate: Serve stale cache entries while refreshing them in the background
+            category_ttls: Per-category (soft, hard) TTLs in days
+            http: HTTP client for API calls (defaults to the shared pooled client)
+            backend: 'legacy' Text Search or 'v1' Places API (New)
+            budget: Monthly call budget (defaults to the shared Places budget)
         """
         self.api_key = api_key or os.environ.get('GOOGLE_PLACES_API_KEY')
         if not self.api_key:
             logger.warning("No Google Places API key provided. API calls will fail.")
         
         self.db_path = db_path
+        self.http = http or places_client
+        self.budget = budget or places_budget
+        if backend not in ('legacy', 'v1'):
+            logger.warning(f"Unknown Places API backend '{backend}'; using legacy")
+            backend = 'legacy'
+        self.backend = backend
+        self.stale_while_revalidate = stale_while_revalidate
+        self.category_ttls = {k.casefold(): tuple(v) for k, v in (category_ttls or CATEGORY_TTL_DAYS).items()}
+        
+        # Called with (results, category, location) after a background refresh
+        self.on_refresh: Optional[Callable[[List[Dict[str, Any]], str, str], None]] = None
+        
+        # Background refresh pool, created on first use so forked workers get their own
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        self._refreshing: Dict[Tuple[str, str, str, int], Future] = {}
+        self._refresh_lock = threading.Lock()
+        # First compaction one interval after start, so restarts do not all compact at once
+        self._next_compaction = time.monotonic() + COMPACT_INTERVAL_HOURS * 3600
+        self._last_compaction: Optional[Dict[str, Any]] = None
+        self._stats = {
+            "fresh_hits": 0,
+            "stale_served": 0,
+            "misses": 0,
+            "refreshes_scheduled": 0,
+            "refreshes_skipped": 0,
+            "refreshes_completed": 0,
+            "refresh_failures": 0,
+            "prefetches_scheduled": 0,
+            "prefetch_waits": 0,
+            "degraded_fallbacks": 0,
+            "budget_fallbacks": 0
+        }
+        
         self._ensure_cache_table()
     
     def _ensure_cache_table(self) -> None:
-        """Ensure the API cache table exists in the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create cache table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS google_places_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query TEXT NOT NULL,
-                category TEXT NOT NULL,
-                location TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        ''')
-        
-        # Create index for faster lookups
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_google_places_cache_query 
-            ON google_places_cache (query, category, location)
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Ensure the API cache table exists and is keyed by cache_key."""
+        with db_pool.connection(self.db_path) as conn:
+            # Upgrades rewrite rows, so workers starting together take turns
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            
+            # Create cache table if it doesn't exist
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS google_places_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    query TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    page INTEGER NOT NULL DEFAULT 1,
+                    next_page_token TEXT,
+                    cache_key TEXT
+                )
+            ''')
+            
+            # Older caches predate pagination; every existing entry is page 1
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(google_places_cache)')]
+            if 'page' not in columns:
+                conn.execute('ALTER TABLE google_places_cache ADD COLUMN page INTEGER NOT NULL DEFAULT 1')
+            if 'next_page_token' not in columns:
+                conn.execute('ALTER TABLE google_places_cache ADD COLUMN next_page_token TEXT')
+            if 'cache_key' not in columns:
+                conn.execute('ALTER TABLE google_places_cache ADD COLUMN cache_key TEXT')
+                self._backfill_cache_keys(conn)
+            
+            # One row per key makes lookups a unique index probe
+            conn.execute('DROP INDEX IF EXISTS idx_google_places_cache_query')
+            conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_google_places_cache_key
+                ON google_places_cache (cache_key)
+            ''')
     
-    def search(self, query: str, category: str, location: str) -> Tuple[List[Dict[str, Any]], bool]:
+    @staticmethod
+    def _backfill_cache_keys(conn) -> None:
+        """Key existing rows, keeping only the newest row for each key."""
+        rows = conn.execute('''
+            SELECT id, query, category, location, page FROM google_places_cache
+            ORDER BY timestamp DESC, id DESC
+        ''').fetchall()
+        seen = set()
+        keyed, superseded = [], []
+        for row_id, query, category, location, page in rows:
+            key = cache_key(query, category, location, page)
+            if key in seen:
+                superseded.append((row_id,))
+            else:
+                seen.add(key)
+                keyed.append((key, row_id))
+        conn.executemany('DELETE FROM google_places_cache WHERE id = ?', superseded)
+        conn.executemany('UPDATE google_places_cache SET cache_key = ? WHERE id = ?', keyed)
+        logger.info(f"Keyed {len(keyed)} cached searches, dropped {len(superseded)} superseded rows")
+    
+    def search(self, query: str, category: str, location: str, page: int = 1) -> Tuple[List[Dict[str, Any]], bool]:
         """Search for places using Google Places API with caching.
         
         Args:
             query: Search query string
             category: Business category
             location: Location for the search
+            page: 1-based result page (Google returns at most MAX_PAGES pages)
             
         Returns:
             Tuple containing (list of place results, whether results came from cache)
         """
+        if page < 1 or page > MAX_PAGES:
+            return [], False
+        
         # Check cache first
-        cached_results = self._get_from_cache(query, category, location)
-        if cached_results:
-            logger.info(f"Using cached results for query: {query} in {location}")
-            return cached_results, True
+        cached = self._get_from_cache(query, category, location, page=page)
+        served = self._serve_cached(query, category, location, page, cached)
+        if served is not None:
+            return served, True
+        
+        self._stats["misses"] += 1
+        
+        with self._refresh_lock:
+            pending = self._refreshing.get((query, category, location, page))
+        if pending is not None:
+            # The page is already being prefetched; wait for it instead of calling twice
+            try:
+                pending.result(timeout=self.http.timeout)
+            except Exception:
+                pass
+            landed = self._get_from_cache(query, category, location, page=page)
+            if landed:
+                self._stats["prefetch_waits"] += 1
+                return landed[0], True
         
         # If not in cache or expired, call API
         if not self.api_key:
             logger.error("Cannot make API call: No Google Places API key available")
             return [], False
+        
+        circuit_open = not self.http.available()
+        if circuit_open or not self.budget.available(USER):
+            # Google is degraded or the month's budget is nearly spent: fail fast
+            # to whatever we have cached, however old
+            self._stats["degraded_fallbacks" if circuit_open else "budget_fallbacks"] += 1
+            fallback = cached or self._get_from_cache(query, category, location, max_age=None, page=page)
+            reason = 'circuit open' if circuit_open else 'budget nearly spent'
+            logger.warning(f"Places API {reason}; serving cache only for {query} in {location}")
+            return ([dict(result, stale=True) for result in fallback[0]], True) if fallback else ([], False)
             
-        logger.info(f"Calling Google Places API for query: {query} in {location}")
-        api_results = self._call_places_api(query, category, location)
+        logger.info(f"Calling Google Places API for query: {query} in {location} (page {page})")
+        api_results, next_page_token = self._fetch_page(query, category, location, page)
         
-        # Cache the results
         if api_results:
-            self._store_in_cache(query, category, location, api_results)
+            self._prefetch_next_page(query, category, location, page, next_page_token, timedelta(0))
+        elif cached:
+            # Refresh failed; a stale answer beats an empty one
+            return [dict(result, stale=True) for result in cached[0]], True
             
         return api_results, False
     
-    def _get_from_cache(self, query: str, category: str, location: str) -> List[Dict[str, Any]]:
-        """Get results from cache if they exist and are not expired.
+    def search_cached(self, query: str, category: str, location: str,
+                      page: int = 1) -> Optional[List[Dict[str, Any]]]:
+        """Answer a search from the cache alone, exactly as search() would on a hit.
+        
+        Lets callers skip coordination that only a miss needs (such as the
+        cross-worker single-flight lease).
         
         Args:
             query: Search query string
             category: Business category
             location: Location for the search
+            page: 1-based result page
             
         Returns:
-            List of place results if found in cache and not expired, otherwise empty list
+            The cached (possibly stale) results, or None if search() would call Google
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if page < 1 or page > MAX_PAGES:
+            return None
+        cached = self._get_from_cache(query, category, location, page=page)
+        return self._serve_cached(query, category, location, page, cached)
+    
+    def _serve_cached(self, query: str, category: str, location: str, page: int,
+                      cached: Optional[Tuple[List[Dict[str, Any]], timedelta, Optional[str]]]
+                      ) -> Optional[List[Dict[str, Any]]]:
+        """Serve a cache entry if it is fresh, or stale with stale-while-revalidate on; None otherwise."""
+        if not cached:
+            return None
+        cached_results, age, next_page_token = cached
+        soft_ttl, _ = self._ttls_for(category)
+        if age <= soft_ttl:
+            self._stats["fresh_hits"] += 1
+            logger.info(f"Using cached results for query: {query} in {location} (page {page})")
+            self._prefetch_next_page(query, category, location, page, next_page_token, age)
+            return cached_results
+        
+        if self.stale_while_revalidate:
+            # Answer now from the stale entry and refresh it off the request path
+            self._stats["stale_served"] += 1
+            logger.info(f"Serving stale cached results for query: {query} in {location} (page {page})")
+            self._schedule_refresh(query, category, location, page)
+            return [dict(result, stale=True) for result in cached_results]
+        return None
+    
+    def has_next_page(self, query: str, category: str, location: str, page: int = 1) -> bool:
+        """Whether Google reported another page after the given cached page.
         
-        # Calculate expiration date (6 months ago)
-        six_months_ago = (datetime.now() - timedelta(days=180)).isoformat()
+        Args:
+            query: Search query string
+            category: Business category
+            location: Location for the search
+            page: 1-based page that was just served
+        """
+        if page >= MAX_PAGES:
+            return False
+        if self._get_from_cache(query, category, location, max_age=None, page=page + 1):
+            return True
+        cached = self._get_from_cache(query, category, location, max_age=None, page=page)
+        return bool(cached and cached[2])
+    
+    def _fetch_page(self, query: str, category: str, location: str, page: int,
+                    priority: str = USER) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Fetch one page from the API and cache it with its next_page_token.
         
-        cursor.execute('''
-            SELECT response, timestamp FROM google_places_cache
-            WHERE query = ? AND category = ? AND location = ? AND timestamp > ?
-        ''', (query, category, location, six_months_ago))
+        Pages after the first need the previous page's token. If that token is
+        missing or too old to still be accepted, the previous page is refetched
+        first; if it is too new, we wait out Google's activation delay.
         
-        result = cursor.fetchone()
-        conn.close()
+        Args:
+            priority: USER or BACKGROUND, the budget priority of the calls
+        
+        Returns:
+            Tuple of (place results, next_page_token or None)
+        """
+        page_token = None
+        if page > 1:
+            previous = self._get_from_cache(query, category, location, max_age=None, page=page - 1)
+            token_age = previous[1] if previous else None
+            page_token = previous[2] if previous else None
+            if previous and not page_token:
+                # Google said there is no further page
+                return [], None
+            if not page_token or token_age.total_seconds() > PAGE_TOKEN_MAX_AGE:
+                _, page_token = self._fetch_page(query, category, location, page - 1, priority)
+                token_age = timedelta(0)
+            if not page_token:
+                return [], None
+            wait = self._page_token_delay - token_age.total_seconds()
+            if wait > 0:
+                time.sleep(wait)
+        
+        results, next_page_token = self._call_places_api(query, category, location, page_token, priority)
+        if results:
+            self._store_in_cache(query, category, location, results, page, next_page_token)
+        return results, next_page_token
+    
+    @property
+    def returns_contact_info(self) -> bool:
+        """Whether search results already carry phone and website (no details calls needed)."""
+        return self.backend == 'v1'
+    
+    @property
+    def _page_token_delay(self) -> float:
+        # Only legacy next_page_tokens need time to activate
+        return PAGE_TOKEN_DELAY if self.backend == 'legacy' else 0.0
+    
+    def _prefetch_next_page(self, query: str, category: str, location: str, page: int,
+                            next_page_token: Optional[str], age: timedelta) -> None:
+        """Fetch the page after this one in the background unless it is cached.
+        
+        Only tokens young enough to still be accepted are followed; the fetch
+        itself waits out the activation delay on the refresh pool.
+        """
+        if (not PREFETCH_NEXT_PAGE or not next_page_token or page >= MAX_PAGES
+                or age.total_seconds() > PAGE_TOKEN_MAX_AGE):
+            return
+        if self._get_from_cache(query, category, location, page=page + 1):
+            return
+        if self._schedule_refresh(query, category, location, page + 1):
+            self._stats["prefetches_scheduled"] += 1
+    
+    def _ttls_for(self, category: str) -> Tuple[timedelta, timedelta]:
+        """Get the (soft, hard) cache TTLs for a category."""
+        soft_days, hard_days = self.category_ttls.get(
+            (category or '').casefold(), (DEFAULT_SOFT_TTL_DAYS, DEFAULT_HARD_TTL_DAYS)
+        )
+        return timedelta(days=soft_days), timedelta(days=max(soft_days, hard_days))
+    
+    def _get_from_cache(self, query: str, category: str, location: str,
+                        max_age: Optional[timedelta] = timedelta.max,
+                        page: int = 1) -> Optional[Tuple[List[Dict[str, Any]], timedelta, Optional[str]]]:
+        """Get the newest cached results that are within the category's hard TTL.
+        
+        Args:
+            query: Search query string
+            category: Business category
+            location: Location for the search
+            max_age: Override for the hard TTL; None accepts entries of any age
+            page: 1-based result page
+            
+        Returns:
+            Tuple of (place results, age of the entry, next_page_token), or None
+            if nothing usable is cached
+        """
+        key = cache_key(query, category, location, page)
+        _, hard_ttl = self._ttls_for(category)
+        
+        entry = shared_cache.get('places', key)
+        if entry is None:
+            entry = self._read_cache_row(key)
+            if entry and shared_cache.shared:
+                # Warm the shared cache for other instances with what this one already has
+                age = datetime.now() - datetime.fromisoformat(entry['timestamp'])
+                shared_cache.set('places', key, entry, ttl=(hard_ttl - age).total_seconds())
+        if not entry or not entry['results']:
+            return None
+        
+        age = datetime.now() - datetime.fromisoformat(entry['timestamp'])
+        if max_age is not None and age >= min(hard_ttl, max_age):
+            return None
+        return entry['results'], age, entry['next_page_token']
+    
+    def _read_cache_row(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read one page from SQLite as {'results', 'timestamp', 'next_page_token'}, or None."""
+        with db_pool.connection(self.db_path) as conn:
+            row = conn.execute('''
+                SELECT response, timestamp, next_page_token FROM google_places_cache
+                WHERE cache_key = ?
+            ''', (key,)).fetchone()
+        
+        if not row:
+            return None
+        response_data, timestamp, next_page_token = row
+        return {
+            'results': serialization.loads(response_data),
+            'timestamp': timestamp,
+            'next_page_token': next_page_token
+        }
+    
+    def _schedule_refresh(self, query: str, category: str, location: str, page: int = 1) -> bool:
+        """Queue a background fetch for a cache entry, at most once per key.
+        
+        Args:
+            query: Search query string
+            category: Business category
+            location: Location for the search
+            page: 1-based result page
+            
+        Returns:
+            True if a fetch was queued
+        """
+        if not self.api_key or not self.budget.available(BACKGROUND):
+            return False
+        key = (query, category, location, page)
+        with self._refresh_lock:
+            if key in self._refreshing or len(self._refreshing) >= MAX_PENDING_REFRESHES:
+                self._stats["refreshes_skipped"] += 1
+                return False
+            self._stats["refreshes_scheduled"] += 1
+            self._refreshing[key] = self._executor().submit(self._refresh, key)
+        return True
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        """The background pool for refreshes, prefetches and compaction (call with _refresh_lock held)."""
+        if self._refresh_executor is None:
+            self._refresh_executor = ThreadPoolExecutor(
+                max_workers=REFRESH_WORKERS, thread_name_prefix='places-refresh'
+            )
+        return self._refresh_executor
+    
+    def _refresh(self, key: Tuple[str, str, str, int]) -> None:
+        """Fetch fresh results for a stale or prefetched page and store them."""
+        query, category, location, page = key
+        try:
+            results, _ = self._fetch_page(query, category, location, page, BACKGROUND)
+            if results:
+                if self.on_refresh:
+                    self.on_refresh(results, category, location)
+                self._stats["refreshes_completed"] += 1
+            else:
+                self._stats["refresh_failures"] += 1
+        except Exception as e:
+            self._stats["refresh_failures"] += 1
+            logger.error(f"Background refresh failed for {query} in {location}: {str(e)}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.pop(key, None)
+    
+    def _maybe_compact(self) -> None:
+        """Queue a compaction if COMPACT_INTERVAL_HOURS have passed since the last one.
         
-        if result:
-            response_data, timestamp = result
-            return json.loads(response_data)
+        Only the retention DELETE runs in-process; VACUUM rewrites the whole file
+        under an exclusive lock, so it is left to `python google_places_api.py compact`.
+        """
+        with self._refresh_lock:
+            now = time.monotonic()
+            if now < self._next_compaction:
+                return
+            self._next_compaction = now + COMPACT_INTERVAL_HOURS * 3600
+            self._executor().submit(self.compact)
+    
+    def compact(self, retention_days: int = CACHE_RETENTION_DAYS, vacuum: bool = False) -> Dict[str, Any]:
+        """Delete rows past retention, optionally rebuilding the file if much of it is free.
         
-        return []
+        Args:
+            retention_days: Age in days after which cached pages are deleted
+            vacuum: Whether to VACUUM once VACUUM_FREE_RATIO of the pages are free
+                (blocks every writer while it runs, so only the CLI passes True)
+            
+        Returns:
+            Dictionary with the number of deleted rows and whether the file was vacuumed
+        """
+        try:
+            cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+            with db_pool.connection(self.db_path) as conn:
+                deleted = conn.execute('DELETE FROM google_places_cache WHERE timestamp < ?', (cutoff,)).rowcount
+            
+            vacuumed = False
+            if vacuum:
+                with db_pool.connection(self.db_path) as conn:
+                    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+                    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                    vacuumed = bool(page_count) and free_pages / page_count >= VACUUM_FREE_RATIO
+                    if vacuumed:
+                        conn.execute('VACUUM')
+                        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            
+            self._last_compaction = {
+                "at": datetime.now().isoformat(),
+                "deleted": deleted,
+                "vacuumed": vacuumed
+            }
+            logger.info(f"Compacted google_places_cache: {deleted} rows deleted, vacuumed={vacuumed}")
+            return self._last_compaction
+        except Exception as e:
+            logger.error(f"Error compacting google_places_cache: {str(e)}")
+            return {"error": str(e)}
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return row count and size of the cache table and its database file."""
+        try:
+            with db_pool.connection(self.db_path) as conn:
+                rows, payload_bytes = conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(LENGTH(response)), 0) FROM google_places_cache'
+                ).fetchone()
+                page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+                page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+                free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error reading google_places_cache size: {str(e)}")
+            return {}
+        return {
+            "rows": rows,
+            "payload_bytes": payload_bytes,
+            "file_bytes": page_size * page_count,
+            "free_bytes": page_size * free_pages,
+            "last_compaction": self._last_compaction
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return cache freshness, size and background refresh counters."""
+        return dict(self._stats, backend=self.backend, refreshes_pending=len(self._refreshing),
+                    cache=self.cache_stats(), http=self.http.stats(), budget=self.budget.stats())
     
-    def _store_in_cache(self, query: str, category: str, location: str, results: List[Dict[str, Any]]) -> None:
+    def _store_in_cache(self, query: str, category: str, location: str, results: List[Dict[str, Any]],
+                        page: int = 1, next_page_token: Optional[str] = None) -> None:
         """Store API results in cache.
         
         Args:
@@ -131,40 +612,78 @@ class GooglePlacesAPI:
             category: Business category
             location: Location for the search
             results: List of place results to cache
+            page: 1-based result page
+            next_page_token: Token for the following page, if Google returned one
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Store with current timestamp
+        key = cache_key(query, category, location, page)
         timestamp = datetime.now().isoformat()
-        response_json = json.dumps(results)
+        response_blob = serialization.dumps(results)
+        
+        with db_pool.connection(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO google_places_cache
+                    (cache_key, query, category, location, response, timestamp, page, next_page_token)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    query = excluded.query, category = excluded.category, location = excluded.location,
+                    response = excluded.response, timestamp = excluded.timestamp,
+                    next_page_token = excluded.next_page_token
+            ''', (key, query, category, location, response_blob, timestamp, page, next_page_token))
         
-        cursor.execute('''
-            INSERT INTO google_places_cache (query, category, location, response, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (query, category, location, response_json, timestamp))
+        _, hard_ttl = self._ttls_for(category)
+        shared_cache.set('places', key, {
+            'results': results,
+            'timestamp': timestamp,
+            'next_page_token': next_page_token
+        }, ttl=hard_ttl.total_seconds())
         
-        conn.commit()
-        conn.close()
+        logger.info(f"Cached {len(results)} results for query: {query} in {location} (page {page})")
+        self._maybe_compact()
+    
+    def _send(self, method: str, url: str, endpoint: str, priority: str, **kwargs: Any):
+        """Make one Places call if the budget allows it, and log it with the monitor.
         
-        logger.info(f"Cached {len(results)} results for query: {query} in {location}")
+        Raises:
+            BudgetExhaustedError: If the budget refuses a call of this priority
+            CircuitOpenError: If the circuit breaker is open
+            requests.RequestException: If every attempt failed
+        """
+        if not self.budget.acquire(priority):
+            raise BudgetExhaustedError(f"Places budget refused a {priority} {endpoint} call")
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, url, **kwargs)
+        except CircuitOpenError:
+            self.budget.refund()
+            raise
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            self.budget.record(endpoint, (time.perf_counter() - started) * 1000,
+                               getattr(response, 'status_code', None), str(e))
+            raise
+        self.budget.record(endpoint, (time.perf_counter() - started) * 1000, response.status_code)
+        return response
     
-    def _call_places_api(self, query: str, category: str, location: str) -> List[Dict[str, Any]]:
+    def _call_places_api(self, query: str, category: str, location: str, page_token: Optional[str] = None,
+                         priority: str = USER) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """Call Google Places API and format the results.
         
         Args:
             query: Search query string
             category: Business category
             location: Location for the search
+            page_token: next_page_token from the previous page, for pages after the first
+            priority: USER or BACKGROUND, the budget priority of the call
             
         Returns:
-            List of formatted place results
+            Tuple of (formatted place results, next_page_token or None)
         """
+        if self.backend == 'v1':
+            return self._call_places_api_v1(query, category, location, page_token, priority)
         try:
             # Construct the search query
-            search_query = f"{category} in {location}"
-            if query:
-                search_query = f"{query} {search_query}"
+            search_query = search_text(query, category, location)
                 
             # Call Google Places API - Text Search
             url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
@@ -172,14 +691,15 @@ class GooglePlacesAPI:
                 "query": search_query,
                 "key": self.api_key
             }
+            if page_token:
+                params["pagetoken"] = page_token
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            response = self._send('GET', url, 'textsearch', priority, params=params)
             data = response.json()
             
             if data.get("status") != "OK":
                 logger.error(f"API error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
-                return []
+                return [], None
             
             # Format the results
             formatted_results = []
@@ -188,17 +708,86 @@ class GooglePlacesAPI:
                 if formatted_place:
                     formatted_results.append(formatted_place)
             
-            # Handle pagination if needed
-            next_page_token = data.get("next_page_token")
-            if next_page_token:
-                # Could implement pagination here if needed
-                pass
-                
-            return formatted_results
+            return formatted_results, data.get("next_page_token")
             
         except Exception as e:
             logger.error(f"Error calling Google Places API: {str(e)}")
-            return []
+            return [], None
+    
+    def _call_places_api_v1(self, query: str, category: str, location: str, page_token: Optional[str] = None,
+                            priority: str = USER) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Call Places API (New) Text Search with a field mask and location bias.
+        
+        Args:
+            query: Search query string
+            category: Business category
+            location: Location for the search
+            page_token: nextPageToken from the previous page, for pages after the first
+            priority: USER or BACKGROUND, the budget priority of the call
+            
+        Returns:
+            Tuple of (formatted place results, nextPageToken or None)
+        """
+        try:
+            search_query = search_text(query, category, location)
+            
+            headers = {
+                "X-Goog-Api-Key": self.api_key,
+                "X-Goog-FieldMask": V1_SEARCH_FIELDS
+            }
+            body = {
+                "textQuery": search_query,
+                "locationBias": location_bias(location),
+                "pageSize": 20,
+                "languageCode": "en"
+            }
+            if page_token:
+                body["pageToken"] = page_token
+            
+            response = self._send('POST', V1_SEARCH_URL, 'places:searchText', priority, headers=headers, json=body)
+            data = response.json()
+            
+            formatted_results = []
+            for place in data.get("places", []):
+                formatted_place = self._format_place_result_v1(place)
+                if formatted_place:
+                    formatted_results.append(formatted_place)
+            
+            return formatted_results, data.get("nextPageToken")
+            
+        except Exception as e:
+            logger.error(f"Error calling Places API (New): {str(e)}")
+            return [], None
+    
+    def _format_place_result_v1(self, place: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Format a Places API (New) place into our standard format.
+        
+        Args:
+            place: Place object limited to V1_SEARCH_FIELDS
+            
+        Returns:
+            Formatted place dictionary or None if invalid
+        """
+        name = (place.get("displayName") or {}).get("text", "")
+        if not name:
+            return None
+        formatted_place = {
+            "name": name,
+            "address": place.get("formattedAddress", ""),
+            "phone": place.get("nationalPhoneNumber", ""),
+            "website": place.get("websiteUri", ""),
+            "rating": place.get("rating", 0.0),
+            "reviews": place.get("userRatingCount", 0),
+            "image_url": "",
+            "timestamp": datetime.now().isoformat()
+        }
+        if place.get("id"):
+            formatted_place["place_id"] = place["id"]
+        point = place.get("location") or {}
+        if point.get("latitude") is not None and point.get("longitude") is not None:
+            formatted_place["latitude"] = point["latitude"]
+            formatted_place["longitude"] = point["longitude"]
+        return formatted_place
     
     def _format_place_result(self, place: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Format a Google Places API result into our standard format.
@@ -214,8 +803,8 @@ class GooglePlacesAPI:
             formatted_place = {
                 "name": place.get("name", ""),
                 "address": place.get("formatted_address", ""),
-                "phone": "",  # Requires a details request to get phone
-                "website": "",  # Requires a details request to get website
+                "phone": "",  # Filled in from a details request (see enrichment.py)
+                "website": "",  # Filled in from a details request (see enrichment.py)
                 "rating": place.get("rating", 0.0),
                 "reviews": place.get("user_ratings_total", 0),
                 "image_url": "",
@@ -228,17 +817,18 @@ class GooglePlacesAPI:
                 if photo_reference:
                     formatted_place["image_url"] = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_reference}&key={self.api_key}"
             
+            # Coordinates for radius searches (see geo.py)
+            point = (place.get("geometry") or {}).get("location") or {}
+            if point.get("lat") is not None and point.get("lng") is not None:
+                formatted_place["latitude"] = point["lat"]
+                formatted_place["longitude"] = point["lng"]
+            
             # Get place ID for potential details lookup
             place_id = place.get("place_id")
             if place_id:
                 formatted_place["place_id"] = place_id
-                
-                # Optionally fetch additional details (phone, website)
-                # This would require an additional API call per place
-                # details = self._get_place_details(place_id)
-                # if details:
-                #     formatted_place["phone"] = details.get("phone", "")
-                #     formatted_place["website"] = details.get("website", "")
+                # Phone and website are filled in by enrichment.PlaceEnricher,
+                # which batches and caches the per-place details calls
             
             return formatted_place
             
@@ -255,6 +845,8 @@ class GooglePlacesAPI:
         Returns:
             Dictionary with additional place details
         """
+        if self.backend == 'v1':
+            return self._get_place_details_v1(place_id)
         try:
             url = "https://maps.googleapis.com/maps/api/place/details/json"
             params = {
@@ -263,8 +855,7 @@ class GooglePlacesAPI:
                 "key": self.api_key
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            response = self._send('GET', url, 'details', BACKGROUND, params=params)
             data = response.json()
             
             if data.get("status") != "OK":
@@ -277,6 +868,31 @@ class GooglePlacesAPI:
                 "website": result.get("website", "")
             }
             
+        except BudgetExhaustedError:
+            # Details are optional; the place is enriched once the budget allows it
+            return {}
+        except Exception as e:
+            logger.error(f"Error getting place details: {str(e)}")
+            return {}
+    
+    def _get_place_details_v1(self, place_id: str) -> Dict[str, Any]:
+        """Get phone and website for a place from Places API (New)."""
+        try:
+            headers = {
+                "X-Goog-Api-Key": self.api_key,
+                "X-Goog-FieldMask": V1_DETAILS_FIELDS
+            }
+            response = self._send('GET', V1_PLACE_URL.format(place_id=place_id), 'places:get', BACKGROUND,
+                                  headers=headers)
+            result = response.json()
+            return {
+                "phone": result.get("nationalPhoneNumber", ""),
+                "website": result.get("websiteUri", "")
+            }
+            
+        except BudgetExhaustedError:
+            # Details are optional; the place is enriched once the budget allows it
+            return {}
         except Exception as e:
             logger.error(f"Error getting place details: {str(e)}")
             return {}
@@ -291,3 +907,23 @@ class GooglePlacesAPI:
             Dictionary with place details
         """
         return self._get_place_details(place_id)
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Show cache size:              python google_places_api.py status")
+    print("  Compact the cache:            python google_places_api.py compact")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) != 2 or sys.argv[1].lower() not in ('status', 'compact'):
+        print_usage()
+        sys.exit(1)
+
+    api = GooglePlacesAPI()
+    if sys.argv[1].lower() == 'compact':
+        print(json.dumps(api.compact(vacuum=True)))
+    print(json.dumps(api.cache_stats(), indent=2))
@@ -0,0 +1,12 @@
+"""
+Gunicorn server hooks for Tradepro Finder Toronto.
+"""
+
+
+def worker_exit(server, worker):
+    """Write out queued search cache rows and API call logs before a worker exits."""
+    from search_cache import search_cache_writer
+    from api_budget import places_budget
+    search_cache_writer.drain()
+    if places_budget.monitor is not None:
+        places_budget.monitor.writer.drain()
@@ -0,0 +1,242 @@
+"""
+Resilient HTTP client for Google Places calls.
+
+Bare requests.get calls paid a new TLS handshake every time and had no
+timeout, so a hung upstream could pin a gunicorn worker for the whole request
+timeout. This client provides:
+
+1. A pooled requests.Session per process (keep-alive, reused TLS connections)
+2. Connect/read timeouts plus an overall deadline per call (API_TIMEOUT)
+3. Up to MAX_RETRIES retries on 429/5xx and connection errors, with full-jitter
+   exponential backoff that honours Retry-After
+4. A circuit breaker that fails fast while Google is degraded, so callers can
+   fall back to cached data immediately
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Optional
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from config.base import BaseConfig
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 3.05))
+BACKOFF_BASE = float(os.getenv('API_BACKOFF_BASE', 0.25))
+BACKOFF_MAX = float(os.getenv('API_BACKOFF_MAX', 4))
+BREAKER_THRESHOLD = int(os.getenv('API_BREAKER_THRESHOLD', 5))
+BREAKER_RESET = float(os.getenv('API_BREAKER_RESET', 30))
+POOL_MAXSIZE = int(os.getenv('API_POOL_MAXSIZE', 10))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial call."""
+
+    def __init__(self, failure_threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        """Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failed calls before the circuit opens
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream right now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: let exactly one trial call through
+            if self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.times_opened += 1
+                    logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+class HTTPClient:
+    """Pooled HTTP client with timeouts, retries and a circuit breaker."""
+
+    def __init__(self, timeout: float = BaseConfig.API_TIMEOUT, max_retries: int = BaseConfig.MAX_RETRIES,
+                 connect_timeout: float = CONNECT_TIMEOUT, breaker: Optional[CircuitBreaker] = None):
+        """Initialize the client.
+
+        Args:
+            timeout: Overall deadline in seconds for one call, retries included
+            max_retries: Retries after the first attempt
+            connect_timeout: TCP/TLS connect timeout per attempt
+            breaker: Circuit breaker shared by every call through this client
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._session_lock = threading.Lock()
+        # Extra transports by URL prefix (e.g. the offline replay adapter)
+        self._mounts: Dict[str, BaseAdapter] = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    def configure(self, timeout: Optional[float] = None, max_retries: Optional[int] = None) -> None:
+        """Update the deadline and retry budget (e.g. from the Flask config)."""
+        if timeout is not None:
+            self.timeout = timeout
+        if max_retries is not None:
+            self.max_retries = max_retries
+
+    @property
+    def session(self) -> requests.Session:
+        """The process-local session (recreated after a fork)."""
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                for prefix, transport in self._mounts.items():
+                    session.mount(prefix, transport)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def mount(self, prefix: str, transport: BaseAdapter) -> None:
+        """Route URLs starting with prefix through a custom transport adapter.
+
+        The mount is kept across forks, unlike mounting on the session directly.
+        """
+        with self._session_lock:
+            self._mounts[prefix] = transport
+            if self._session is not None:
+                self._session.mount(prefix, transport)
+
+    def available(self) -> bool:
+        """Whether upstream calls are currently allowed (circuit not open)."""
+        return self.breaker.state != 'open'
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Delay before the next attempt: Retry-After if given, else full jitter."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), BACKOFF_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request with retries, returning the final successful response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.RequestException: If every attempt failed
+        """
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(f"Circuit open; not calling {url}")
+
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            response = None
+            try:
+                self.requests += 1
+                response = self.session.request(
+                    method, url,
+                    timeout=(self.connect_timeout, max(remaining, 0.1)),
+                    **kwargs
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    self.breaker.record_success()
+                    return response
+                error: Exception = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            except requests.HTTPError as e:
+                # Non-retryable 4xx: upstream is healthy, the request is not
+                self.breaker.record_success()
+                raise e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.RequestException:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+
+            delay = self._backoff(attempt, response)
+            if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"Retrying {url} in {delay:.2f}s (attempt {attempt}): {str(error)}")
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request, retry and circuit breaker counters."""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries
+        }
+
+
+# Shared client for Google Places calls
+places_client = HTTPClient()
@@ -19,6 +19,8 @@ import csv
 import sqlite3
 import logging
 from datetime import datetime
+from schema import migrate, provider_key
+from ranking import rank_changed_pairs
 
 # Configure logging
 logging.basicConfig(
@@ -46,22 +48,8 @@ def import_from_csv(csv_file):
     conn = sqlite3.connect('service_providers.db')
     cursor = conn.cursor()
     
-    # Create table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS service_providers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            category TEXT,
-            location TEXT,
-            address TEXT,
-            phone TEXT,
-            website TEXT,
-            rating REAL,
-            reviews INTEGER,
-            image_url TEXT,
-            timestamp TEXT
-        )
-    ''')
+    # Create or upgrade the table to the canonical schema
+    migrate(conn)
     
     # Read CSV and import data
     try:
@@ -100,16 +88,28 @@ def import_from_csv(csv_file):
                         rating,  # rating
                         reviews, # reviews
                         row[8],  # image_url
-                        timestamp # timestamp
+                        timestamp, # timestamp
+                        provider_key(row[0], row[3]) # dedupe_key
                     ))
             
-            # Insert data
+            # Insert data, updating businesses that are already present
             cursor.executemany('''
                 INSERT INTO service_providers 
-                (name, category, location, address, phone, website, rating, reviews, image_url, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (name, category, location, address, phone, website, rating, reviews, image_url, timestamp, dedupe_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dedupe_key) DO UPDATE SET
+                    category = excluded.category,
+                    location = excluded.location,
+                    phone = excluded.phone,
+                    website = excluded.website,
+                    rating = excluded.rating,
+                    reviews = excluded.reviews,
+                    image_url = excluded.image_url,
+                    timestamp = excluded.timestamp
             ''', businesses)
             
+            # Readers only read stored rankings, so rank the imported pairs before committing
+            rank_changed_pairs(conn)
             conn.commit()
             logger.info(f"Successfully imported {len(businesses)} businesses from {csv_file}")
             return True
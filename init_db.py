@@ -6,6 +6,9 @@ This script creates and seeds the necessary database files for the application.
 import os
 import sqlite3
 import logging
+from schema import migrate, provider_key
+from ranking import rank_changed_pairs
+from search_cache import ensure_table as ensure_search_cache_table
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,36 +26,8 @@ def init_service_providers_db():
     conn = sqlite3.connect('service_providers.db')
     cursor = conn.cursor()
     
-    # Create service_providers table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS service_providers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            category TEXT,
-            location TEXT,
-            address TEXT,
-            phone TEXT,
-            website TEXT,
-            rating REAL,
-            reviews INTEGER,
-            image_url TEXT,
-            timestamp TEXT
-        )
-    ''')
-    
-    # Create quote_requests table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quote_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            service TEXT,
-            location TEXT,
-            description TEXT,
-            timestamp TEXT
-        )
-    ''')
+    # Create or upgrade the canonical tables, indexes and triggers
+    migrate(conn)
     
     # Check if the table is empty
     cursor.execute('SELECT COUNT(*) FROM service_providers')
@@ -133,12 +108,14 @@ def init_service_providers_db():
         ]
         
         cursor.executemany('''
-            INSERT INTO service_providers (name, category, location, address, phone, website, rating, reviews, image_url, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', sample_data)
+            INSERT INTO service_providers (name, category, location, address, phone, website, rating, reviews, image_url, timestamp, dedupe_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (provider_key(row[0], row[3]),) for row in sample_data])
         
         logger.info(f"Seeded service_providers table with {len(sample_data)} records")
     
+    # Readers only read stored rankings, so rank whatever was just written
+    rank_changed_pairs(conn)
     conn.commit()
     conn.close()
     logger.info("Service providers database initialized successfully")
@@ -148,19 +125,9 @@ def init_search_cache_db():
     ensure_directory_exists('data')
     
     conn = sqlite3.connect('data/search_cache.db')
-    cursor = conn.cursor()
     
-    # Create search_cache table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS search_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            service TEXT,
-            location TEXT,
-            results TEXT,
-            timestamp TEXT,
-            UNIQUE(service, location)
-        )
-    ''')
+    # Create search_cache table if it doesn't exist (rebuilding an older layout)
+    ensure_search_cache_table(conn)
     
     conn.commit()
     conn.close()
@@ -1,18 +1,121 @@
-import sqlite3
-import json
-from datetime import datetime, timedelta
+"""
+Tiered key/value cache for Tradepro Finder Toronto.
+
+Every find_one used to open SQLite, run a query, decode the stored value and
+log twice, even for keys read milliseconds earlier. LocalCache now keeps:
+
+1. A bounded in-process LRU of decoded entries, honouring each row's expiry
+2. SQLite (local_cache.db) as the tier shared by this instance's workers:
+   replace_one writes through to every tier, delete_one removes from all
+3. Per-key change versions maintained by triggers, so a worker drops memory
+   entries that another worker replaced or deleted; the version counter is
+   probed at most once per check interval, so hot keys never touch disk
+4. The configured shared cache backend (Redis when CACHE_TYPE is 'redis')
+   between the memory tier and SQLite, so other instances see replaced keys;
+   while it is in use, memory entries live at most one check interval
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, NamedTuple
 import logging
+import db_pool
+import serialization
+from cache_backend import shared_cache
 
 logger = logging.getLogger(__name__)
 
+MEMORY_ENTRIES = int(os.getenv('LOCAL_CACHE_MEMORY_ENTRIES', 1024))
+CHECK_INTERVAL = float(os.getenv('LOCAL_CACHE_CHECK_INTERVAL', 1.0))
+
+TABLE = 'cached_results'
+
+
+def utc_now() -> datetime:
+    """Current UTC time without tzinfo, the form stored timestamps and expiries are written in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def install_version_tracking(conn) -> None:
+    """Create the change counter and per-key versions bumped by cached_results triggers.
+
+    Args:
+        conn: Open connection to the local cache database
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)', (TABLE,))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cache_key_versions (
+            cache_key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    bump = f'''
+        UPDATE data_versions SET version = version + 1 WHERE name = '{TABLE}';
+        INSERT INTO cache_key_versions (cache_key, version)
+        VALUES ({{row}}.cache_key, (SELECT version FROM data_versions WHERE name = '{TABLE}'))
+        ON CONFLICT (cache_key) DO UPDATE SET version = excluded.version;
+    '''
+    triggers = {
+        'INSERT': bump.format(row='NEW'),
+        'UPDATE': bump.format(row='NEW'),
+        'DELETE': bump.format(row='OLD')
+    }
+    for event, body in triggers.items():
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{TABLE}_version_{event.lower()}
+            AFTER {event} ON {TABLE}
+            BEGIN
+                {body}
+            END
+        ''')
+
+
+class _Entry(NamedTuple):
+    """A decoded cache row held in memory."""
+    doc: Dict[str, Any]
+    expiry: datetime
+    version: int
+
+
 class LocalCache:
-    def __init__(self, db_path='local_cache.db'):
+    def __init__(self, db_path='local_cache.db', max_entries: int = MEMORY_ENTRIES,
+                 check_interval: float = CHECK_INTERVAL):
+        """Initialize the cache.
+
+        Args:
+            db_path: SQLite database shared by every worker
+            max_entries: Entries kept in the in-process LRU
+            check_interval: Seconds between probes for changes made by other workers
+        """
         self.db_path = db_path
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_version = 0
+        self._next_check = 0.0
+
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
         logger.info(f"Initializing LocalCache with database: {db_path}")
         self._init_db()
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with db_pool.connection(self.db_path) as conn:
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS cached_results (
                     cache_key TEXT PRIMARY KEY,
@@ -21,70 +124,168 @@ class LocalCache:
                     expiry TIMESTAMP
                 )
             ''')
-            conn.commit()
+            install_version_tracking(conn)
+            self._seen_version = self._read_version(conn)
             logger.info(f"Initialized cache database: {self.db_path}")
 
+    @staticmethod
+    def _read_version(conn) -> int:
+        row = conn.execute('SELECT version FROM data_versions WHERE name = ?', (TABLE,)).fetchone()
+        return row[0] if row else 0
+
+    def _sync(self) -> None:
+        """Drop memory entries changed by other workers since the last probe."""
+        if time.monotonic() < self._next_check:
+            return
+        try:
+            with db_pool.connection(self.db_path) as conn:
+                version = self._read_version(conn)
+                changed = []
+                if version != self._seen_version:
+                    changed = conn.execute(
+                        'SELECT cache_key, version FROM cache_key_versions WHERE version > ?', (self._seen_version,)
+                    ).fetchall()
+        except Exception as e:
+            logger.error(f"[CACHE] Error checking for changes: {str(e)}")
+            return
+        with self._lock:
+            for cache_key, key_version in changed:
+                entry = self._entries.get(cache_key)
+                if entry is not None and key_version > entry.version:
+                    del self._entries[cache_key]
+                    self.invalidations += 1
+            self._seen_version = max(self._seen_version, version)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _remember(self, cache_key: str, entry: _Entry) -> None:
+        if shared_cache.shared:
+            # Other instances' changes bump no local version, so only keep entries briefly
+            latest = utc_now() + timedelta(seconds=self.check_interval)
+            entry = entry._replace(expiry=min(entry.expiry, latest))
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
     def find_one(self, query):
+        """Return {'results', 'timestamp'} for an unexpired key, or None.
+
+        The returned results are shared with the memory tier; treat them as read-only.
+        """
         try:
             cache_key = query.get('cache_key')
-            logger.info(f"[CACHE] Looking for key: {cache_key}")
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute(
-                    'SELECT results, timestamp, expiry FROM cached_results WHERE cache_key = ? AND expiry > ?',
-                    (cache_key, datetime.utcnow().isoformat())
-                )
-                row = cursor.fetchone()
-                if row:
-                    expiry_date = datetime.fromisoformat(row[2])
-                    time_left = expiry_date - datetime.utcnow()
-                    logger.info(f"[CACHE] HIT! Key: {cache_key}, expires in {time_left.days} days")
-                    return {
-                        'results': json.loads(row[0]),
-                        'timestamp': row[1]
-                    }
-                logger.info(f"[CACHE] MISS! Key: {cache_key}")
-                return None
+            self._sync()
+
+            with self._lock:
+                entry = self._entries.get(cache_key)
+                if entry is not None:
+                    if entry.expiry > utc_now():
+                        self._entries.move_to_end(cache_key)
+                        self.memory_hits += 1
+                        return dict(entry.doc)
+                    del self._entries[cache_key]
+
+            shared = shared_cache.get('local', cache_key)
+            if shared is not None:
+                expiry = datetime.fromisoformat(shared['expiry'])
+                if expiry > utc_now():
+                    doc = {'results': shared['results'], 'timestamp': shared['timestamp']}
+                    self._remember(cache_key, _Entry(doc, expiry, self._seen_version))
+                    self.shared_hits += 1
+                    return dict(doc)
+
+            with db_pool.connection(self.db_path) as conn:
+                row = conn.execute('''
+                    SELECT c.results, c.timestamp, c.expiry, COALESCE(v.version, 0)
+                    FROM cached_results c LEFT JOIN cache_key_versions v ON v.cache_key = c.cache_key
+                    WHERE c.cache_key = ? AND c.expiry > ?
+                ''', (cache_key, utc_now().isoformat())).fetchone()
+            if row:
+                doc = {
+                    'results': serialization.loads(row[0]),
+                    'timestamp': row[1]
+                }
+                self._remember(cache_key, _Entry(doc, datetime.fromisoformat(row[2]), row[3]))
+                self.disk_hits += 1
+                if shared_cache.shared:
+                    self._share(cache_key, doc, row[2])
+                logger.debug(f"[CACHE] HIT! Key: {cache_key}")
+                return dict(doc)
+            self.misses += 1
+            logger.debug(f"[CACHE] MISS! Key: {cache_key}")
+            return None
         except Exception as e:
             logger.error(f"[CACHE] Error retrieving from cache: {str(e)}")
             return None
 
     def replace_one(self, query, new_doc, upsert=True):
+        """Store a value in SQLite, the shared cache and the memory tier."""
         try:
             cache_key = query.get('cache_key') or new_doc.get('cache_key')
-            logger.info(f"[CACHE] Storing results for key: {cache_key}")
-            
-            with sqlite3.connect(self.db_path) as conn:
+            timestamp = new_doc.get('timestamp').isoformat()
+            expiry = new_doc.get('expiry')
+
+            with db_pool.connection(self.db_path) as conn:
                 conn.execute(
                     'INSERT OR REPLACE INTO cached_results (cache_key, results, timestamp, expiry) VALUES (?, ?, ?, ?)',
                     (
                         cache_key,
-                        json.dumps(new_doc.get('results')),
-                        new_doc.get('timestamp').isoformat(),
-                        new_doc.get('expiry').isoformat()
+                        serialization.dumps(new_doc.get('results')),
+                        timestamp,
+                        expiry.isoformat()
                     )
                 )
-                conn.commit()
-                logger.info(f"[CACHE] Successfully stored results for key: {cache_key}")
+                version = conn.execute(
+                    'SELECT version FROM cache_key_versions WHERE cache_key = ?', (cache_key,)
+                ).fetchone()[0]
+
+            doc = {'results': new_doc.get('results'), 'timestamp': timestamp}
+            self._remember(cache_key, _Entry(doc, expiry, version))
+            self._share(cache_key, doc, expiry.isoformat())
+            logger.debug(f"[CACHE] Stored results for key: {cache_key}")
             return True
         except Exception as e:
             logger.error(f"[CACHE] Error caching results: {str(e)}")
             return False
 
     def delete_one(self, query):
+        """Remove a key from every tier."""
         try:
             cache_key = query.get('cache_key')
-            logger.info(f"[CACHE] Deleting key: {cache_key}")
-            
-            with sqlite3.connect(self.db_path) as conn:
+
+            with db_pool.connection(self.db_path) as conn:
                 conn.execute('DELETE FROM cached_results WHERE cache_key = ?', (cache_key,))
-                conn.commit()
-                logger.info(f"[CACHE] Successfully deleted key: {cache_key}")
+            shared_cache.delete('local', cache_key)
+            with self._lock:
+                self._entries.pop(cache_key, None)
+            logger.debug(f"[CACHE] Deleted key: {cache_key}")
             return True
         except Exception as e:
             logger.error(f"[CACHE] Error deleting from cache: {str(e)}")
             return False
 
+    @staticmethod
+    def _share(cache_key: str, doc: Dict[str, Any], expiry: str) -> None:
+        """Copy an entry to the shared cache until its expiry."""
+        ttl = (datetime.fromisoformat(expiry) - utc_now()).total_seconds()
+        shared_cache.set('local', cache_key, dict(doc, expiry=expiry), ttl=ttl)
+
     def create_index(self, *args, **kwargs):
         # SQLite automatically creates indexes for PRIMARY KEY
         pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory tier size and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Coordinates of GTA locations for Tradepro Finder Toronto.
+
+Radius searches, the Places (New) locationBias circles and the offline replay
+all need a point for a location name. The coordinates live here, apart from
+the Google client and its HTTP and budget stack, so the storage modules that
+use them (geo.py, and through it schema.py) stay light to import:
+
+1. LOCATION_CENTERS places the GTA municipalities and Toronto's boroughs
+2. location_point places any name, using the cities CSV's coordinates for
+   municipalities and neighbourhoods and LOCATION_CENTERS for the rest
+
+Usage:
+    python locations.py <location> [...]    Print the coordinates of locations
+"""
+
+import sys
+import logging
+from typing import Dict, Optional, Tuple
+from resolver import location_key, read_location_points, resolver
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TORONTO_CENTER = (43.6532, -79.3832)
+# Centres of the GTA municipalities and Toronto's boroughs
+LOCATION_CENTERS = {
+    'ajax': (43.8509, -79.0204),
+    'aurora': (44.0065, -79.4504),
+    'brampton': (43.7315, -79.7624),
+    'brock': (44.3400, -79.1000),
+    'burlington': (43.3255, -79.7990),
+    'caledon': (43.8668, -79.8580),
+    'clarington': (43.9350, -78.6080),
+    'east gwillimbury': (44.1000, -79.4333),
+    'etobicoke': (43.6205, -79.5132),
+    'georgina': (44.2960, -79.4360),
+    'halton hills': (43.6300, -79.9500),
+    'king': (43.9260, -79.5280),
+    'markham': (43.8561, -79.3370),
+    'milton': (43.5183, -79.8774),
+    'mississauga': (43.5890, -79.6441),
+    'newmarket': (44.0592, -79.4613),
+    'north york': (43.7615, -79.4111),
+    'oakville': (43.4675, -79.6877),
+    'oshawa': (43.8971, -78.8658),
+    'pickering': (43.8384, -79.0868),
+    'richmond hill': (43.8828, -79.4403),
+    'scarborough': (43.7764, -79.2318),
+    'scugog': (44.1048, -78.9446),
+    'toronto': TORONTO_CENTER,
+    'uxbridge': (44.1090, -79.1210),
+    'vaughan': (43.8361, -79.4983),
+    'whitby': (43.8975, -78.9429),
+    'whitchurch stouffville': (43.9710, -79.2450),
+}
+
+
+_location_points: Optional[Dict[str, Tuple[float, float]]] = None
+
+
+def location_point(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Coordinates of a location, or None if it cannot be placed.
+
+    Names are resolved first, so "north-york" and "the annex" are found; a name
+    ending in a known place ("Downtown Toronto") is placed at that place.
+    """
+    global _location_points
+    if _location_points is None:
+        points = {location_key(name): point for name, point in read_location_points().items()}
+        for name, point in LOCATION_CENTERS.items():
+            points.setdefault(location_key(name), point)
+        _location_points = points
+
+    words = location_key(resolver.resolve_location(location)).split(' ')
+    for start in range(len(words)):
+        point = _location_points.get(' '.join(words[start:]))
+        if point:
+            return point
+    return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  Print coordinates:            python locations.py <location> [...]")
+        sys.exit(1)
+
+    for name in sys.argv[1:]:
+        point = location_point(name)
+        print(f"{name}: {point[0]:.4f}, {point[1]:.4f}" if point else f"{name}: unknown location")
@@ -0,0 +1,196 @@
+"""
+Rendered page cache for Tradepro Finder Toronto.
+
+Service pages are expensive to render but rarely change. This cache keeps the
+rendered output in memory with:
+
+1. A byte budget enforced with LRU eviction, so random crawler slugs cannot
+   grow worker memory without bound
+2. A TTL per entry, so pages refresh even without an explicit invalidation
+3. Keys built from the normalized (category, location) pair rather than the raw
+   slug, so slug variants share one entry
+4. Per-pair versions from the taxonomy snapshot, so an entry is dropped as soon
+   as providers for its pair change in any worker; a neighbourhood page showing
+   its municipality's providers also tracks the municipality's pair
+5. Pre-encoded bytes, optionally pre-gzipped, so hits do no encoding work
+"""
+
+import os
+import gzip
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+from taxonomy import normalize_pair, snapshot as taxonomy_snapshot
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+DEFAULT_TTL = int(os.getenv('PAGE_CACHE_TTL', 600))
+DEFAULT_GZIP = os.getenv('PAGE_CACHE_GZIP', 'true').lower() == 'true'
+
+# Pages smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+class CachedPage(NamedTuple):
+    """A rendered page ready to be served."""
+    body: bytes
+    gzipped: Optional[bytes]
+    version: Tuple[int, ...]
+    expires_at: float
+    # Location whose providers the page shows, when not its own
+    fallback_location: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + (len(self.gzipped) if self.gzipped else 0)
+
+
+class PageCache:
+    """Byte-bounded LRU cache of rendered pages with TTL and versioning."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: int = DEFAULT_TTL,
+                 compress: bool = DEFAULT_GZIP, versions=taxonomy_snapshot):
+        """Initialize the page cache.
+
+        Args:
+            max_bytes: Total size budget for cached bodies
+            ttl: Seconds a page stays fresh
+            compress: Whether to store a gzipped copy alongside each page
+            versions: Source of per-pair versions (anything with pair_version())
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress = compress
+        self.versions = versions
+        self._entries: "OrderedDict[Tuple[str, str], CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _current_version(self, category: str, location: str,
+                         fallback_location: Optional[str] = None) -> Tuple[int, ...]:
+        """Versions of the page's own pair and, for a fallback page, of the pair it shows."""
+        locations = (location, fallback_location) if fallback_location else (location,)
+        try:
+            return tuple(self.versions.pair_version(category, loc) for loc in locations)
+        except Exception as e:
+            logger.error(f"Error reading page version: {str(e)}")
+            return (0,) * len(locations)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry.size
+
+    def get(self, category: str, location: str) -> Optional[CachedPage]:
+        """Return a fresh cached page for the pair, or None.
+
+        Args:
+            category: Service category
+            location: Location of the page
+        """
+        key = normalize_pair(category, location)
+        with self._lock:
+            entry = self._entries.get(key)
+        version = self._current_version(category, location, entry.fallback_location if entry else None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if entry.version != version:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, category: str, location: str, page: str,
+            fallback_location: Optional[str] = None) -> CachedPage:
+        """Encode and store a rendered page.
+
+        Args:
+            category: Service category
+            location: Location of the page
+            page: Rendered HTML
+            fallback_location: Location whose providers the page shows instead of its own
+
+        Returns:
+            The cached entry (also usable to serve the current request)
+        """
+        key = normalize_pair(category, location)
+        body = page.encode('utf-8')
+        gzipped = None
+        if self.compress and len(body) >= GZIP_MIN_SIZE:
+            gzipped = gzip.compress(body, compresslevel=6)
+        entry = CachedPage(
+            body=body,
+            gzipped=gzipped,
+            version=self._current_version(category, location, fallback_location),
+            expires_at=time.monotonic() + self.ttl,
+            fallback_location=fallback_location
+        )
+        if entry.size > self.max_bytes:
+            # Too large to ever fit; serve it without caching
+            return entry
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, category: str, location: str) -> None:
+        """Drop the cached page for a pair in this process."""
+        key = normalize_pair(category, location)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every cached page."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+
+# Shared cache for rendered service pages
+service_pages = PageCache()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Google Places API.
+
+Load tests and benchmarks used to spend real Google quota. ReplayTransport is a
+requests transport adapter, mounted on the shared HTTP client, that answers
+Places calls from a recording instead of the network:
+
+1. Legacy textsearch/details and Places API (New) searchText/details requests
+   are all answered from one recording, rendered in each endpoint's format
+   (field masks included)
+2. Recordings are exported from google_places_cache and place_details_cache,
+   or written by hand as JSON fixtures
+3. Latency, timeouts, an error rate, a rate limit (429 with Retry-After) and the
+   legacy page-token activation delay can be injected, so retries, the circuit
+   breaker and the caches behave as they would against Google
+
+Recording format:
+    {"searches": {"<normalized search text>": {"query": "", "category": "Plumbing",
+                  "location": "Toronto", "pages": [[<place>, ...], ...]}},
+     "details": {"<place_id>": {"phone": "...", "website": "..."}}}
+where each place uses the formatted result fields (name, address, rating, ...).
+
+Usage:
+    python places_replay.py record [fixtures.json]          Export cached responses
+    python places_replay.py bench fixtures.json [rounds]    Benchmark SearchService offline
+
+Set PLACES_REPLAY_FIXTURES to a recording to serve the app's Places calls from it.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import tempfile
+import threading
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+import db_pool
+import serialization
+from taxonomy import normalize_term
+from google_places_api import MAX_PAGES, search_text
+from locations import LOCATION_CENTERS, TORONTO_CENTER
+from http_client import HTTPClient, places_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REPLAY_FIXTURES = os.getenv('PLACES_REPLAY_FIXTURES', '')
+REPLAY_LATENCY_MS = float(os.getenv('PLACES_REPLAY_LATENCY_MS', 150))
+REPLAY_JITTER_MS = float(os.getenv('PLACES_REPLAY_JITTER_MS', 50))
+REPLAY_ERROR_RATE = float(os.getenv('PLACES_REPLAY_ERROR_RATE', 0))
+REPLAY_RATE_LIMIT = float(os.getenv('PLACES_REPLAY_RATE_LIMIT', 0))  # requests per second, 0 = unlimited
+REPLAY_TOKEN_DELAY = float(os.getenv('PLACES_REPLAY_TOKEN_DELAY', 0))
+REPLAY_SYNTHETIC = os.getenv('PLACES_REPLAY_SYNTHETIC', 'false').lower() == 'true'
+
+GOOGLE_PREFIXES = ('https://maps.googleapis.com/', 'https://places.googleapis.com/')
+
+# Transport installed on the shared client (reported by /api/diagnostics)
+active: Optional['ReplayTransport'] = None
+
+
+def record(db_path: str = 'service_providers.db') -> Dict[str, Any]:
+    """Export cached Google responses as a replay recording.
+
+    Args:
+        db_path: Database holding google_places_cache and place_details_cache
+
+    Returns:
+        Recording dictionary (newest cached copy of every page)
+    """
+    searches: Dict[str, Dict[str, Any]] = {}
+    with db_pool.connection(db_path) as conn:
+        rows = conn.execute('''
+            SELECT query, category, location, page, response FROM google_places_cache
+            ORDER BY timestamp
+        ''').fetchall()
+        details_rows = conn.execute('SELECT place_id, phone, website FROM place_details_cache').fetchall()
+
+    pages_by_key: Dict[str, Dict[int, List[Dict[str, Any]]]] = {}
+    for query, category, location, page, response in rows:
+        key = normalize_term(search_text(query, category, location))
+        searches.setdefault(key, {"query": query, "category": category, "location": location})
+        pages_by_key.setdefault(key, {})[page] = serialization.loads(response)
+
+    for key, pages in pages_by_key.items():
+        # Only a run of pages starting at 1 can be replayed
+        ordered = []
+        while len(ordered) + 1 in pages:
+            ordered.append(pages[len(ordered) + 1])
+        searches[key]["pages"] = ordered
+
+    return {
+        "searches": {key: entry for key, entry in searches.items() if entry.get("pages")},
+        "details": {row[0]: {"phone": row[1] or "", "website": row[2] or ""} for row in details_rows}
+    }
+
+
+class ReplayTransport(BaseAdapter):
+    """requests transport that serves Places API calls from a recording."""
+
+    def __init__(self, recording: Dict[str, Any], latency_ms: float = REPLAY_LATENCY_MS,
+                 jitter_ms: float = REPLAY_JITTER_MS, error_rate: float = REPLAY_ERROR_RATE,
+                 rate_limit: float = REPLAY_RATE_LIMIT, token_delay: float = REPLAY_TOKEN_DELAY,
+                 synthetic: bool = REPLAY_SYNTHETIC, seed: Optional[int] = None):
+        """Initialize the transport.
+
+        Args:
+            recording: Recording dictionary (see the module docstring)
+            latency_ms: Base response latency
+            jitter_ms: Uniform random latency added on top
+            error_rate: Fraction of requests answered with a 503
+            rate_limit: Requests per second before answering 429 (0 for no limit)
+            token_delay: Seconds before a legacy next_page_token is accepted
+            synthetic: Answer unrecorded searches with generated places instead of ZERO_RESULTS
+            seed: Random seed for reproducible latency and errors
+        """
+        super().__init__()
+        self.searches = recording.get("searches", {})
+        self.details = recording.get("details", {})
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.token_delay = token_delay
+        self.synthetic = synthetic
+        self._random = random.Random(seed)
+        self._recent: deque = deque()
+        self._tokens_issued: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.served = 0
+        self.misses = 0
+        self.injected_errors = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> 'ReplayTransport':
+        """Load a recording from a JSON file."""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._lock:
+            self.requests += 1
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.error_rate
+            limited = self._over_rate_limit()
+
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and delay > read_timeout:
+            time.sleep(read_timeout)
+            self.timeouts += 1
+            raise requests.ReadTimeout(f"Replay latency {delay:.3f}s exceeded timeout", request=request)
+        time.sleep(delay)
+
+        if limited:
+            self.rate_limited += 1
+            return self._response(request, 429, {"error": {"status": "RESOURCE_EXHAUSTED"}}, {'Retry-After': '1'})
+        if fail:
+            self.injected_errors += 1
+            return self._response(request, 503, {"error": {"status": "UNAVAILABLE"}})
+
+        url = urlparse(request.url)
+        if url.path.endswith('/place/textsearch/json'):
+            payload = self._legacy_search(parse_qs(url.query))
+        elif url.path.endswith('/place/details/json'):
+            payload = self._legacy_details(parse_qs(url.query))
+        elif url.path.endswith('/places:searchText'):
+            if not request.headers.get('X-Goog-FieldMask'):
+                return self._response(request, 400, {"error": {"status": "INVALID_ARGUMENT"}})
+            payload = self._v1_search(json.loads(request.body or b'{}'), request.headers['X-Goog-FieldMask'])
+        elif url.path.startswith('/v1/places/'):
+            place_id = url.path[len('/v1/places/'):]
+            if place_id not in self.details:
+                self.misses += 1
+                return self._response(request, 404, {"error": {"status": "NOT_FOUND"}})
+            payload = self._v1_details(place_id, request.headers.get('X-Goog-FieldMask', ''))
+        else:
+            return self._response(request, 404, {"error": {"status": "NOT_FOUND"}})
+
+        self.served += 1
+        return self._response(request, 200, payload)
+
+    def close(self):
+        pass
+
+    def _over_rate_limit(self) -> bool:
+        """Sliding one-second window; call with the lock held."""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    @staticmethod
+    def _response(request, status: int, payload: Dict[str, Any],
+                  headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode('utf-8')
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **(headers or {})})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    # -- recordings -------------------------------------------------------
+
+    def _pages(self, key: str) -> List[List[Dict[str, Any]]]:
+        entry = self.searches.get(key)
+        if entry:
+            return entry["pages"]
+        if self.synthetic:
+            # Scatter the places on a grid of about 2 km around the searched location
+            latitude, longitude = LOCATION_CENTERS.get(key.rsplit(' in ', 1)[-1], TORONTO_CENTER)
+            return [
+                [{"name": f"Replay {key.title()} {page * 20 + i + 1}",
+                  "address": f"{100 + i} Replay St, Toronto",
+                  "phone": f"416-555-{page * 20 + i:04d}", "website": "",
+                  "rating": round(3.5 + (i % 15) / 10, 1), "reviews": 10 + i,
+                  "latitude": round(latitude + (i % 5 - 2) * 0.018, 4),
+                  "longitude": round(longitude + (i // 5 - 2) * 0.025 + page * 0.005, 4),
+                  "place_id": f"replay-{zlib.crc32(key.encode('utf-8'))}-{page}-{i}"} for i in range(20)]
+                for page in range(MAX_PAGES)
+            ]
+        return []
+
+    def _issue_token(self, key: str, page: int, delayed: bool) -> str:
+        token = base64.urlsafe_b64encode(json.dumps([key, page]).encode('utf-8')).decode('ascii')
+        if delayed and self.token_delay:
+            with self._lock:
+                if len(self._tokens_issued) > 10000:
+                    self._tokens_issued.clear()
+                self._tokens_issued[token] = time.monotonic()
+        return token
+
+    def _redeem_token(self, token: str) -> Optional[Tuple[str, int]]:
+        """Decode a page token, or None if it is invalid or not yet active."""
+        issued = self._tokens_issued.get(token)
+        if issued is not None and time.monotonic() - issued < self.token_delay:
+            return None
+        try:
+            key, page = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            return key, int(page)
+        except (ValueError, TypeError):
+            return None
+
+    def _page(self, text: Optional[str], token: Optional[str],
+              legacy: bool) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Resolve a search request to (places, next token); places is None for a bad token.
+
+        Only legacy tokens are subject to the activation delay.
+        """
+        if token:
+            redeemed = self._redeem_token(token)
+            if redeemed is None:
+                return None, None
+            key, page = redeemed
+        else:
+            key, page = normalize_term(text or ''), 1
+        pages = self._pages(key)
+        if page > len(pages):
+            self.misses += 1
+            return [], None
+        next_token = self._issue_token(key, page + 1, legacy) if page < len(pages) else None
+        return pages[page - 1], next_token
+
+    def _contact(self, place: Dict[str, Any]) -> Dict[str, str]:
+        details = self.details.get(place.get("place_id"), {})
+        return {
+            "phone": place.get("phone") or details.get("phone", ""),
+            "website": place.get("website") or details.get("website", "")
+        }
+
+    # -- endpoints --------------------------------------------------------
+
+    def _legacy_search(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        token = params.get('pagetoken', [None])[0]
+        places, next_token = self._page(params.get('query', [''])[0], token, legacy=True)
+        if places is None:
+            return {"status": "INVALID_REQUEST", "results": []}
+        if not places:
+            return {"status": "ZERO_RESULTS", "results": []}
+        payload = {
+            "status": "OK",
+            "results": [{
+                "name": place.get("name", ""),
+                "formatted_address": place.get("address", ""),
+                "rating": place.get("rating", 0.0),
+                "user_ratings_total": place.get("reviews", 0),
+                "place_id": place.get("place_id", ""),
+                **({"geometry": {"location": {"lat": place["latitude"], "lng": place["longitude"]}}}
+                   if place.get("latitude") is not None else {})
+            } for place in places]
+        }
+        if next_token:
+            payload["next_page_token"] = next_token
+        return payload
+
+    def _legacy_details(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        place_id = params.get('place_id', [''])[0]
+        if place_id not in self.details:
+            self.misses += 1
+            return {"status": "NOT_FOUND"}
+        details = self.details[place_id]
+        return {
+            "status": "OK",
+            "result": {"formatted_phone_number": details.get("phone", ""), "website": details.get("website", "")}
+        }
+
+    def _v1_search(self, body: Dict[str, Any], field_mask: str) -> Dict[str, Any]:
+        places, next_token = self._page(body.get('textQuery'), body.get('pageToken'), legacy=False)
+        fields = {field.strip() for field in field_mask.split(',')}
+        wildcard = '*' in fields
+        payload: Dict[str, Any] = {}
+        if places:
+            payload["places"] = []
+            for place in places:
+                contact = self._contact(place)
+                full = {
+                    "id": place.get("place_id", ""),
+                    "displayName": {"text": place.get("name", ""), "languageCode": "en"},
+                    "formattedAddress": place.get("address", ""),
+                    "rating": place.get("rating", 0.0),
+                    "userRatingCount": place.get("reviews", 0),
+                    "nationalPhoneNumber": contact["phone"],
+                    "websiteUri": contact["website"],
+                    "location": ({"latitude": place["latitude"], "longitude": place["longitude"]}
+                                 if place.get("latitude") is not None else None)
+                }
+                payload["places"].append({
+                    name: value for name, value in full.items()
+                    if (wildcard or f'places.{name}' in fields) and value not in ('', None)
+                })
+        if next_token and (wildcard or 'nextPageToken' in fields):
+            payload["nextPageToken"] = next_token
+        return payload
+
+    def _v1_details(self, place_id: str, field_mask: str) -> Dict[str, Any]:
+        details = self.details[place_id]
+        full = {"id": place_id, "nationalPhoneNumber": details.get("phone", ""), "websiteUri": details.get("website", "")}
+        fields = {field.strip() for field in field_mask.split(',')}
+        return {name: value for name, value in full.items() if ('*' in fields or name in fields) and value}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request and fault injection counters."""
+        return {
+            "searches_recorded": len(self.searches),
+            "details_recorded": len(self.details),
+            "requests": self.requests,
+            "served": self.served,
+            "misses": self.misses,
+            "injected_errors": self.injected_errors,
+            "rate_limited": self.rate_limited,
+            "timeouts": self.timeouts,
+            "latency_ms": self.latency_ms,
+            "error_rate": self.error_rate,
+            "rate_limit": self.rate_limit
+        }
+
+
+def install(transport: ReplayTransport, client: HTTPClient = places_client) -> ReplayTransport:
+    """Route the client's Google Places calls through a replay transport."""
+    global active
+    for prefix in GOOGLE_PREFIXES:
+        client.mount(prefix, transport)
+    active = transport
+    logger.warning(f"Google Places calls are served by replay ({len(transport.searches)} recorded searches)")
+    return transport
+
+
+def install_from_env(client: HTTPClient = places_client) -> Optional[ReplayTransport]:
+    """Install the replay transport if PLACES_REPLAY_FIXTURES is set."""
+    if not REPLAY_FIXTURES:
+        return None
+    return install(ReplayTransport.from_file(REPLAY_FIXTURES), client)
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def bench(fixtures_path: str, rounds: int = 3) -> None:
+    """Run every recorded search (all pages) through SearchService against the replay.
+
+    Runs in a scratch directory, so the real databases are never touched. The
+    first round is cold; later rounds show the effect of the caches.
+
+    Args:
+        fixtures_path: Recording to replay
+        rounds: Number of passes over the recorded searches
+    """
+    transport = install(ReplayTransport.from_file(os.path.abspath(fixtures_path)))
+    os.chdir(tempfile.mkdtemp(prefix='places-bench-'))
+
+    from search_service import SearchService
+    service = SearchService(api_key=os.environ.get('GOOGLE_PLACES_API_KEY') or 'replay')
+
+    for number in range(1, rounds + 1):
+        latencies = []
+        for entry in transport.searches.values():
+            page = 1
+            while True:
+                started = time.perf_counter()
+                service.search_service_providers(entry["category"], entry["location"], entry["query"], page)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if not service.has_more(entry["category"], entry["location"], entry["query"], page):
+                    break
+                page += 1
+        print(f"round {number}: {len(latencies)} requests, "
+              f"p50 {_percentile(latencies, 0.5):.1f} ms, p95 {_percentile(latencies, 0.95):.1f} ms, "
+              f"max {max(latencies, default=0):.1f} ms")
+
+    print(f"places cache: {json.dumps(service.google_places.stats())}")
+    print(f"enrichment:   {json.dumps(service.enricher.stats())}")
+    print(f"replay:       {json.dumps(transport.stats())}")
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Export cached responses:      python places_replay.py record [fixtures.json]")
+    print("  Benchmark against a replay:   python places_replay.py bench fixtures.json [rounds]")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == 'record':
+        out_path = sys.argv[2] if len(sys.argv) > 2 else 'places_fixtures.json'
+        recording = record()
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(recording, f)
+        print(f"Recorded {len(recording['searches'])} searches and {len(recording['details'])} details to {out_path}")
+
+    elif command == 'bench' and len(sys.argv) > 2:
+        bench(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 3)
+
+    else:
+        print_usage()
+        sys.exit(1)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Materialized provider rankings for Tradepro Finder Toronto.
+
+The service page took an arbitrary LIMIT 10 of a pair's providers and the
+search service sorted every merged result list by raw rating in Python, so a
+5.0 with two reviews outranked a 4.8 with three hundred. Rankings are now
+computed once and stored:
+
+1. Providers are scored with a Bayesian average, (v * R + m * C) / (v + m),
+   where R and v are the provider's rating and review count, C is the mean
+   rating of its (category, location) pair and m is RANKING_PRIOR_REVIEWS
+2. The top RANKING_SIZE providers of each pair are kept in provider_rankings
+   in rank order, so readers take a slice of its primary key instead of sorting
+3. Writers re-rank the pairs they touch in the same transaction (the search
+   service when it stores Google results, enrichment when it fills in contact
+   details); readers only read, so a GET never takes the write lock
+4. Each ranking records the provider_pair_versions counter (bumped by triggers
+   on every provider write) it was built from, so pairs changed by imports and
+   other tools can be found and re-ranked with "python ranking.py refresh"
+
+Usage:
+    python ranking.py rebuild                     Re-rank every pair
+    python ranking.py refresh                     Re-rank pairs changed since they were ranked
+    python ranking.py show <category> <location>  Print a pair's ranking
+"""
+
+import os
+import sys
+import sqlite3
+import logging
+from typing import Any, Dict, List
+import db_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'service_providers.db'
+RANKING_SIZE = int(os.getenv('RANKING_SIZE', 50))
+PRIOR_REVIEWS = max(1, int(os.getenv('RANKING_PRIOR_REVIEWS', 10)))
+# Prior mean for pairs where no provider has a rating yet
+DEFAULT_RATING = float(os.getenv('RANKING_DEFAULT_RATING', 4.0))
+
+
+def ensure_ranking_tables(conn) -> None:
+    """Create the ranking tables and rank every existing pair.
+
+    Args:
+        conn: Open connection to the service providers database
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS provider_rankings (
+            category TEXT NOT NULL,
+            location TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            provider_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (category, location, position)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS provider_ranking_versions (
+            category TEXT NOT NULL,
+            location TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (category, location)
+        )
+    ''')
+    pairs = conn.execute('''
+        SELECT DISTINCT category, location FROM service_providers
+        WHERE category IS NOT NULL AND location IS NOT NULL
+    ''').fetchall()
+    for category, location in pairs:
+        rank_pair(conn, category, location)
+
+
+def rank_pair(conn, category: str, location: str) -> int:
+    """Recompute the stored ranking for one (category, location) pair.
+
+    Runs in the caller's transaction, so a writer can re-rank the pairs it
+    touched before committing.
+
+    Args:
+        conn: Open connection to the service providers database
+        category: Provider category
+        location: Provider location
+
+    Returns:
+        Number of ranked providers
+    """
+    params = {
+        'category': category,
+        'location': location,
+        'prior_reviews': PRIOR_REVIEWS,
+        'default_rating': DEFAULT_RATING,
+        'size': RANKING_SIZE
+    }
+    conn.execute('DELETE FROM provider_rankings WHERE category = :category AND location = :location', params)
+    ranked = conn.execute('''
+        INSERT INTO provider_rankings (category, location, position, provider_id, score)
+        SELECT :category, :location, ROW_NUMBER() OVER (ORDER BY score DESC, reviews DESC, id), id, score
+        FROM (
+            SELECT sp.id, COALESCE(sp.reviews, 0) AS reviews,
+                   (COALESCE(sp.reviews, 0) * COALESCE(sp.rating, prior.mean) + :prior_reviews * prior.mean)
+                   / (COALESCE(sp.reviews, 0) + :prior_reviews) AS score
+            FROM service_providers sp, (
+                SELECT COALESCE(AVG(rating), :default_rating) AS mean FROM service_providers
+                WHERE category = :category AND location = :location
+            ) prior
+            WHERE sp.category = :category AND sp.location = :location
+            ORDER BY score DESC, reviews DESC, sp.id
+            LIMIT :size
+        )
+    ''', params).rowcount
+    conn.execute('''
+        INSERT INTO provider_ranking_versions (category, location, version)
+        VALUES (:category, :location, COALESCE(
+            (SELECT version FROM provider_pair_versions WHERE category = :category AND location = :location), 0
+        ))
+        ON CONFLICT (category, location) DO UPDATE SET version = excluded.version
+    ''', params)
+    return ranked
+
+
+def rank_changed_pairs(conn) -> int:
+    """Re-rank every pair whose providers changed since it was last ranked.
+
+    Args:
+        conn: Open connection to the service providers database
+
+    Returns:
+        Number of pairs re-ranked
+    """
+    pairs = conn.execute('''
+        SELECT p.category, p.location FROM provider_pair_versions p
+        LEFT JOIN provider_ranking_versions r ON r.category = p.category AND r.location = p.location
+        WHERE r.version IS NULL OR r.version != p.version
+    ''').fetchall()
+    for category, location in pairs:
+        rank_pair(conn, category, location)
+    return len(pairs)
+
+
+def top_providers(conn, category: str, location: str, limit: int = RANKING_SIZE) -> List[Dict[str, Any]]:
+    """Get a pair's best-ranked providers from its stored ranking.
+
+    Args:
+        conn: Open connection to the service providers database
+        category: Provider category
+        location: Provider location
+        limit: Number of providers to return (at most RANKING_SIZE)
+
+    Returns:
+        service_providers rows as dictionaries, best first (none for an unranked pair)
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute('''
+        SELECT sp.* FROM provider_rankings r
+        JOIN service_providers sp ON sp.id = r.provider_id
+        WHERE r.category = ? AND r.location = ? AND r.position <= ?
+        ORDER BY r.position
+    ''', (category, location, limit))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Re-rank every pair:           python ranking.py rebuild")
+    print("  Re-rank changed pairs:        python ranking.py refresh")
+    print("  Print a pair's ranking:       python ranking.py show <category> <location>")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == 'rebuild':
+        with db_pool.connection(DB_PATH) as conn:
+            ensure_ranking_tables(conn)
+            print(f"Ranked {conn.execute('SELECT COUNT(*) FROM provider_ranking_versions').fetchone()[0]} pairs")
+
+    elif command == 'refresh':
+        with db_pool.connection(DB_PATH) as conn:
+            print(f"Re-ranked {rank_changed_pairs(conn)} pairs")
+
+    elif command == 'show' and len(sys.argv) == 4:
+        with db_pool.connection(DB_PATH) as conn:
+            for position, provider in enumerate(top_providers(conn, sys.argv[2], sys.argv[3]), 1):
+                print(f"{position:>3}. {provider['name']} ({provider['rating']} from {provider['reviews']} reviews)")
+
+    else:
+        print_usage()
+        sys.exit(1)
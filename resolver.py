@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Category and location resolution for Tradepro Finder Toronto.
+
+Service page slugs were split on "-in-" and title-cased, so "hvac" became
+"Hvac" and never matched "HVAC", and /api/search compared raw strings, so
+"plumbers" missed every "Plumbing" row and cache entry and went to Google.
+This module resolves free-form names to the canonical ones:
+
+1. An index from folded keys to canonical names, rebuilt only when the
+   taxonomy snapshot's categories or locations change; a lookup is a
+   dictionary hit
+2. Keys fold case, punctuation and spacing, drop filler words ("best",
+   "services", "toronto") and reduce each word to a crude stem, so plurals
+   and trade nouns meet ("plumbers", "plumbing" -> "plumb")
+3. Keyword phrases from the keywords CSV are aliases of their category
+   ("AC repair" -> HVAC); categories from the CSV map onto the database's
+   categories when their stems contain them ("Roofing Contractors" -> Roofing)
+4. Locations from the database and the cities CSV, each with its municipality,
+   so neighbourhoods can fall back to the municipality around them
+5. Close misspellings are matched with difflib and remembered
+
+Usage:
+    python resolver.py <slug or name> [...]    Show how names resolve
+"""
+
+import re
+import csv
+import sys
+import difflib
+import logging
+import threading
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+from taxonomy import normalize_term, snapshot as taxonomy_snapshot
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+KEYWORDS_CSV = 'data/tradepro_finder_toronto_keywords.csv'
+CITIES_CSV = 'data/tradepro_finder_cities.csv'
+
+# Words that say nothing about the trade being searched for
+FILLER_WORDS = frozenset({
+    'a', 'affordable', 'and', 'best', 'companies', 'company', 'contractor', 'contractors', 'for', 'gta',
+    'in', 'local', 'me', 'near', 'service', 'services', 'the', 'top', 'toronto', 'trusted'
+})
+# Leading slug words that are not part of the category
+SLUG_QUALIFIERS = frozenset({'affordable', 'best', 'local', 'top', 'trusted'})
+STEM_SUFFIXES = ('icians', 'ician', 'ians', 'ical', 'ers', 'ing', 'ies', 'er', 'es', 's')
+FUZZY_CUTOFF = 0.8
+MAX_REMEMBERED = 4096
+
+# Municipality for the neighbourhoods in the cities CSV outside Toronto
+NEIGHBOURHOOD_MUNICIPALITY = {
+    'nobleton': 'King',
+    'schomberg': 'King',
+    'bolton': 'Caledon',
+    'thornhill': 'Vaughan',
+    'maple': 'Vaughan',
+    'concord': 'Vaughan',
+    'kleinburg': 'Vaughan',
+}
+# Everything else in the cities CSV that is not a municipality is part of Toronto
+DEFAULT_MUNICIPALITY = 'Toronto'
+# Other spellings seen in slugs and searches
+LOCATION_ALIASES = {
+    'downtown': 'Downtown Toronto',
+    'the beaches': 'Beaches',
+    'stouffville': 'Whitchurch-Stouffville',
+    'richmondhill': 'Richmond Hill',
+}
+
+
+def _stem(word: str) -> str:
+    """Strip one plural or trade suffix ("plumbers" -> "plumb", "companies" -> "company")."""
+    for suffix in STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == 'ies':
+                return word[:-3] + 'y'
+            if suffix == 'es' and not word[:-2].endswith(('s', 'x', 'z', 'ch', 'sh')):
+                # "services" -> "service", "boxes" -> "box"
+                return word[:-1]
+            return word[:-len(suffix)]
+    return word
+
+
+def _words(text: Optional[str]) -> Tuple[str, ...]:
+    return tuple(re.findall(r'[a-z0-9]+', normalize_term(text).replace("'", '')))
+
+
+def category_key(text: Optional[str]) -> str:
+    """Fold a category name or phrase into its index key."""
+    words = _words(text)
+    meaningful = [word for word in words if word not in FILLER_WORDS] or list(words)
+    return ' '.join(sorted({_stem(word) for word in meaningful}))
+
+
+def location_key(text: Optional[str]) -> str:
+    """Fold a location name into its index key."""
+    words = _words(text)
+    if len(words) > 1 and words[0] == 'the':
+        words = words[1:]
+    return ' '.join(words)
+
+
+class Resolution(NamedTuple):
+    """A resolved (category, location) pair."""
+    category: str
+    location: str
+    municipality: str
+
+
+class _Index(NamedTuple):
+    source: Tuple[Tuple[str, ...], Tuple[str, ...]]
+    categories: Dict[str, str]
+    locations: Dict[str, str]
+    municipalities: Dict[str, str]
+
+
+def _read_csv(path: str) -> list:
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    except OSError as e:
+        logger.warning(f"Could not read {path}: {str(e)}")
+        return []
+
+
+def read_keyword_phrases(path: str = KEYWORDS_CSV) -> Dict[str, Tuple[str, ...]]:
+    """Read the keyword phrases for each category in the keywords CSV."""
+    return {
+        row['Category'].strip(): tuple(p.strip() for p in (row.get('Keywords') or '').split(',') if p.strip())
+        for row in _read_csv(path) if (row.get('Category') or '').strip()
+    }
+
+
+def read_locations(path: str = CITIES_CSV) -> Tuple[str, ...]:
+    """Read the locations in the cities CSV, municipalities first."""
+    return tuple(row['Location'].strip() for row in _read_csv(path) if (row.get('Location') or '').strip())
+
+
+def read_location_points(path: str = CITIES_CSV) -> Dict[str, Tuple[float, float]]:
+    """Read the (latitude, longitude) of each location in the cities CSV that has one."""
+    points = {}
+    for row in _read_csv(path):
+        try:
+            points[row['Location'].strip()] = (float(row['Latitude']), float(row['Longitude']))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return points
+
+
+class Resolver:
+    """Maps slugs and free-form names to canonical categories and locations."""
+
+    def __init__(self, snapshot=taxonomy_snapshot, keywords_csv: str = KEYWORDS_CSV, cities_csv: str = CITIES_CSV):
+        """Initialize the resolver.
+
+        Args:
+            snapshot: Source of the database's categories and locations
+            keywords_csv: CSV with Category and Keywords (comma-separated phrases) columns
+            cities_csv: CSV with a Location column; municipalities come first, then neighbourhoods
+        """
+        self.snapshot = snapshot
+        self.keywords_csv = keywords_csv
+        self.cities_csv = cities_csv
+        self._csv_data: Optional[Tuple[Dict[str, Tuple[str, ...]], Tuple[str, ...]]] = None
+        self._index: Optional[_Index] = None
+        self._remembered: Dict[Tuple[str, str], Optional[str]] = {}
+        self._lock = threading.Lock()
+
+        self.exact = 0
+        self.fuzzy = 0
+        self.unresolved = 0
+        self.rebuilds = 0
+
+    def _load_csvs(self) -> Tuple[Dict[str, Tuple[str, ...]], Tuple[str, ...]]:
+        """Read the keyword phrases per category and the known locations (once)."""
+        if self._csv_data is None:
+            self._csv_data = (read_keyword_phrases(self.keywords_csv), read_locations(self.cities_csv))
+        return self._csv_data
+
+    def _build(self, taxonomy) -> _Index:
+        keywords, cities = self._load_csvs()
+
+        categories: Dict[str, str] = {}
+        stems: Dict[str, FrozenSet[str]] = {}
+        for category in taxonomy.categories:
+            key = category_key(category)
+            categories.setdefault(key, category)
+            stems[category] = frozenset(key.split())
+
+        def canonical_category(name: str) -> str:
+            """The database category a CSV category means, or the CSV name itself."""
+            key = category_key(name)
+            if key in categories:
+                return categories[key]
+            name_stems = frozenset(key.split())
+            contained = [c for c, s in stems.items() if s and s <= name_stems]
+            return max(contained, key=lambda c: len(stems[c])) if contained else name
+
+        for name, phrases in keywords.items():
+            canonical = canonical_category(name)
+            categories.setdefault(category_key(name), canonical)
+            for phrase in phrases:
+                categories.setdefault(category_key(phrase), canonical)
+
+        locations: Dict[str, str] = {}
+        municipalities: Dict[str, str] = {}
+        in_neighbourhoods = False
+        for name in cities:
+            key = location_key(name)
+            locations.setdefault(key, name)
+            # The file lists the municipalities first, then their neighbourhoods
+            in_neighbourhoods = in_neighbourhoods or key in NEIGHBOURHOOD_MUNICIPALITY
+            if in_neighbourhoods:
+                municipalities.setdefault(key, NEIGHBOURHOOD_MUNICIPALITY.get(key, DEFAULT_MUNICIPALITY))
+            else:
+                municipalities.setdefault(key, name)
+        for location in taxonomy.locations:
+            # Database spellings win, so resolved names match stored rows
+            locations[location_key(location)] = location
+        for alias, name in LOCATION_ALIASES.items():
+            locations.setdefault(location_key(alias), locations.get(location_key(name), name))
+
+        return _Index((taxonomy.categories, taxonomy.locations), categories, locations, municipalities)
+
+    def _current(self) -> _Index:
+        taxonomy = self.snapshot.get()
+        source = (taxonomy.categories, taxonomy.locations)
+        index = self._index
+        # The snapshot hands out the same tuples until the data changes, so this is an identity check
+        if index is None or index.source != source:
+            with self._lock:
+                index = self._index
+                if index is None or index.source != source:
+                    index = self._build(taxonomy)
+                    self._index = index
+                    self._remembered = {}
+                    self.rebuilds += 1
+        return index
+
+    def _lookup(self, kind: str, key: str, table: Dict[str, str]) -> Optional[str]:
+        if not key:
+            return None
+        found = table.get(key)
+        if found is not None:
+            self.exact += 1
+            return found
+        remembered = self._remembered.get((kind, key), '')
+        if remembered != '':
+            return remembered
+        close = difflib.get_close_matches(key, list(table), n=1, cutoff=FUZZY_CUTOFF)
+        found = table[close[0]] if close else None
+        if len(self._remembered) >= MAX_REMEMBERED:
+            self._remembered = {}
+        self._remembered[(kind, key)] = found
+        if found is None:
+            self.unresolved += 1
+        else:
+            self.fuzzy += 1
+        return found
+
+    def resolve_category(self, text: Optional[str]) -> str:
+        """Canonical category for a name or phrase (the cleaned input if unknown)."""
+        index = self._current()
+        found = self._lookup('category', category_key(text), index.categories)
+        return found if found is not None else ' '.join((text or '').split())
+
+    def resolve_location(self, text: Optional[str]) -> str:
+        """Canonical location for a name (the cleaned input if unknown)."""
+        index = self._current()
+        found = self._lookup('location', location_key(text), index.locations)
+        return found if found is not None else ' '.join((text or '').split())
+
+    def municipality(self, location: Optional[str]) -> str:
+        """Municipality containing a location (the location itself if it is one or is unknown)."""
+        index = self._current()
+        resolved = self.resolve_location(location)
+        return index.municipalities.get(location_key(resolved), resolved)
+
+    def resolve(self, category: Optional[str], location: Optional[str]) -> Resolution:
+        """Resolve a (category, location) pair."""
+        resolved_location = self.resolve_location(location)
+        return Resolution(self.resolve_category(category), resolved_location, self.municipality(resolved_location))
+
+    def resolve_slug(self, slug: str) -> Optional[Resolution]:
+        """Resolve a service page slug such as "top-hvac-in-north-york".
+
+        Returns:
+            The resolved pair, or None if the slug names no location
+        """
+        words = [word for word in slug.lower().split('-') if word]
+        if words and words[0] in SLUG_QUALIFIERS:
+            words = words[1:]
+        if 'in' in words:
+            split = len(words) - 1 - words[::-1].index('in')
+            category_words, location_words = words[:split], words[split + 1:]
+        else:
+            # No "-in-": take the longest known location at the end of the slug
+            locations = self._current().locations
+            split = next((i for i in range(1, len(words)) if ' '.join(words[i:]) in locations), None)
+            if split is None:
+                return None
+            category_words, location_words = words[:split], words[split:]
+        if not category_words or not location_words:
+            return None
+        # Unknown names keep the title case the pages have always used
+        return self.resolve(' '.join(category_words).title(), ' '.join(location_words).title())
+
+    def stats(self) -> Dict[str, int]:
+        """Return index size and lookup counters."""
+        index = self._index
+        return {
+            "categories": len(index.categories) if index else 0,
+            "locations": len(index.locations) if index else 0,
+            "exact": self.exact,
+            "fuzzy": self.fuzzy,
+            "unresolved": self.unresolved,
+            "rebuilds": self.rebuilds
+        }
+
+
+# Shared resolver for the service providers database
+resolver = Resolver()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  Show how names resolve:       python resolver.py <slug or name> [...]")
+        sys.exit(1)
+
+    for name in sys.argv[1:]:
+        resolution = resolver.resolve_slug(name) if '-' in name else None
+        if resolution:
+            print(f"{name}: {resolution.category} in {resolution.location} ({resolution.municipality})")
+        else:
+            print(f"{name}: category {resolver.resolve_category(name)!r}, location {resolver.resolve_location(name)!r}")
@@ -2,42 +2,48 @@
 Routes for Tradepro Finder Toronto.
 """
 
-from flask import Blueprint, render_template, jsonify, request, abort, send_from_directory, redirect, url_for
+from flask import Blueprint, Response, current_app, render_template, jsonify, request, abort, send_from_directory, redirect, url_for
 import os
-import json
-import sqlite3
+import hashlib
 import logging
 from datetime import datetime
+from werkzeug.exceptions import HTTPException
+import db_pool
+import places_replay
+from cache_backend import shared_cache
+import search_cache
+from taxonomy import snapshot as taxonomy_snapshot
+from resolver import resolver
+from suggest import KINDS as SUGGEST_KINDS, SUGGEST_LIMIT, SUGGEST_MAX_AGE, suggestions
+from ranking import top_providers
+from geo import GEO_MAX_RADIUS_KM
+from locations import location_point
+from page_cache import service_pages as service_page_cache
+from api_budget import places_budget
 
 # Create blueprint
 main = Blueprint('main', __name__)
 
+SERVICE_PROVIDERS_DB = 'service_providers.db'
+
 # Helper functions
 def load_categories():
-    """Load service categories from database."""
-    categories = []
-    try:
-        conn = sqlite3.connect('service_providers.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT category FROM service_providers ORDER BY category')
-        categories = [row[0] for row in cursor.fetchall()]
-        conn.close()
-    except Exception as e:
-        logging.error(f"Error loading categories: {str(e)}")
-    return categories
+    """Load service categories from the in-memory taxonomy snapshot."""
+    return taxonomy_snapshot.get().categories
 
 def load_locations():
-    """Load locations from database."""
-    locations = []
-    try:
-        conn = sqlite3.connect('service_providers.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT location FROM service_providers ORDER BY location')
-        locations = [row[0] for row in cursor.fetchall()]
-        conn.close()
-    except Exception as e:
-        logging.error(f"Error loading locations: {str(e)}")
-    return locations
+    """Load locations from the in-memory taxonomy snapshot."""
+    return taxonomy_snapshot.get().locations
+
+def cacheable_json(payload, max_age):
+    """Build a JSON response with a strong ETag and shared-cache headers, or a 304 if the client has it."""
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    response.headers['Cache-Control'] = (
+        f'public, max-age={max(0, int(max_age))}, '
+        f'stale-while-revalidate={search_cache.SEARCH_STALE_WHILE_REVALIDATE}'
+    )
+    return response.make_conditional(request)
 
 def generate_service_links(categories, locations):
     """Generate service links for SEO."""
@@ -56,21 +62,22 @@ def get_service_providers(category, location):
     """Get service providers from database."""
     providers = []
     try:
-        conn = sqlite3.connect('service_providers.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT * FROM service_providers WHERE category = ? AND location = ? LIMIT 10',
-            (category, location)
-        )
-        providers = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        # Best ten by Bayesian-weighted rating, read from the materialized ranking
+        with db_pool.connection(SERVICE_PROVIDERS_DB) as conn:
+            providers = top_providers(conn, category, location, limit=10)
     except Exception as e:
         logging.error(f"Error getting service providers: {str(e)}")
     return providers
 
-# Cache for service pages
-service_page_cache = {}
+def page_response(entry):
+    """Build a response for a cached page, gzipped if the client accepts it."""
+    if entry.gzipped and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(entry.gzipped, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(entry.body, mimetype='text/html')
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 # Routes
 @main.route('/')
@@ -87,34 +94,28 @@ def index():
 @main.route('/service/<slug>')
 def service_page(slug):
     """Serve a service page."""
-    # Check if page is in cache
-    if slug in service_page_cache:
-        return service_page_cache[slug]
-    
     try:
-        # Parse slug into components
-        # Example: "top-cleaning-services-services-in-kensington-market"
-        parts = slug.split('-')
-        
-        # Find the index of 'in' to separate location
-        if 'in' in parts:
-            in_index = parts.index('in')
-            location_parts = parts[in_index + 1:]
-            category_parts = parts[1:in_index]  # Skip the first part (top, best, etc)
-        else:
+        # Resolve the slug to the stored category and location
+        # Example: "top-hvac-in-north-york" -> "HVAC" in "North York"
+        resolution = resolver.resolve_slug(slug)
+        if not resolution:
             abort(404)
-            
-        # Reconstruct category and location
-        category = ' '.join(category_parts).replace('-', ' ')
-        location = ' '.join(location_parts).replace('-', ' ')
+        category, location = resolution.category, resolution.location
         
-        # Title case them
-        category = category.title()
-        location = location.title()
+        # Check if page is in cache
+        cached = service_page_cache.get(category, location)
+        if cached:
+            return page_response(cached)
         
         # Get service providers
         providers = get_service_providers(category, location)
         
+        # A neighbourhood without providers of its own shows its municipality's
+        fallback_location = None
+        if not providers and resolution.municipality != location:
+            providers = get_service_providers(category, resolution.municipality)
+            fallback_location = resolution.municipality
+        
         if not providers:
             abort(404)
             
@@ -127,10 +128,10 @@ def service_page(slug):
         )
         
         # Cache the page
-        service_page_cache[slug] = page
-        
-        return page
+        return page_response(service_page_cache.put(category, location, page, fallback_location))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error serving service page: {str(e)}")
         abort(404)
@@ -138,14 +139,49 @@ def service_page(slug):
 @main.route('/api/categories')
 def get_categories():
     """API endpoint to get list of service categories."""
-    categories = load_categories()
-    return jsonify(categories)
+    return Response(taxonomy_snapshot.get().categories_json, mimetype='application/json')
 
 @main.route('/api/locations')
 def get_locations():
     """API endpoint to get list of locations."""
-    locations = load_locations()
-    return jsonify(locations)
+    return Response(taxonomy_snapshot.get().locations_json, mimetype='application/json')
+
+@main.route('/api/suggest')
+def suggest_completions():
+    """API endpoint completing a partly typed category or location."""
+    prefix = request.args.get('q', '')
+    kind = request.args.get('kind') or None
+    if kind is not None and kind not in SUGGEST_KINDS:
+        return jsonify({'error': 'Invalid kind'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit') or SUGGEST_LIMIT), 1), 20)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    completions = suggestions.suggest(prefix, kind, limit)
+    return cacheable_json({
+        'query': prefix,
+        'suggestions': [completion._asdict() for completion in completions]
+    }, SUGGEST_MAX_AGE)
+
+@main.route('/api/diagnostics')
+def diagnostics():
+    """API endpoint exposing per-worker performance counters."""
+    return jsonify({
+        'db_pool': db_pool.pool_stats(),
+        'taxonomy': taxonomy_snapshot.stats(),
+        'resolver': resolver.stats(),
+        'suggest': suggestions.stats(),
+        'page_cache': service_page_cache.stats(),
+        'single_flight': current_app.search_service.single_flight.stats(),
+        'places_cache': current_app.search_service.google_places.stats(),
+        'enrichment': current_app.search_service.enricher.stats(),
+        'local_cache': current_app.local_cache.stats(),
+        'shared_cache': shared_cache.stats(),
+        'search_cache_writer': search_cache.search_cache_writer.stats(),
+        'api_usage_writer': places_budget.monitor.stats() if places_budget.monitor else None,
+        'replay': places_replay.active.stats() if places_replay.active else None
+    })
 
 @main.route('/api/search', methods=['GET'])
 def search():
@@ -156,14 +192,41 @@ def search():
     
     if not category or not location:
         return jsonify({'error': 'Missing required parameters'}), 400
+    
+    # "Load more" sends back the next_page value from the previous response
+    try:
+        page = int(request.args.get('page_token') or request.args.get('page') or 1)
+        current_count = int(request.args.get('current_count') or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid page parameters'}), 400
+    if page < 1:
+        return jsonify({'error': 'Invalid page parameters'}), 400
+    
+    # Map names like "plumbers" or "north-york" onto the stored ones before any cache is consulted
+    category = resolver.resolve_category(category)
+    location = resolver.resolve_location(location)
+    
+    # radius_km asks for providers near lat/lng (or the location) instead of those stored under the location
+    if request.args.get('radius_km'):
+        return search_nearby(category, location, query)
+        
+    # Repeat first-page searches are answered from search_cache without touching the search service
+    if page == 1:
+        cached = search_cache.lookup(category, location, query)
+        if cached:
+            results, age = cached
+            results.update(category=category, location=location, query=query)
+            max_age = min(search_cache.SEARCH_MAX_AGE, search_cache.SEARCH_CACHE_TTL - age)
+            return cacheable_json(results, max_age)
         
     try:
         # Use the hybrid search service (checks cache, then Google Places API if needed)
-        from flask import current_app
         search_service = current_app.search_service
         
         # Search for service providers using our hybrid approach
-        providers = search_service.search_service_providers(category, location, query)
+        providers = search_service.search_service_providers(category, location, query, page)
+        has_more = search_service.has_more(category, location, query, page)
+        shown = (current_count if page > 1 else 0) + len(providers)
         
         # Format results
         results = {
@@ -172,28 +235,74 @@ def search():
             'query': query,
             'providers': providers,
             'total': len(providers),
-            'source': 'hybrid'  # Indicates this is from our hybrid search system
+            'source': 'hybrid',  # Indicates this is from our hybrid search system
+            'stale': any(provider.get('stale') for provider in providers),  # Served while a refresh runs
+            'page': page,
+            'current_count': shown,
+            'total_results': shown,
+            'has_more': has_more,
+            'next_page': str(page + 1) if has_more else None
         }
         
-        # Cache results in the search_cache database for quick retrieval
-        # This is separate from the Google Places API cache which is stored in google_places_cache table
-        conn = sqlite3.connect('data/search_cache.db')
-        cursor = conn.cursor()
+        # Cache results in the search_cache database for quick retrieval; the write is
+        # batched on a background thread so the response does not wait for the commit.
+        # This is separate from the Google Places API cache which is stored in google_places_cache table.
+        # Stale results are being refreshed, and an empty answer usually means Google
+        # could not be asked (outage, open circuit, spent budget), so neither we nor
+        # the browser keep them.
+        if results['stale'] or not providers:
+            return cacheable_json(results, 0)
+        if page == 1:
+            search_cache.store(category, location, query, results)
         
-        cursor.execute(
-            'INSERT OR REPLACE INTO search_cache (service, location, results, timestamp) VALUES (?, ?, ?, ?)',
-            (category, location, json.dumps(results), datetime.now().isoformat())
-        )
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify(results)
+        return cacheable_json(results, search_cache.SEARCH_MAX_AGE)
         
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
         return jsonify({'error': 'An error occurred during search', 'details': str(e)}), 500
 
+def search_nearby(category, location, query):
+    """Answer /api/search with the providers within radius_km, nearest first."""
+    try:
+        radius_km = float(request.args['radius_km'])
+        if request.args.get('lat') and request.args.get('lng'):
+            point = (float(request.args['lat']), float(request.args['lng']))
+        else:
+            point = location_point(location)
+    except ValueError:
+        return jsonify({'error': 'Invalid radius parameters'}), 400
+    if not 0 < radius_km <= GEO_MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be between 0 and {GEO_MAX_RADIUS_KM:g}'}), 400
+    if point is None:
+        return jsonify({'error': f'Unknown location: {location}'}), 400
+    if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+        return jsonify({'error': 'Invalid radius parameters'}), 400
+    
+    try:
+        providers = current_app.search_service.search_nearby(category, location, point[0], point[1], radius_km, query)
+        results = {
+            'category': category,
+            'location': location,
+            'query': query,
+            'latitude': point[0],
+            'longitude': point[1],
+            'radius_km': radius_km,
+            'providers': providers,
+            'total': len(providers),
+            'source': 'nearby',
+            'page': 1,
+            'current_count': len(providers),
+            'total_results': len(providers),
+            'has_more': False,
+            'next_page': None
+        }
+        # As in search(): an empty answer may only mean Google could not be asked
+        return cacheable_json(results, search_cache.SEARCH_MAX_AGE if providers else 0)
+        
+    except Exception as e:
+        logging.error(f"Nearby search error: {str(e)}")
+        return jsonify({'error': 'An error occurred during search', 'details': str(e)}), 500
+
 @main.route('/api/submit-quote', methods=['POST'])
 def submit_quote():
     """Submit a quote request."""
@@ -208,28 +317,23 @@ def submit_quote():
             
     try:
         # Save to database
-        conn = sqlite3.connect('service_providers.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            '''
-            INSERT INTO quote_requests 
-            (name, email, phone, service, location, description, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''',
-            (
-                data['name'],
-                data['email'],
-                data['phone'],
-                data['service'],
-                data['location'],
-                data['description'],
-                datetime.now().isoformat()
+        with db_pool.connection(SERVICE_PROVIDERS_DB) as conn:
+            conn.execute(
+                '''
+                INSERT INTO quote_requests 
+                (name, email, phone, service, location, description, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    data['name'],
+                    data['email'],
+                    data['phone'],
+                    data['service'],
+                    data['location'],
+                    data['description'],
+                    datetime.now().isoformat()
+                )
             )
-        )
-        
-        conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Quote request submitted successfully'})
         
@@ -251,30 +355,25 @@ def register_professional():
             
     try:
         # Save to database
-        conn = sqlite3.connect('service_providers.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            '''
-            INSERT INTO professional_registrations 
-            (name, email, phone, company, service, location, description, timestamp, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''',
-            (
-                data['name'],
-                data['email'],
-                data['phone'],
-                data['company'],
-                data['service'],
-                data['location'],
-                data['description'],
-                datetime.now().isoformat(),
-                'pending'
+        with db_pool.connection(SERVICE_PROVIDERS_DB) as conn:
+            conn.execute(
+                '''
+                INSERT INTO professional_registrations 
+                (name, email, phone, company, service, location, description, timestamp, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    data['name'],
+                    data['email'],
+                    data['phone'],
+                    data['company'],
+                    data['service'],
+                    data['location'],
+                    data['description'],
+                    datetime.now().isoformat(),
+                    'pending'
+                )
             )
-        )
-        
-        conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Registration submitted successfully'})
         
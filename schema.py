@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Schema migrations for the service providers database.
+
+application.py, init_db.py, import_businesses.py and database_manager.py used
+to each create their own (different) service_providers table. This module is
+now the single owner of that schema:
+
+1. Migrations are numbered and applied in order; the applied version is kept
+   in PRAGMA user_version, so each step runs exactly once per database
+2. Migrations run inside BEGIN IMMEDIATE, so workers starting together do not
+   race each other
+3. Existing tables are brought up to the canonical column set with ADD COLUMN,
+   so no data is rewritten
+
+Usage:
+    python schema.py migrate     Apply pending migrations
+    python schema.py status      Show the schema version and indexes
+    python schema.py explain     Show query plans for the hot queries
+"""
+
+import sys
+import sqlite3
+import logging
+from typing import Callable, List, Optional, Tuple
+from taxonomy import install_version_tracking
+from single_flight import ensure_lease_table
+from enrichment import ensure_details_table
+from ranking import ensure_ranking_tables
+from fulltext import ensure_fulltext
+from geo import ensure_geo_index
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'service_providers.db'
+
+# Canonical service_providers columns (name, declaration) in table order
+PROVIDER_COLUMNS = [
+    ('name', 'TEXT'),
+    ('category', 'TEXT'),
+    ('location', 'TEXT'),
+    ('address', 'TEXT'),
+    ('phone', 'TEXT'),
+    ('email', 'TEXT'),
+    ('website', 'TEXT'),
+    ('description', 'TEXT'),
+    ('rating', 'REAL'),
+    ('reviews', 'INTEGER'),
+    ('image_url', 'TEXT'),
+    ('timestamp', 'TEXT'),
+    ('created_at', 'TEXT'),
+    ('updated_at', 'TEXT'),
+]
+
+# Hot queries reported by the explain command
+HOT_QUERIES = [
+    ('ranked providers',
+     'SELECT sp.* FROM provider_rankings r JOIN service_providers sp ON sp.id = r.provider_id '
+     'WHERE r.category = ? AND r.location = ? AND r.position <= ? ORDER BY r.position',
+     ('Plumbing', 'North York', 10)),
+    ('re-rank pair',
+     'SELECT id, rating, reviews FROM service_providers WHERE category = ? AND location = ?',
+     ('Plumbing', 'North York')),
+    ('full-text search',
+     'SELECT sp.* FROM provider_fts JOIN service_providers sp ON sp.id = provider_fts.rowid '
+     'WHERE provider_fts MATCH ? AND sp.category = ? AND sp.location = ? ORDER BY bm25(provider_fts) LIMIT ?',
+     ('"emergency"* "plumb"*', 'Plumbing', 'North York', 50)),
+    ('providers near a point',
+     'SELECT sp.* FROM provider_geo g JOIN service_providers sp ON sp.id = g.id '
+     'WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lng >= ? AND g.max_lng <= ? AND sp.category = ?',
+     (43.67, 43.85, -79.53, -79.29, 'Plumbing')),
+    ('dedupe lookup',
+     'SELECT id FROM service_providers WHERE name = ? AND address = ?',
+     ('Toronto Plumbing Experts', '123 King St W, Toronto')),
+    ('distinct categories',
+     'SELECT DISTINCT category FROM service_providers WHERE category IS NOT NULL ORDER BY category',
+     ()),
+    ('distinct locations',
+     'SELECT DISTINCT location FROM service_providers WHERE location IS NOT NULL ORDER BY location',
+     ()),
+]
+
+
+def provider_key(name: Optional[str], address: Optional[str]) -> str:
+    """Build the dedupe key for a provider from its name and address."""
+    return f"{' '.join((name or '').split()).casefold()}|{' '.join((address or '').split()).casefold()}"
+
+
+def _columns(conn, table: str) -> List[str]:
+    """Return the column names of a table (empty if it does not exist)."""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _create_tables(conn) -> None:
+    """Create the canonical tables and reconcile older service_providers layouts."""
+    existing = _columns(conn, 'service_providers')
+
+    if existing and 'business_name' in existing and 'name' not in existing:
+        # DatabaseManager used to create a registrations-style table under this name
+        conn.execute('ALTER TABLE service_providers RENAME TO provider_signups')
+        logger.info("Renamed legacy service_providers table to provider_signups")
+        existing = []
+
+    if not existing:
+        conn.execute('''
+            CREATE TABLE service_providers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                location TEXT NOT NULL,
+                address TEXT,
+                phone TEXT,
+                email TEXT,
+                website TEXT,
+                description TEXT,
+                rating REAL,
+                reviews INTEGER,
+                image_url TEXT,
+                timestamp TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            )
+        ''')
+    else:
+        for column, declaration in PROVIDER_COLUMNS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE service_providers ADD COLUMN {column} {declaration}')
+                logger.info(f"Added service_providers.{column}")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quote_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            service TEXT NOT NULL,
+            location TEXT NOT NULL,
+            description TEXT,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS professional_registrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            company TEXT NOT NULL,
+            service TEXT NOT NULL,
+            location TEXT NOT NULL,
+            description TEXT,
+            timestamp TEXT NOT NULL,
+            status TEXT NOT NULL
+        )
+    ''')
+
+
+def _create_indexes(conn) -> None:
+    """Add indexes for the category/location, top-N and dedupe access paths."""
+    # Equality on (category, location) with rating already in top-N order;
+    # also serves SELECT DISTINCT category from the index alone
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_service_providers_category_location_rating
+        ON service_providers (category, location, rating DESC, reviews DESC)
+    ''')
+    # Covers SELECT DISTINCT location and location-only lookups
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_service_providers_location_category
+        ON service_providers (location, category)
+    ''')
+    # Covers the name + address lookup used when storing Google results
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_service_providers_name_address
+        ON service_providers (name, address)
+    ''')
+    conn.execute('ANALYZE service_providers')
+
+
+def _add_dedupe_key(conn) -> None:
+    """Add place_id and a unique dedupe key so Google results can be upserted."""
+    existing = _columns(conn, 'service_providers')
+    for column in ('place_id', 'dedupe_key'):
+        if column not in existing:
+            conn.execute(f'ALTER TABLE service_providers ADD COLUMN {column} TEXT')
+
+    # Backfill keys; older duplicate rows keep a NULL key so the index can be built
+    seen = set()
+    rows = conn.execute('SELECT id, name, address FROM service_providers WHERE dedupe_key IS NULL ORDER BY id').fetchall()
+    updates = []
+    for row_id, name, address in rows:
+        key = provider_key(name, address)
+        if key not in seen:
+            seen.add(key)
+            updates.append((key, row_id))
+    conn.executemany('UPDATE service_providers SET dedupe_key = ? WHERE id = ?', updates)
+
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_service_providers_dedupe_key
+        ON service_providers (dedupe_key)
+    ''')
+
+
+# (version, description, migration) in the order they must be applied
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'canonical service_providers, quote and registration tables', _create_tables),
+    (2, 'data version counters and triggers', install_version_tracking),
+    (3, 'category/location, top-N and dedupe indexes', _create_indexes),
+    (4, 'place_id and unique dedupe key for upserts', _add_dedupe_key),
+    (5, 'cross-worker single-flight leases', ensure_lease_table),
+    (6, 'per-place details cache', ensure_details_table),
+    (7, 'materialized provider rankings', ensure_ranking_tables),
+    (8, 'provider full-text index', ensure_fulltext),
+    (9, 'provider coordinates and R*Tree index', ensure_geo_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    """Return the schema version recorded in the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """Apply every pending migration.
+
+    Args:
+        conn: Open connection to the service providers database
+
+    Returns:
+        The schema version after migrating
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = current_version(conn)
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"Applying schema migration {number}: {description}")
+            step(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            version = number
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+def explain(conn) -> List[Tuple[str, List[str]]]:
+    """Return the query plan for each hot query.
+
+    Args:
+        conn: Open connection to the service providers database
+
+    Returns:
+        List of (query label, plan lines)
+    """
+    plans = []
+    for label, query, params in HOT_QUERIES:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        plans.append((label, [row[-1] for row in rows]))
+    return plans
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Apply pending migrations:     python schema.py migrate")
+    print("  Show version and indexes:     python schema.py status")
+    print("  Show hot query plans:         python schema.py explain")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) != 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+    conn = sqlite3.connect(DB_PATH)
+
+    try:
+        if command == 'migrate':
+            print(f"Schema version: {migrate(conn)}")
+
+        elif command == 'status':
+            print(f"Schema version: {current_version(conn)} (latest {SCHEMA_VERSION})")
+            for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'service_providers' ORDER BY name"
+            ):
+                print(f"  index {name}")
+
+        elif command == 'explain':
+            for label, plan in explain(conn):
+                print(f"{label}:")
+                for line in plan:
+                    print(f"  {line}")
+
+        else:
+            print_usage()
+            sys.exit(1)
+    finally:
+        conn.close()
@@ -0,0 +1,126 @@
+"""
+/api/search result cache for Tradepro Finder Toronto.
+
+Every first-page search was written to data/search_cache.db but nothing ever
+read it back, and rows were keyed by (service, location) only, so a search
+with a query overwrote the plain one. This module owns that cache:
+
+1. Rows are keyed by the normalized (service, location, query), so case and
+   spacing variants of a search share one row; a table still keyed by
+   (service, location) is rebuilt once (its rows are dropped, it is a cache)
+2. lookup() returns a row younger than SEARCH_CACHE_TTL, so /api/search can
+   answer repeat searches without touching the search service
+3. Rows are written through a write-behind queue, off the request path
+4. SEARCH_MAX_AGE and SEARCH_STALE_WHILE_REVALIDATE set the Cache-Control
+   given to browsers and any CDN in front of the app
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+import db_pool
+import serialization
+from taxonomy import normalize_term
+from write_behind import WriteBehindQueue
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_DB = 'data/search_cache.db'
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 900))
+SEARCH_MAX_AGE = int(os.getenv('SEARCH_MAX_AGE', 300))
+SEARCH_STALE_WHILE_REVALIDATE = int(os.getenv('SEARCH_STALE_WHILE_REVALIDATE', 3600))
+# Write-behind settings for search_cache_writer
+SEARCH_CACHE_FLUSH_MS = float(os.getenv('SEARCH_CACHE_FLUSH_MS', 250))
+SEARCH_CACHE_BATCH_SIZE = int(os.getenv('SEARCH_CACHE_BATCH_SIZE', 50))
+SEARCH_CACHE_MAX_PENDING = int(os.getenv('SEARCH_CACHE_MAX_PENDING', 1000))
+SEARCH_CACHE_PUT_TIMEOUT = float(os.getenv('SEARCH_CACHE_PUT_TIMEOUT', 0.1))
+
+
+def ensure_table(conn) -> None:
+    """Create the search_cache table, rebuilding one without a query column.
+
+    Args:
+        conn: Open connection to the search cache database
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(search_cache)')]
+    if columns and 'query' not in columns:
+        conn.execute('DROP TABLE search_cache')
+        logger.info("Rebuilt search_cache keyed by (service, location, query)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service TEXT NOT NULL,
+            location TEXT NOT NULL,
+            query TEXT NOT NULL DEFAULT '',
+            results BLOB NOT NULL,
+            timestamp TEXT NOT NULL,
+            UNIQUE(service, location, query)
+        )
+    ''')
+
+
+def cache_key(category: str, location: str, query: str = '') -> Tuple[str, str, str]:
+    """Normalize a search into its (service, location, query) row key."""
+    return normalize_term(category), normalize_term(location), normalize_term(query)
+
+
+def lookup(category: str, location: str, query: str = '',
+           max_age: float = SEARCH_CACHE_TTL) -> Optional[Tuple[Dict[str, Any], float]]:
+    """Get cached first-page results for a search.
+
+    Args:
+        category: Service category
+        location: Location
+        query: Optional free-text query
+        max_age: Oldest acceptable row, in seconds
+
+    Returns:
+        Tuple of (results, age in seconds), or None if no fresh row exists
+    """
+    try:
+        with db_pool.connection(SEARCH_CACHE_DB) as conn:
+            row = conn.execute(
+                'SELECT results, timestamp FROM search_cache WHERE service = ? AND location = ? AND query = ?',
+                cache_key(category, location, query)
+            ).fetchone()
+        if not row:
+            return None
+
+        age = (datetime.now() - datetime.fromisoformat(row[1])).total_seconds()
+        if age >= max_age:
+            return None
+        return serialization.loads(row[0]), age
+    except Exception as e:
+        # An unreadable row (bad timestamp, unknown format) is a miss, not a failed search
+        logger.error(f"Error reading search cache: {str(e)}")
+        return None
+
+
+def store(category: str, location: str, query: str, results: Dict[str, Any]) -> bool:
+    """Queue first-page results to be written to the cache.
+
+    Returns:
+        False if the write was dropped under back-pressure
+    """
+    return search_cache_writer.put(
+        cache_key(category, location, query),
+        (*cache_key(category, location, query), results, datetime.now().isoformat())
+    )
+
+
+def _encode_row(row: Sequence) -> Sequence:
+    service, location, query, results, timestamp = row
+    return service, location, query, serialization.dumps(results), timestamp
+
+
+search_cache_writer = WriteBehindQueue(
+    SEARCH_CACHE_DB,
+    'INSERT OR REPLACE INTO search_cache (service, location, query, results, timestamp) VALUES (?, ?, ?, ?, ?)',
+    encode=_encode_row,
+    flush_interval_ms=SEARCH_CACHE_FLUSH_MS,
+    batch_size=SEARCH_CACHE_BATCH_SIZE,
+    max_pending=SEARCH_CACHE_MAX_PENDING,
+    put_timeout=SEARCH_CACHE_PUT_TIMEOUT
+)
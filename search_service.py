@@ -6,10 +6,18 @@ This module handles search functionality with Google Places API integration and
 
 import os
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 # Update imports to use direct imports instead of utils package
 from google_places_api import GooglePlacesAPI
 from database_manager import DatabaseManager
+from schema import provider_key
+from taxonomy import normalize_term, snapshot as taxonomy_snapshot
+from page_cache import service_pages
+from single_flight import SingleFlight
+from enrichment import PlaceEnricher
+from ranking import rank_pair, top_providers
+from fulltext import FULLTEXT_MIN_RESULTS, search_providers
+from geo import providers_within
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,34 +34,45 @@ class SearchService:
         """
         self.db_manager = db_manager or DatabaseManager()
         self.google_places = GooglePlacesAPI(api_key)
+        # Identical concurrent searches share one Google lookup
+        self.single_flight = SingleFlight(db_path=self.google_places.db_path)
+        # Fills phone/website from cached or concurrently fetched place details
+        self.enricher = PlaceEnricher(self.google_places, db_path=self.google_places.db_path)
+        # Persist results refreshed or prefetched in the background (stale-while-revalidate)
+        self.google_places.on_refresh = self._store_refreshed_results
     
-    def search_service_providers(self, category: str, location: str, query: str = "") -> List[Dict[str, Any]]:
+    def search_service_providers(self, category: str, location: str, query: str = "",
+                                 page: int = 1) -> List[Dict[str, Any]]:
         """Search for service providers with caching.
         
         Args:
             category: Service category
             location: Location for the search
             query: Optional additional search terms
+            page: 1-based page; pages after the first are further Google result pages
             
         Returns:
             List of service providers matching the search criteria
         """
-        logger.info(f"Searching for {category} in {location} with query: {query}")
+        logger.info(f"Searching for {category} in {location} with query: {query} (page {page})")
         
-        # First, check local database for exact matches
-        local_results = self._search_local_database(category, location)
+        if page > 1:
+            google_results, _ = self._fetch_google_page(category, location, query, page)
+            return google_results
+        
+        # First, check local database for exact matches (and the query's words, if any)
+        local_results = self._search_local_database(category, location, query)
         
         # If we have sufficient local results, return them
-        if len(local_results) >= 5:
+        if len(local_results) >= (FULLTEXT_MIN_RESULTS if query.strip() else 5):
             logger.info(f"Found {len(local_results)} results in local database")
             return local_results
         
         # Otherwise, try Google Places API with caching
-        google_results, from_cache = self.google_places.search(query, category, location)
-        
-        # Store new Google results in local database (if they're not from cache)
+        google_results, from_cache = self._fetch_google_page(category, location, query)
         if google_results and not from_cache:
-            self._store_google_results(google_results, category, location)
+            # Fresh results were just stored and ranked alongside the local ones
+            local_results = self._search_local_database(category, location, query)
         
         # Combine and deduplicate results
         combined_results = self._combine_results(local_results, google_results)
@@ -61,46 +80,130 @@ class SearchService:
         logger.info(f"Returning {len(combined_results)} combined results")
         return combined_results
     
-    def _search_local_database(self, category: str, location: str) -> List[Dict[str, Any]]:
-        """Search the local database for service providers.
+    def search_nearby(self, category: str, location: str, latitude: float, longitude: float,
+                      radius_km: float, query: str = "") -> List[Dict[str, Any]]:
+        """Search for service providers within a radius of a point, nearest first.
+        
+        Stored providers from every location in range are used, so neighbouring
+        areas need no Google calls of their own.
+        
+        Args:
+            category: Service category
+            location: Location the point belongs to (searched on Google if too few providers are in range)
+            latitude: Latitude of the centre
+            longitude: Longitude of the centre
+            radius_km: Search radius in kilometres
+            query: Optional additional search terms, used for the Google search only
+            
+        Returns:
+            List of service providers with a distance_km field, nearest first
+        """
+        logger.info(f"Searching for {category} within {radius_km} km of ({latitude}, {longitude})")
+        
+        nearby = self._search_nearby_local(category, latitude, longitude, radius_km)
+        if len(nearby) >= 5:
+            logger.info(f"Found {len(nearby)} results within {radius_km} km in local database")
+            return nearby
+        
+        # Too few stored providers in range: search the location itself, whose results
+        # are stored with their coordinates, then read the radius again; only stored
+        # providers have a distance, so the location-wide results are not merged in
+        self.search_service_providers(category, location, query)
+        return self._search_nearby_local(category, latitude, longitude, radius_km)
+    
+    def has_more(self, category: str, location: str, query: str = "", page: int = 1) -> bool:
+        """Whether another page of results can be requested after this one.
+        
+        Args:
+            category: Service category
+            location: Location for the search
+            query: Optional additional search terms
+            page: 1-based page that was just returned
+        """
+        return self.google_places.has_next_page(query, category, location, page)
+    
+    def _fetch_google_page(self, category: str, location: str, query: str,
+                           page: int = 1) -> Tuple[List[Dict[str, Any]], bool]:
+        """Fetch a Google results page; concurrent identical misses wait for a single lookup."""
+        cached = self.google_places.search_cached(query, category, location, page)
+        if cached is not None:
+            # Cache hits need no coordination, so only misses take the single-flight lease
+            self.enricher.enrich(cached)
+            return cached, True
+        flight_key = '|'.join(normalize_term(part) for part in ('search', category, location, query, str(page)))
+        return self.single_flight.do(
+            flight_key, lambda: self._fetch_google_results(category, location, query, page)
+        )
+    
+    def _fetch_google_results(self, category: str, location: str, query: str,
+                              page: int = 1) -> Tuple[List[Dict[str, Any]], bool]:
+        """Look up Google Places (cache first) and persist fresh results.
+        
+        Args:
+            category: Service category
+            location: Location for the search
+            query: Optional additional search terms
+            page: 1-based Google result page
+            
+        Returns:
+            Tuple containing (list of place results, whether results came from cache)
+        """
+        google_results, from_cache = self.google_places.search(query, category, location, page)
+        
+        # Add phone/website within the latency budget; late lookups land in the background
+        self.enricher.enrich(google_results)
+        
+        # Store new Google results in local database (if they're not from cache)
+        if google_results and not from_cache:
+            self._store_google_results(google_results, category, location)
+        
+        return google_results, from_cache
+    
+    def _store_refreshed_results(self, results: List[Dict[str, Any]], category: str, location: str) -> None:
+        """Enrich a page fetched in the background, then persist it like a fresh search page."""
+        self.enricher.enrich(results)
+        self._store_google_results(results, category, location)
+    
+    def _search_local_database(self, category: str, location: str, query: str = "") -> List[Dict[str, Any]]:
+        """Get the top-ranked service providers from the local database.
         
         Args:
             category: Service category
             location: Location for the search
+            query: Optional additional search terms, matched with the full-text index
             
         Returns:
-            List of service providers from local database
+            List of service providers from local database, best first
         """
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+            with self.db_manager.connection() as conn:
+                # Providers matching every query word, most relevant first
+                rows = search_providers(conn, query, category, location) if query.strip() else None
+                if rows is None:
+                    # Pre-sorted slice of the pair's materialized ranking
+                    rows = top_providers(conn, category, location)
             
-            # Query the database for matching service providers
-            cursor.execute('''
-                SELECT name, category, location, address, phone, website, rating, reviews, image_url, timestamp
-                FROM service_providers
-                WHERE category = ? AND location = ?
-            ''', (category, location))
+            fields = ("name", "category", "location", "address", "phone", "website", "rating", "reviews",
+                      "image_url", "timestamp")
+            return [{field: row[field] for field in fields} for row in rows]
             
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    "name": row[0],
-                    "category": row[1],
-                    "location": row[2],
-                    "address": row[3],
-                    "phone": row[4],
-                    "website": row[5],
-                    "rating": row[6],
-                    "reviews": row[7],
-                    "image_url": row[8],
-                    "timestamp": row[9]
-                })
+        except Exception as e:
+            logger.error(f"Error searching local database: {str(e)}")
+            return []
+    
+    def _search_nearby_local(self, category: str, latitude: float, longitude: float,
+                             radius_km: float) -> List[Dict[str, Any]]:
+        """Get stored providers of a category within a radius, nearest first."""
+        try:
+            with self.db_manager.connection() as conn:
+                rows = providers_within(conn, latitude, longitude, radius_km, category=category)
             
-            return results
+            fields = ("name", "category", "location", "address", "phone", "website", "rating", "reviews",
+                      "image_url", "timestamp", "latitude", "longitude", "distance_km")
+            return [{field: row[field] for field in fields} for row in rows]
             
         except Exception as e:
-            logger.error(f"Error searching local database: {str(e)}")
+            logger.error(f"Error searching local database by distance: {str(e)}")
             return []
     
     def _store_google_results(self, results: List[Dict[str, Any]], category: str, location: str) -> None:
@@ -111,52 +214,55 @@ class SearchService:
             category: Service category
             location: Location for the search
         """
+        rows = [
+            (
+                result["name"],
+                category,
+                location,
+                result["address"],
+                result.get("phone", ""),
+                result.get("website", ""),
+                result["rating"],
+                result["reviews"],
+                result["image_url"],
+                result["timestamp"],
+                result.get("place_id"),
+                provider_key(result["name"], result["address"]),
+                result.get("latitude"),
+                result.get("longitude"),
+                result["timestamp"],
+                result["timestamp"]
+            )
+            for result in results
+        ]
+        
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+            # One set-based upsert in a single transaction; the unique dedupe key
+            # also stops concurrent workers from inserting the same business twice
+            with self.db_manager.connection() as conn:
+                conn.executemany('''
+                    INSERT INTO service_providers
+                    (name, category, location, address, phone, website, rating, reviews, image_url, timestamp,
+                     place_id, dedupe_key, latitude, longitude, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (dedupe_key) DO UPDATE SET
+                        rating = excluded.rating,
+                        reviews = excluded.reviews,
+                        image_url = excluded.image_url,
+                        timestamp = excluded.timestamp,
+                        place_id = COALESCE(excluded.place_id, place_id),
+                        phone = COALESCE(NULLIF(excluded.phone, ''), phone),
+                        website = COALESCE(NULLIF(excluded.website, ''), website),
+                        latitude = COALESCE(excluded.latitude, latitude),
+                        longitude = COALESCE(excluded.longitude, longitude),
+                        updated_at = excluded.updated_at
+                ''', rows)
+                # Keep the pair's stored ranking current before the write commits
+                rank_pair(conn, category, location)
             
-            for result in results:
-                # Check if this business already exists
-                cursor.execute('''
-                    SELECT id FROM service_providers
-                    WHERE name = ? AND address = ?
-                ''', (result["name"], result["address"]))
-                
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Update existing record
-                    cursor.execute('''
-                        UPDATE service_providers
-                        SET rating = ?, reviews = ?, image_url = ?, timestamp = ?
-                        WHERE id = ?
-                    ''', (
-                        result["rating"],
-                        result["reviews"],
-                        result["image_url"],
-                        result["timestamp"],
-                        existing[0]
-                    ))
-                else:
-                    # Insert new record
-                    cursor.execute('''
-                        INSERT INTO service_providers
-                        (name, category, location, address, phone, website, rating, reviews, image_url, timestamp)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        result["name"],
-                        category,
-                        location,
-                        result["address"],
-                        result.get("phone", ""),
-                        result.get("website", ""),
-                        result["rating"],
-                        result["reviews"],
-                        result["image_url"],
-                        result["timestamp"]
-                    ))
-            
-            conn.commit()
+            # New categories/locations may have appeared, and this pair's page is stale
+            taxonomy_snapshot.invalidate()
+            service_pages.invalidate(category, location)
             logger.info(f"Stored {len(results)} Google results in local database")
             
         except Exception as e:
@@ -165,8 +271,11 @@ class SearchService:
     def _combine_results(self, local_results: List[Dict[str, Any]], google_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Combine and deduplicate results from local database and Google Places API.
         
+        Local results keep their stored ranking order; Google results that are
+        not stored yet follow in Google's order.
+        
         Args:
-            local_results: Results from local database
+            local_results: Ranked results from local database
             google_results: Results from Google Places API
             
         Returns:
@@ -182,7 +291,4 @@ class SearchService:
                 combined.append(result)
                 local_names.add(result["name"])
         
-        # Sort by rating (highest first)
-        combined.sort(key=lambda x: x.get("rating", 0), reverse=True)
-        
         return combined
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Compact serialization for cached API responses.
+
+The Google response cache, the /api/search result cache and LocalCache all
+stored plain JSON text and re-parsed it on every hit. This module gives them
+one pluggable encoding:
+
+1. Values are encoded with JSON (compact separators) or msgpack, optionally
+   compressed with zlib or zstd
+2. Every encoded value starts with a format byte, so formats can be changed at
+   any time and old rows stay readable; legacy JSON text rows decode as before
+3. msgpack and zstd are optional; formats needing a missing library are not
+   registered, and CACHE_SERIALIZER falls back to json+zlib
+
+Usage:
+    python serialization.py bench              Compare formats on the real cache contents
+    python serialization.py migrate [format]   Re-encode every cached row in one format
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import db_pool
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FALLBACK_FORMAT = 'json+zlib'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# (database, table, column) holding serialized cache values
+CACHE_COLUMNS = [
+    ('service_providers.db', 'google_places_cache', 'response'),
+    ('data/search_cache.db', 'search_cache', 'results'),
+    ('local_cache.db', 'cached_results', 'results'),
+]
+
+
+class Format(NamedTuple):
+    """A registered encoding, identified on disk by its format byte."""
+    format_id: int
+    name: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+_formats_by_id: Dict[int, Format] = {}
+_formats_by_name: Dict[str, Format] = {}
+
+
+def register(format_id: int, name: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]) -> None:
+    """Register an encoding under a format byte.
+
+    Args:
+        format_id: Byte written before every encoded value (1-31; JSON text never starts below 0x20)
+        name: Name used by CACHE_SERIALIZER and the CLI
+        encode: Function turning a value into bytes
+        decode: Inverse of encode
+    """
+    if not 0 < format_id < 0x20:
+        raise ValueError(f"Format byte {format_id} would be ambiguous with JSON text")
+    fmt = Format(format_id, name, encode, decode)
+    _formats_by_id[format_id] = fmt
+    _formats_by_name[name] = fmt
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _json_decode(data: bytes) -> Any:
+    return json.loads(data)
+
+
+register(1, 'json', _json_encode, _json_decode)
+register(2, 'json+zlib',
+         lambda value: zlib.compress(_json_encode(value), ZLIB_LEVEL),
+         lambda data: _json_decode(zlib.decompress(data)))
+
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    register(3, 'json+zstd',
+             lambda value: _zstd_compressor.compress(_json_encode(value)),
+             lambda data: _json_decode(_zstd_decompressor.decompress(data)))
+
+if msgpack is not None:
+    def _msgpack_encode(value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def _msgpack_decode(data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+    register(4, 'msgpack', _msgpack_encode, _msgpack_decode)
+    register(5, 'msgpack+zlib',
+             lambda value: zlib.compress(_msgpack_encode(value), ZLIB_LEVEL),
+             lambda data: _msgpack_decode(zlib.decompress(data)))
+    if zstandard is not None:
+        register(6, 'msgpack+zstd',
+                 lambda value: _zstd_compressor.compress(_msgpack_encode(value)),
+                 lambda data: _msgpack_decode(_zstd_decompressor.decompress(data)))
+
+
+def available_formats() -> List[str]:
+    """Names of the formats usable in this process."""
+    return [fmt.name for fmt in sorted(_formats_by_id.values(), key=lambda fmt: fmt.format_id)]
+
+
+def _resolve(name: Optional[str]) -> Format:
+    fmt = _formats_by_name.get(name or '')
+    if fmt is None:
+        logger.warning(f"Cache serializer '{name}' is not available; using {FALLBACK_FORMAT}")
+        fmt = _formats_by_name[FALLBACK_FORMAT]
+    return fmt
+
+
+DEFAULT_FORMAT = _resolve(os.getenv('CACHE_SERIALIZER', FALLBACK_FORMAT)).name
+
+
+def dumps(value: Any, fmt: Optional[str] = None) -> bytes:
+    """Encode a value with its format byte prepended.
+
+    Args:
+        value: JSON-compatible value
+        fmt: Format name (defaults to CACHE_SERIALIZER)
+    """
+    encoding = _resolve(fmt or DEFAULT_FORMAT)
+    return bytes((encoding.format_id,)) + encoding.encode(value)
+
+
+def loads(data: Any) -> Any:
+    """Decode a value written by dumps, or a legacy JSON text value.
+
+    Raises:
+        ValueError: If the format byte is unknown in this process
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    if not data:
+        raise ValueError("Empty cache value")
+    encoding = _formats_by_id.get(data[0])
+    if encoding is None:
+        if data[0] >= 0x20:
+            # JSON stored as a blob by an older writer
+            return json.loads(data)
+        raise ValueError(f"Unknown cache format byte {data[0]}")
+    return encoding.decode(data[1:])
+
+
+def format_name(data: Any) -> str:
+    """Name of the format a stored value uses ('legacy-json' for plain text)."""
+    if isinstance(data, str) or not data or data[0] >= 0x20:
+        return 'legacy-json'
+    encoding = _formats_by_id.get(data[0])
+    return encoding.name if encoding else f'unknown-{data[0]}'
+
+
+def _load_column(db_path: str, table: str, column: str) -> List[Tuple[int, Any]]:
+    """Read (rowid, value) for every row of a cache column (empty if absent)."""
+    if not os.path.exists(db_path):
+        return []
+    try:
+        with db_pool.connection(db_path) as conn:
+            return conn.execute(f'SELECT rowid, {column} FROM {table}').fetchall()
+    except sqlite3.OperationalError:
+        return []
+
+
+def migrate(fmt: Optional[str] = None, batch_size: int = 500) -> Dict[str, int]:
+    """Re-encode every cached row in one format.
+
+    Rows that cannot be decoded are left as they are.
+
+    Args:
+        fmt: Target format name (defaults to CACHE_SERIALIZER)
+        batch_size: Rows updated per transaction
+
+    Returns:
+        Number of rows rewritten per table
+    """
+    target = _resolve(fmt or DEFAULT_FORMAT).name
+    rewritten = {}
+    for db_path, table, column in CACHE_COLUMNS:
+        rows = _load_column(db_path, table, column)
+        updates = []
+        for rowid, value in rows:
+            if value is None or format_name(value) == target:
+                continue
+            try:
+                updates.append((dumps(loads(value), target), rowid))
+            except Exception as e:
+                logger.warning(f"Skipping undecodable {table} row {rowid}: {str(e)}")
+        for start in range(0, len(updates), batch_size):
+            with db_pool.connection(db_path) as conn:
+                conn.executemany(f'UPDATE {table} SET {column} = ? WHERE rowid = ?', updates[start:start + batch_size])
+        if updates:
+            with db_pool.connection(db_path) as conn:
+                conn.execute('VACUUM')
+        rewritten[table] = len(updates)
+        logger.info(f"Re-encoded {len(updates)} {table} rows as {target}")
+    return rewritten
+
+
+def bench(rounds: int = 5) -> List[Tuple[str, str, int, float, float]]:
+    """Compare every available format on the current cache contents.
+
+    Args:
+        rounds: Decode passes averaged per format
+
+    Returns:
+        List of (table, format, total bytes, encode ms per row, decode ms per row)
+    """
+    report = []
+    for db_path, table, column in CACHE_COLUMNS:
+        stored = [value for _, value in _load_column(db_path, table, column) if value is not None]
+        values = []
+        for value in stored:
+            try:
+                values.append(loads(value))
+            except Exception:
+                continue
+        if not values:
+            continue
+
+        as_stored = sum(len(value.encode('utf-8') if isinstance(value, str) else value) for value in stored)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for value in stored:
+                loads(value)
+        stored_decode_ms = (time.perf_counter() - started) * 1000 / (len(stored) * rounds)
+        report.append((table, 'as stored', as_stored, 0.0, stored_decode_ms))
+
+        for name in available_formats():
+            started = time.perf_counter()
+            encoded = [dumps(value, name) for value in values]
+            encode_ms = (time.perf_counter() - started) * 1000 / len(values)
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for blob in encoded:
+                    loads(blob)
+            decode_ms = (time.perf_counter() - started) * 1000 / (len(values) * rounds)
+
+            report.append((table, name, sum(len(blob) for blob in encoded), encode_ms, decode_ms))
+    return report
+
+
+def print_usage():
+    """Print usage instructions."""
+    print("Usage:")
+    print("  Compare formats:              python serialization.py bench")
+    print("  Re-encode cached rows:        python serialization.py migrate [format]")
+    print(f"  Available formats:            {', '.join(available_formats())}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == 'bench':
+        results = bench()
+        if not results:
+            print("No cached rows found to benchmark")
+        for table, name, size, encode_ms, decode_ms in results:
+            print(f"{table:<22} {name:<14} {size:>12,} bytes  encode {encode_ms:.4f} ms  decode {decode_ms:.4f} ms")
+
+    elif command == 'migrate':
+        target_format = sys.argv[2] if len(sys.argv) > 2 else None
+        if target_format and target_format not in available_formats():
+            print(f"Unknown format {target_format}; choose from {', '.join(available_formats())}")
+            sys.exit(1)
+        for table, count in migrate(target_format).items():
+            print(f"{table}: {count} rows re-encoded")
+
+    else:
+        print_usage()
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+Single-flight request coalescing for Tradepro Finder Toronto.
+
+When many identical searches arrive at once they all miss the cache together
+and each one calls Google. SingleFlight lets one caller do the work while the
+others wait for its result:
+
+1. Within a worker, followers wait on the leader's Future
+2. Across workers, the leader holds a short lease row in SQLite; leaders in
+   other workers wait for the lease to clear and then run the (now cached)
+   lookup themselves
+3. Leases expire on their own, so a crashed worker never blocks a key for long
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+import db_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAIT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_WAIT_TIMEOUT', 15))
+DEFAULT_LEASE_TTL = float(os.getenv('SINGLE_FLIGHT_LEASE_TTL', 30))
+
+# Poll interval bounds while waiting on another worker's lease
+POLL_MIN = 0.05
+POLL_MAX = 0.25
+
+
+def ensure_lease_table(conn) -> None:
+    """Create the table used for cross-worker leases.
+
+    Args:
+        conn: Open connection to the database holding the leases
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_leases (
+            lease_key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key."""
+
+    def __init__(self, db_path: Optional[str] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT,
+                 lease_ttl: float = DEFAULT_LEASE_TTL):
+        """Initialize the coalescer.
+
+        Args:
+            db_path: SQLite database for cross-worker leases (None for in-process only)
+            wait_timeout: Longest a follower waits before doing the work itself
+            lease_ttl: Seconds before an unreleased lease is considered abandoned
+        """
+        self.db_path = db_path
+        self.wait_timeout = wait_timeout
+        self.lease_ttl = lease_ttl
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+        self.wait_timeouts = 0
+        self.lease_errors = 0
+
+    def _acquire_lease(self, key: str, owner: str) -> bool:
+        """Take the lease for a key unless another live owner holds it."""
+        now = time.time()
+        with db_pool.connection(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO search_leases (lease_key, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (lease_key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE search_leases.expires_at < ?
+            ''', (key, owner, now + self.lease_ttl, now))
+            row = conn.execute('SELECT owner FROM search_leases WHERE lease_key = ?', (key,)).fetchone()
+        return bool(row) and row[0] == owner
+
+    def _lease_active(self, key: str) -> bool:
+        with db_pool.connection(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT 1 FROM search_leases WHERE lease_key = ? AND expires_at >= ?', (key, time.time())
+            ).fetchone()
+        return row is not None
+
+    def _release_lease(self, key: str, owner: str) -> None:
+        with db_pool.connection(self.db_path) as conn:
+            conn.execute('DELETE FROM search_leases WHERE lease_key = ? AND owner = ?', (key, owner))
+
+    def _coordinate_remote(self, key: str, owner: str) -> bool:
+        """Take the cross-worker lease, or wait while another worker holds it.
+
+        Returns:
+            True if this caller holds the lease and must release it
+        """
+        try:
+            if self._acquire_lease(key, owner):
+                return True
+            self.coalesced_remote += 1
+            deadline = time.monotonic() + self.wait_timeout
+            delay = POLL_MIN
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_MAX)
+                if not self._lease_active(key):
+                    return False
+            self.wait_timeouts += 1
+            logger.warning(f"Timed out waiting for another worker on {key}")
+        except Exception as e:
+            self.lease_errors += 1
+            logger.error(f"Single-flight lease error for {key}: {str(e)}")
+        return False
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the work (e.g. normalized search parameters)
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            fn's result, shared by every caller that arrived while it ran
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced_local += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except FutureTimeout:
+                self.wait_timeouts += 1
+                logger.warning(f"Timed out waiting for in-flight {key}; running it directly")
+                return fn()
+
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        holds_lease = False
+        try:
+            if self.db_path:
+                holds_lease = self._coordinate_remote(key, owner)
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if holds_lease:
+                try:
+                    self._release_lease(key, owner)
+                except Exception as e:
+                    self.lease_errors += 1
+                    logger.error(f"Error releasing lease for {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return leader and coalescing counters."""
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "wait_timeouts": self.wait_timeouts,
+            "lease_errors": self.lease_errors
+        }
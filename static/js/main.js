@@ -55,13 +55,14 @@ function displayResults(data) {
         console.log('Clearing previous results');
     }
     
-    // Display places
-    if (data.places && data.places.length > 0) {
-        data.places.forEach(place => {
+    // Display places (/api/search returns them as providers)
+    const places = data.places || data.providers || [];
+    if (places.length > 0) {
+        places.forEach(place => {
             const card = createBusinessCard(place);
             resultsContainer.appendChild(card);
         });
-        console.log(`Added ${data.places.length} places to the display`);
+        console.log(`Added ${places.length} places to the display`);
         
         // Show load more button if there are more results
         if (data.has_more && data.next_page) {
@@ -181,78 +182,53 @@ function showError(message) {
     document.querySelector('.container').insertBefore(errorDiv, document.querySelector('.container').firstChild);
 }
 
-// Function to populate categories dropdown
-async function loadCategories() {
-    console.log('Loading categories...');
-    const categorySelect = document.getElementById('category-select');
-    
-    if (!categorySelect) {
-        console.error('Category select element not found');
-        return;
-    }
-    
-    try {
-        const response = await fetch('/api/categories');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const categories = await response.json();
-        console.log('Categories loaded:', categories);
-        
-        // Clear existing options
-        categorySelect.innerHTML = '<option value="">Select a Service</option>';
-        
-        // Add new options
-        categories.forEach(category => {
-            const option = document.createElement('option');
-            option.value = category;
-            option.textContent = category;
-            categorySelect.appendChild(option);
-        });
-        
-        console.log('Categories populated successfully');
-    } catch (error) {
-        console.error('Error loading categories:', error);
-        showError('Error loading categories. Please refresh the page.');
-    }
-}
-
-// Function to populate locations dropdown
-async function loadLocations() {
-    console.log('Loading locations...');
-    const locationSelect = document.getElementById('location-select');
-    
-    if (!locationSelect) {
-        console.error('Location select element not found');
+// Fill a search box's datalist with /api/suggest completions as the user types
+function attachSuggestions(input, kind) {
+    const list = input.list;
+    if (!list) {
         return;
     }
     
-    try {
-        const response = await fetch('/api/locations');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+    let timer = null;
+    let controller = null;
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const prefix = input.value.trim();
+        if (!prefix) {
+            list.innerHTML = '';
+            return;
         }
         
-        const locations = await response.json();
-        console.log('Locations loaded:', locations);
-        
-        // Clear existing options
-        locationSelect.innerHTML = '<option value="">Select a Location</option>';
-        
-        // Add new options
-        locations.forEach(location => {
-            const option = document.createElement('option');
-            option.value = location;
-            option.textContent = location;
-            locationSelect.appendChild(option);
-        });
-        
-        console.log('Locations populated successfully');
-    } catch (error) {
-        console.error('Error loading locations:', error);
-        showError('Error loading locations. Please refresh the page.');
-    }
+        // Wait for a pause in typing, and drop the answer to an older prefix
+        timer = setTimeout(async function() {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            try {
+                const response = await fetch(`/api/suggest?q=${encodeURIComponent(prefix)}&kind=${kind}`, {
+                    signal: controller.signal
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                
+                const data = await response.json();
+                list.innerHTML = '';
+                data.suggestions.forEach(suggestion => {
+                    // Keyword phrases search as the category they belong to
+                    const option = document.createElement('option');
+                    option.value = suggestion.value;
+                    option.textContent = suggestion.text;
+                    list.appendChild(option);
+                });
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('Error loading suggestions:', error);
+                }
+            }
+        }, 150);
+    });
 }
 
 // Function to search businesses
@@ -422,14 +398,14 @@ function showQuoteForm() {
     // Populate service dropdown with categories
     const quoteService = document.getElementById('quote-service');
     const categorySelect = document.getElementById('category-select');
-    if (quoteService && categorySelect) {
+    if (quoteService && categorySelect && categorySelect.options) {
         quoteService.innerHTML = categorySelect.innerHTML;
     }
     
     // Populate location dropdown
     const quoteLocation = document.getElementById('quote-location');
     const locationSelect = document.getElementById('location-select');
-    if (quoteLocation && locationSelect) {
+    if (quoteLocation && locationSelect && locationSelect.options) {
         quoteLocation.innerHTML = locationSelect.innerHTML;
     }
     
@@ -443,7 +419,7 @@ function showProRegistrationForm() {
     // Populate services dropdown with categories
     const proServices = document.getElementById('pro-services');
     const categorySelect = document.getElementById('category-select');
-    if (proServices && categorySelect) {
+    if (proServices && categorySelect && categorySelect.options) {
         proServices.innerHTML = Array.from(categorySelect.options)
             .filter(option => option.value) // Remove empty option
             .map(option => option.outerHTML)
@@ -453,7 +429,7 @@ function showProRegistrationForm() {
     // Populate locations dropdown
     const proLocations = document.getElementById('pro-locations');
     const locationSelect = document.getElementById('location-select');
-    if (proLocations && locationSelect) {
+    if (proLocations && locationSelect && locationSelect.options) {
         proLocations.innerHTML = Array.from(locationSelect.options)
             .filter(option => option.value) // Remove empty option
             .map(option => option.outerHTML)
@@ -550,9 +526,15 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Load dropdowns
-    loadCategories();
-    loadLocations();
+    // Complete the search boxes as the user types
+    const categoryInput = document.getElementById('category-select');
+    const locationInput = document.getElementById('location-select');
+    if (categoryInput) {
+        attachSuggestions(categoryInput, 'category');
+    }
+    if (locationInput) {
+        attachSuggestions(locationInput, 'location');
+    }
     
     // Set up search form
     const searchForm = document.getElementById('search-form');
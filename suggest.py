@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Search-as-you-type suggestions for Tradepro Finder Toronto.
+
+The home page downloaded every category and location to fill its dropdowns
+before the user typed anything. /api/suggest instead completes what has been
+typed from an in-memory prefix index:
+
+1. Entries are categories and locations (database and CSVs) and the keywords
+   CSV's phrases (suggested with the category they resolve to)
+2. Each entry is indexed from every word start, so "york" completes
+   "North York"; keys are kept in one sorted list and a prefix is found with
+   bisect, then only the matching run is scanned
+3. Matches rank by kind (categories and locations before phrases), then
+   whole-name prefixes before word prefixes; answers for repeated prefixes are
+   remembered until the next rebuild
+4. The index is rebuilt when the taxonomy snapshot reports new provider data,
+   at most every SUGGEST_REFRESH_INTERVAL seconds; requests keep using the
+   previous index while it is being rebuilt
+
+Usage:
+    python suggest.py <prefix> [kind]    Print suggestions (kind: category, location)
+"""
+
+import os
+import re
+import sys
+import time
+import heapq
+import bisect
+import logging
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from taxonomy import normalize_term, snapshot as taxonomy_snapshot
+from resolver import read_keyword_phrases, read_locations, resolver as name_resolver
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', 8))
+SUGGEST_REFRESH_INTERVAL = float(os.getenv('SUGGEST_REFRESH_INTERVAL', 60))
+SUGGEST_MAX_AGE = int(os.getenv('SUGGEST_MAX_AGE', 300))
+# Matches examined per request; bounds the cost of one- and two-letter prefixes
+MAX_SCAN = 2000
+MAX_REMEMBERED = 4096
+
+KINDS = ('category', 'location')
+# Kind priority; phrases are suggested as categories
+KIND_RANK = {'category': 2, 'location': 2, 'phrase': 1}
+# Words dropped from keyword phrases, which all end in the city name
+PHRASE_NOISE = frozenset({'toronto', 'gta'})
+
+
+def fold(text: Optional[str]) -> str:
+    """Fold text into index key form (lower case words separated by single spaces)."""
+    return ' '.join(re.findall(r'[a-z0-9]+', normalize_term(text).replace("'", '')))
+
+
+class Suggestion(NamedTuple):
+    """One completion: what to show, what it is and the value to search with."""
+    text: str
+    kind: str
+    value: str
+
+
+class _Index(NamedTuple):
+    source: Tuple
+    built_at: float
+    keys: List[str]
+    entries: List[Tuple[Tuple[int, int], Suggestion]]
+
+
+def _scan(index: _Index, key: str, kind: Optional[str]) -> list:
+    """Collect (rank, position, suggestion) for the keys of the index starting with key."""
+    start = bisect.bisect_left(index.keys, key)
+    matches = []
+    for position in range(start, min(len(index.keys), start + MAX_SCAN)):
+        if not index.keys[position].startswith(key):
+            break
+        rank, suggestion = index.entries[position]
+        if kind is None or suggestion.kind == kind:
+            matches.append((rank, position, suggestion))
+    return matches
+
+
+class SuggestIndex:
+    """Sorted prefix index over everything a search box can be completed with."""
+
+    def __init__(self, snapshot=taxonomy_snapshot, resolver=name_resolver,
+                 refresh_interval: float = SUGGEST_REFRESH_INTERVAL):
+        """Initialize the index (it is built on first use).
+
+        Args:
+            snapshot: Taxonomy snapshot whose version signals new provider data
+            resolver: Resolver giving the category a keyword phrase searches as
+            refresh_interval: Shortest time between rebuilds, in seconds
+        """
+        self.snapshot = snapshot
+        self.resolver = resolver
+        self.refresh_interval = refresh_interval
+        self._index: Optional[_Index] = None
+        self._remembered: Dict[Tuple[str, str, int], List[Suggestion]] = {}
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.remembered_hits = 0
+        self.rebuilds = 0
+        self.last_build_ms = 0.0
+
+    def _build(self, taxonomy, source: Tuple) -> _Index:
+        started = time.perf_counter()
+        best: Dict[Tuple[str, str], Tuple[int, Suggestion]] = {}
+
+        def add(text: str, kind: str, value: str) -> None:
+            key = fold(text)
+            if not key:
+                return
+            rank = KIND_RANK[kind]
+            shown_kind = 'category' if kind == 'phrase' else kind
+            if (key, shown_kind) not in best or best[(key, shown_kind)][0] < rank:
+                best[(key, shown_kind)] = (rank, Suggestion(text, shown_kind, value))
+
+        for category in taxonomy.categories:
+            add(category, 'category', category)
+        for location in taxonomy.locations:
+            add(location, 'location', location)
+        for location in read_locations():
+            add(location, 'location', self.resolver.resolve_location(location))
+        for name, phrases in read_keyword_phrases().items():
+            add(name, 'phrase', self.resolver.resolve_category(name))
+            for phrase in phrases:
+                text = ' '.join(word for word in phrase.split() if word.casefold() not in PHRASE_NOISE)
+                add(text, 'phrase', self.resolver.resolve_category(phrase))
+        postings = []
+        for (key, _), (rank, suggestion) in best.items():
+            words = key.split(' ')
+            for start in range(len(words)):
+                # Within a kind, whole-name matches (start 0) outrank matches on a later word
+                postings.append((' '.join(words[start:]), (rank, int(start == 0)), suggestion))
+        postings.sort(key=lambda posting: posting[0])
+
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Built suggestion index: {len(best)} entries, {len(postings)} keys "
+                    f"in {self.last_build_ms:.1f} ms")
+        return _Index(source, time.monotonic(), [posting[0] for posting in postings],
+                      [(posting[1], posting[2]) for posting in postings])
+
+    def _current(self) -> _Index:
+        taxonomy = self.snapshot.get()
+        source = (taxonomy.version, taxonomy.categories, taxonomy.locations)
+        index = self._index
+        if index is not None and (index.source == source or
+                                  time.monotonic() - index.built_at < self.refresh_interval):
+            return index
+        # One thread rebuilds; the others keep answering from the previous index
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self._index is None or self._index is index:
+                self._index = self._build(taxonomy, source)
+                self._remembered = {}
+                self.rebuilds += 1
+            return self._index
+        finally:
+            self._lock.release()
+
+    def suggest(self, prefix: str, kind: Optional[str] = None, limit: int = SUGGEST_LIMIT) -> List[Suggestion]:
+        """Complete a typed prefix.
+
+        Args:
+            prefix: What has been typed so far
+            kind: Only suggest this kind (category or location)
+            limit: Maximum number of suggestions
+
+        Returns:
+            Suggestions, best first, with duplicate texts removed
+        """
+        self.lookups += 1
+        key = fold(prefix)
+        if not key:
+            return []
+        index = self._current()
+        remembered = self._remembered.get((key, kind or '', limit))
+        if remembered is not None:
+            self.remembered_hits += 1
+            return remembered
+
+        matches = _scan(index, key, kind)
+        results: List[Suggestion] = []
+        seen = set()
+        for _, _, suggestion in heapq.nlargest(limit * 3, matches, key=lambda match: (match[0], -match[1])):
+            if (suggestion.text, suggestion.kind) not in seen:
+                seen.add((suggestion.text, suggestion.kind))
+                results.append(suggestion)
+                if len(results) == limit:
+                    break
+
+        if len(self._remembered) >= MAX_REMEMBERED:
+            self._remembered = {}
+        self._remembered[(key, kind or '', limit)] = results
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and lookup counters."""
+        index = self._index
+        return {
+            "keys": len(index.keys) if index else 0,
+            "lookups": self.lookups,
+            "remembered_hits": self.remembered_hits,
+            "rebuilds": self.rebuilds,
+            "last_build_ms": round(self.last_build_ms, 2)
+        }
+
+
+# Shared index over the service providers taxonomy
+suggestions = SuggestIndex()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] not in KINDS):
+        print("Usage:")
+        print("  Print suggestions:            python suggest.py <prefix> [category|location]")
+        sys.exit(1)
+
+    for suggestion in suggestions.suggest(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None):
+        print(f"{suggestion.kind:<9} {suggestion.text}" +
+              (f" -> {suggestion.value}" if suggestion.value != suggestion.text else ''))
@@ -0,0 +1,209 @@
+"""
+In-memory taxonomy snapshot for Tradepro Finder Toronto.
+
+The home page, the services page and the category/location APIs all need the
+distinct categories and locations from service_providers. Those sets only
+change when providers are written, so instead of running SELECT DISTINCT on
+every request this module keeps a snapshot in memory:
+
+1. A trigger-maintained counter in data_versions records every write to
+   service_providers, including writes from other workers and import scripts
+2. Readers get the current snapshot from memory; the counter is probed at most
+   once per check interval
+3. The snapshot (sorted tuples plus pre-encoded JSON) is rebuilt only when the
+   counter has moved, or when a writer in this process calls invalidate()
+4. Per (category, location) versions are kept alongside, so caches keyed on a
+   pair can tell when that pair's providers changed
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+import db_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROVIDERS_TABLE = 'service_providers'
+
+
+class Taxonomy(NamedTuple):
+    """Immutable view of the provider categories and locations."""
+    version: Optional[int]
+    categories: Tuple[str, ...]
+    locations: Tuple[str, ...]
+    categories_json: bytes
+    locations_json: bytes
+    pair_versions: Mapping[Tuple[str, str], int] = MappingProxyType({})
+
+
+def normalize_term(text: Optional[str]) -> str:
+    """Fold case, hyphens and whitespace so equivalent names compare equal."""
+    return re.sub(r'[\s\-_]+', ' ', (text or '')).strip().casefold()
+
+
+def normalize_pair(category: Optional[str], location: Optional[str]) -> Tuple[str, str]:
+    """Normalize a (category, location) pair for use as a cache key."""
+    return normalize_term(category), normalize_term(location)
+
+
+def install_version_tracking(conn) -> None:
+    """Create the data_versions counter and the triggers that bump it.
+
+    Args:
+        conn: Open connection to the service providers database
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)', (PROVIDERS_TABLE,))
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{PROVIDERS_TABLE}_version_{event.lower()}
+            AFTER {event} ON {PROVIDERS_TABLE}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = '{PROVIDERS_TABLE}';
+            END
+        ''')
+
+    # Per-pair counters, bumped for every pair a write touches
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS provider_pair_versions (
+            category TEXT NOT NULL,
+            location TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (category, location)
+        )
+    ''')
+    bump = '''
+        INSERT INTO provider_pair_versions (category, location, version)
+        VALUES (COALESCE({row}.category, ''), COALESCE({row}.location, ''), 1)
+        ON CONFLICT (category, location) DO UPDATE SET version = version + 1;
+    '''
+    pair_triggers = {
+        'INSERT': bump.format(row='NEW'),
+        'UPDATE': bump.format(row='OLD') + bump.format(row='NEW'),
+        'DELETE': bump.format(row='OLD')
+    }
+    for event, body in pair_triggers.items():
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{PROVIDERS_TABLE}_pairs_{event.lower()}
+            AFTER {event} ON {PROVIDERS_TABLE}
+            BEGIN
+                {body}
+            END
+        ''')
+
+
+def _encode(values: Tuple[str, ...]) -> bytes:
+    """Encode a tuple of strings as a compact JSON array."""
+    return json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+
+
+class TaxonomySnapshot:
+    """Lazily rebuilt snapshot of categories and locations."""
+
+    def __init__(self, db_path: str = 'service_providers.db', check_interval: float = 2.0):
+        """Initialize the snapshot holder.
+
+        Args:
+            db_path: Path to the service providers database
+            check_interval: Seconds between probes of the data version counter
+        """
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._snapshot: Optional[Taxonomy] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def _read_version(self, conn) -> Optional[int]:
+        """Read the provider data version, or None if it is not tracked."""
+        try:
+            row = conn.execute('SELECT version FROM data_versions WHERE name = ?', (PROVIDERS_TABLE,)).fetchone()
+            return row[0] if row else None
+        except Exception:
+            return None
+
+    def _build(self, conn, version: Optional[int]) -> Taxonomy:
+        """Load the distinct categories and locations into a new snapshot."""
+        categories = tuple(row[0] for row in conn.execute(
+            f'SELECT DISTINCT category FROM {PROVIDERS_TABLE} WHERE category IS NOT NULL ORDER BY category'
+        ))
+        locations = tuple(row[0] for row in conn.execute(
+            f'SELECT DISTINCT location FROM {PROVIDERS_TABLE} WHERE location IS NOT NULL ORDER BY location'
+        ))
+        pair_versions: Dict[Tuple[str, str], int] = {}
+        try:
+            for category, location, pair_version in conn.execute(
+                'SELECT category, location, version FROM provider_pair_versions'
+            ):
+                key = normalize_pair(category, location)
+                pair_versions[key] = pair_versions.get(key, 0) + pair_version
+        except Exception:
+            # Pair tracking not installed yet; every pair reads as version 0
+            pass
+        return Taxonomy(
+            version=version,
+            categories=categories,
+            locations=locations,
+            categories_json=_encode(categories),
+            locations_json=_encode(locations),
+            pair_versions=MappingProxyType(pair_versions)
+        )
+
+    def get(self) -> Taxonomy:
+        """Return the current snapshot, rebuilding it if providers changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() < self._next_check:
+                return snapshot
+            try:
+                with db_pool.connection(self.db_path) as conn:
+                    version = self._read_version(conn)
+                    # An untracked version (None) always forces a rebuild
+                    if snapshot is None or version is None or version != snapshot.version:
+                        snapshot = self._build(conn, version)
+                        self._snapshot = snapshot
+                        self.rebuilds += 1
+                        logger.info(f"Rebuilt taxonomy snapshot: {len(snapshot.categories)} categories, "
+                                    f"{len(snapshot.locations)} locations (version {version})")
+            except Exception as e:
+                logger.error(f"Error refreshing taxonomy snapshot: {str(e)}")
+                if snapshot is None:
+                    snapshot = Taxonomy(None, (), (), b'[]', b'[]')
+            self._next_check = time.monotonic() + self.check_interval
+            return snapshot
+
+    def pair_version(self, category: str, location: str) -> int:
+        """Return the change counter for one (category, location) pair."""
+        return self.get().pair_versions.get(normalize_pair(category, location), 0)
+
+    def invalidate(self) -> None:
+        """Force the next get() to probe the data version."""
+        self._next_check = 0.0
+
+    def stats(self) -> dict:
+        """Return snapshot size and rebuild counters."""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "categories": len(snapshot.categories) if snapshot else 0,
+            "locations": len(snapshot.locations) if snapshot else 0,
+            "rebuilds": self.rebuilds
+        }
+
+
+# Shared snapshot for the service providers database
+snapshot = TaxonomySnapshot()
@@ -0,0 +1,87 @@
+"""
+Test the Google Places call budget for Tradepro Finder Toronto.
+"""
+
+from api_budget import BACKGROUND, USER, BudgetScheduler
+from api_monitor import APIMonitor
+
+class CountingMonitor:
+    """Stand-in for APIMonitor that keeps the month's counter in memory."""
+
+    def __init__(self, used=0):
+        self.used = used
+
+    def get_monthly_usage(self, api_name=None):
+        return {"total_requests": self.used}
+
+    def reserve(self, api_name):
+        self.used += 1
+
+    def release(self, api_name):
+        self.used -= 1
+
+    def log_request(self, api_name, endpoint, response_time, status_code, error=None, reserved=False):
+        if not reserved:
+            self.used += 1
+
+def spend(budget, priority):
+    """Take and record calls until the budget refuses one; return how many were granted."""
+    calls = 0
+    while budget.acquire(priority):
+        budget.record('textsearch', 100, 200)
+        calls += 1
+    return calls
+
+def test_background_stops_at_reserve_and_users_at_cache_only():
+    """Test that background calls leave the reserve to searches, which stop near the end."""
+    monitor = CountingMonitor(used=70)
+    budget = BudgetScheduler(monitor, monthly_budget=100, background_reserve=0.2,
+                             cache_only_reserve=0.05, background_burst=50)
+    assert spend(budget, BACKGROUND) == 10
+    assert budget.stats()['mode'] == 'user-only'
+    assert budget.available(USER)
+    assert spend(budget, USER) == 15
+    assert budget.stats()['mode'] == 'cache-only'
+    assert monitor.used == 95
+
+def test_background_calls_are_paced_by_the_token_bucket():
+    """Test that background calls beyond the burst wait for the bucket to refill."""
+    budget = BudgetScheduler(CountingMonitor(), monthly_budget=10000, background_burst=3)
+    assert spend(budget, BACKGROUND) == 3
+    assert budget.available(USER)
+    assert budget.refused[BACKGROUND] == 1
+
+def test_unlimited_budget_never_refuses():
+    """Test that a budget of 0 only counts calls."""
+    budget = BudgetScheduler(CountingMonitor(used=10 ** 6), monthly_budget=0)
+    assert budget.acquire(BACKGROUND) and budget.acquire(USER)
+    assert budget.stats()['remaining'] is None
+
+def test_monitor_reads_usage_from_monthly_counter(tmp_path, monkeypatch):
+    """Test that logged requests are counted per month and API without scanning the log."""
+    monkeypatch.chdir(tmp_path)
+    monitor = APIMonitor(monthly_limit=10, db_path=str(tmp_path / 'api_usage.db'))
+    for _ in range(3):
+        monitor.log_request('google_places', 'textsearch', 120, 200)
+    monitor.log_request('other_api', 'lookup', 80, 200)
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 3
+    assert monitor.get_monthly_usage()['total_requests'] == 4
+    assert monitor.get_monthly_usage()['remaining_quota'] == 6
+
+def test_logged_but_unwritten_calls_are_counted_once(tmp_path, monkeypatch):
+    """Test that a granted call counts once whether it is in flight, queued for the log or written."""
+    monkeypatch.chdir(tmp_path)
+    monitor = APIMonitor(monthly_limit=100, db_path=str(tmp_path / 'api_usage.db'), flush_interval_ms=60000)
+    budget = BudgetScheduler(monitor, monthly_budget=100, sync_interval=0)
+
+    for _ in range(10):
+        assert budget.acquire(USER)
+        budget.record('textsearch', 100, 200)
+    assert budget.acquire(USER)  # in flight
+    assert budget.stats()['used'] == 11
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 11
+
+    budget.refund()
+    monitor.writer.flush()
+    assert budget.stats()['used'] == 10
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 10
@@ -0,0 +1,63 @@
+"""
+Test API usage rollups for Tradepro Finder Toronto.
+"""
+
+from datetime import timedelta
+import db_pool
+from api_budget import utc_now
+from api_monitor import APIMonitor, latency_percentiles, latency_bucket
+
+def make_monitor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return APIMonitor(monthly_limit=100, db_path=str(tmp_path / 'api_usage.db'), flush_interval_ms=60000)
+
+def test_requests_are_rolled_up_per_day_and_endpoint(tmp_path, monkeypatch):
+    """Test that queued requests land in the log and the rollups."""
+    monitor = make_monitor(tmp_path, monkeypatch)
+    for elapsed in range(1, 101):
+        monitor.log_request('google_places', 'textsearch', elapsed * 10, 200)
+    monitor.log_request('google_places', 'details', 40, 500, 'Server error')
+    assert monitor.stats()['queued'] == 101  # the writer may already have taken a full batch
+
+    today = utc_now().strftime('%Y-%m-%d')
+    analytics = monitor.get_usage_analytics(days=1)
+    assert analytics[today] == {"api_requests": 101, "errors": 1, "avg_response_time": round(50540 / 101, 3)}
+    assert sum(minute["api_requests"] for minute in monitor.get_recent_usage(5).values()) == 101
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 101
+
+    textsearch, details = monitor.get_latency_percentiles(days=1)
+    assert (textsearch['endpoint'], textsearch['requests'], textsearch['max_response_time']) == ('textsearch', 100, 1000)
+    assert 450 <= textsearch['p50'] <= 550
+    assert 900 <= textsearch['p95'] <= 1000 and textsearch['p95'] <= textsearch['p99'] <= 1000
+    assert details['errors'] == 1 and 25 < details['p50'] <= 40
+
+def test_percentiles_interpolate_within_buckets():
+    """Test percentile estimates from a histogram, capped at the slowest call."""
+    histogram = {latency_bucket(60): 50, latency_bucket(120): 50}
+    estimates = latency_percentiles(histogram, max_ms=140)
+    assert estimates['p50'] == 75
+    assert 100 < estimates['p95'] <= 140 and estimates['p99'] <= 140
+    assert latency_percentiles({}, 0) == {'p50': None, 'p95': None, 'p99': None}
+
+def test_prune_keeps_rollups_of_deleted_rows(tmp_path, monkeypatch):
+    """Test that retention deletes old raw rows and minutes but keeps daily rollups."""
+    monitor = make_monitor(tmp_path, monkeypatch)
+    old = (utc_now() - timedelta(days=90)).isoformat()
+    monitor.writer.put('old', ('google_places', 'textsearch', old, 200, 200, None))
+    monitor.log_request('google_places', 'textsearch', 100, 200)
+    monitor.prune()
+    with db_pool.connection(monitor.api_db.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM api_usage').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM api_usage_minute').fetchone()[0] == 1
+        assert conn.execute('SELECT SUM(requests) FROM api_usage_daily').fetchone()[0] == 2
+
+def test_monthly_usage_counts_queued_requests_without_writing_them(tmp_path, monkeypatch):
+    """Test that the budget's read counts queued calls but leaves writing to the writer."""
+    monitor = make_monitor(tmp_path, monkeypatch)
+    monitor.log_request('google_places', 'textsearch', 100, 200)
+    monitor.log_request('google_places', 'details', 50, 200)
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 2
+    assert monitor.stats()['pending'] == 2
+    monitor.writer.drain()
+    assert monitor.get_monthly_usage('google_places')['total_requests'] == 2
+    assert monitor.get_monthly_usage()['total_requests'] == 2
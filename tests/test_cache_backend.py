@@ -0,0 +1,50 @@
+"""
+Test the shared Redis cache backend for Tradepro Finder Toronto.
+"""
+
+import pytest
+from cache_backend import RedisBackend, shared_cache
+from google_places_api import GooglePlacesAPI
+
+redis = pytest.importorskip('redis')
+fakeredis = pytest.importorskip('fakeredis')
+
+@pytest.fixture
+def backend(monkeypatch):
+    """A Redis backend on an in-memory server, installed as the shared cache."""
+    redis_backend = RedisBackend(fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    monkeypatch.setattr(shared_cache, 'backend', redis_backend)
+    return redis_backend
+
+def test_get_many_returns_only_stored_keys(backend):
+    """Test that a multi-get decodes hits and skips misses."""
+    backend.set_many('places', {'a': [{'name': 'A'}], 'b': {'n': 2}}, ttl=60)
+    assert backend.get_many('places', ['a', 'b', 'c']) == {'a': [{'name': 'A'}], 'b': {'n': 2}}
+    assert backend.stats()['hits'] == 2
+    assert backend.stats()['misses'] == 1
+
+def test_values_expire_on_the_server(backend):
+    """Test that writes carry a server-side TTL and stored bytes are compressed."""
+    backend.set('details', 'place', {'phone': '416-555-0100'}, ttl=30)
+    assert 0 < backend.client.pttl('tradepro:details:place') <= 30000
+    assert backend.client.get('tradepro:details:place')[0] == 2  # json+zlib format byte
+
+def test_errors_fall_back_to_misses(backend, monkeypatch):
+    """Test that a Redis outage is reported as misses and then skipped."""
+    def unavailable(*args, **kwargs):
+        raise redis.ConnectionError('down')
+    monkeypatch.setattr(backend.client, 'mget', unavailable)
+    assert backend.get_many('places', ['a']) == {}
+    assert not backend.available
+    assert backend.stats()['errors'] == 1
+
+def test_instances_share_google_pages(backend, tmp_path):
+    """Test that a page cached by one instance is served to another with its own SQLite file."""
+    first = GooglePlacesAPI(api_key='test', db_path=str(tmp_path / 'first.db'))
+    second = GooglePlacesAPI(api_key='test', db_path=str(tmp_path / 'second.db'))
+    results = [{'name': 'Toronto Plumbing Experts', 'place_id': 'p1'}]
+    first._store_in_cache('', 'Plumbing', 'Toronto', results, next_page_token='token')
+    cached = second._get_from_cache('', 'plumbing', ' toronto ')
+    assert cached is not None
+    assert cached[0] == results
+    assert cached[2] == 'token'
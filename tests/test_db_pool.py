@@ -0,0 +1,43 @@
+"""
+Test SQLite connection pooling for Tradepro Finder Toronto.
+"""
+
+import threading
+from db_pool import ConnectionPool
+
+def test_connections_are_reused(tmp_path):
+    """Test that sequential checkouts reuse one connection."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2)
+    for _ in range(5):
+        with pool.connection() as conn:
+            conn.execute('SELECT 1')
+    stats = pool.stats()
+    assert stats['open_connections'] == 1
+    assert stats['checkouts'] == 5
+    assert stats['reuses'] == 4
+
+def test_block_commits_on_success(tmp_path):
+    """Test that a with block commits its writes."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE items (name TEXT)')
+        conn.execute("INSERT INTO items VALUES ('a')")
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 1
+
+def test_pool_size_is_bounded(tmp_path):
+    """Test that concurrent checkouts never exceed the pool size."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=3)
+
+    def worker():
+        for _ in range(50):
+            with pool.connection() as conn:
+                conn.execute('SELECT 1')
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()['open_connections'] <= 3
+    assert pool.stats()['checkouts'] == 500
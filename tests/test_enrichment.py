@@ -0,0 +1,95 @@
+"""
+Test place details enrichment for Tradepro Finder Toronto.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+import db_pool
+from schema import migrate
+from enrichment import PlaceEnricher
+
+DETAILS = {'p1': {'phone': '416-555-0101', 'website': 'https://plumbing.example'},
+           'p2': {'phone': '', 'website': ''}}
+
+class FakeDetails:
+    """Stands in for GooglePlacesAPI details lookups, optionally held until released."""
+    returns_contact_info = False
+
+    def __init__(self, hold=False):
+        self.calls = []
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def get_place_details(self, place_id):
+        self.calls.append(place_id)
+        self.release.wait(5)
+        return dict(DETAILS[place_id]) if place_id in DETAILS else {}
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'providers.db')
+    with db_pool.connection(path) as conn:
+        migrate(conn)
+    return path
+
+def places(*place_ids):
+    return [{'name': f'Provider {place_id}', 'place_id': place_id} for place_id in place_ids]
+
+def age_details(db_path, place_id, days):
+    conn = sqlite3.connect(db_path)
+    fetched_at = (datetime.now() - timedelta(days=days)).isoformat()
+    conn.execute('UPDATE place_details_cache SET fetched_at = ? WHERE place_id = ?', (fetched_at, place_id))
+    conn.commit()
+    conn.close()
+
+def test_inline_budget_returns_in_time_and_late_details_land_in_background(db_path):
+    """Test that enrich() waits at most its budget, and the lookup still completes and is cached."""
+    google = FakeDetails(hold=True)
+    enricher = PlaceEnricher(google, db_path=db_path, mode='inline', budget=0.1)
+
+    started = time.monotonic()
+    results = enricher.enrich(places('p1'))
+    assert time.monotonic() - started < 1
+    assert 'phone' not in results[0]
+    assert enricher.stats()['deferred'] == 1
+
+    with enricher._lock:
+        pending = enricher._pending['p1']
+    google.release.set()
+    pending.result(timeout=5)
+    assert enricher.stats()['fetched'] == 1
+
+    results = enricher.enrich(places('p1'))
+    assert results[0]['phone'] == '416-555-0101'
+    assert google.calls == ['p1']
+    assert enricher.stats()['cache_hits'] == 1
+
+def test_cached_details_expire_after_their_ttl(db_path):
+    """Test that details are reused within the TTL, answers without contact info for a shorter one."""
+    google = FakeDetails()
+    enricher = PlaceEnricher(google, db_path=db_path, mode='inline', budget=5,
+                             details_ttl_days=365, empty_details_ttl_days=30)
+    enricher.enrich(places('p1', 'p2'))
+    assert sorted(google.calls) == ['p1', 'p2']
+
+    age_details(db_path, 'p1', 60)
+    age_details(db_path, 'p2', 60)
+    enricher.enrich(places('p1', 'p2'))
+    assert sorted(google.calls) == ['p1', 'p2', 'p2']
+
+    age_details(db_path, 'p1', 400)
+    enricher.enrich(places('p1'))
+    assert google.calls.count('p1') == 2
+
+def test_failed_lookups_are_not_cached(db_path):
+    """Test that an empty answer from a failed lookup is retried on the next request."""
+    google = FakeDetails()
+    enricher = PlaceEnricher(google, db_path=db_path, mode='inline', budget=5)
+    enricher.enrich(places('gone'))
+    enricher.enrich(places('gone'))
+    assert google.calls == ['gone', 'gone']
+    assert enricher.stats()['fetch_failures'] == 2
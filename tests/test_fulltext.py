@@ -0,0 +1,42 @@
+"""
+Test full-text provider search for Tradepro Finder Toronto.
+"""
+
+import db_pool
+from schema import migrate
+from fulltext import search_providers
+
+def add_provider(conn, name, address, reviews=10, category='Plumbing', location='Toronto'):
+    conn.execute(
+        'INSERT INTO service_providers (name, category, location, address, reviews, dedupe_key) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (name, category, location, address, reviews, name)
+    )
+
+def test_prefix_words_are_all_required_and_name_ranks_first(tmp_path):
+    """Test that every query word must match as a prefix and name matches outrank address matches."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        add_provider(conn, 'Emergency Plumbing Co', '10 Queen St W')
+        add_provider(conn, 'Yonge Emergency Plumbers', '5 Bloor St E')
+        add_provider(conn, 'Drain Pros', '2200 Yonge St')
+        add_provider(conn, 'Yonge Electric', '2300 Yonge St', category='Electrical')
+        names = [row['name'] for row in search_providers(conn, 'emergency plumber yonge')]
+        assert names == ['Yonge Emergency Plumbers']
+        names = [row['name'] for row in search_providers(conn, 'yonge', category='Plumbing', location='Toronto')]
+        assert names == ['Yonge Emergency Plumbers', 'Drain Pros']
+        assert search_providers(conn, 'near me') is None
+
+def test_index_follows_provider_writes(tmp_path):
+    """Test that the triggers keep the index in step with updates and deletes."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        add_provider(conn, 'Old Name Plumbing', '1 King St')
+    with db_pool.connection(db_path) as conn:
+        conn.execute("UPDATE service_providers SET name = 'Harbourfront Plumbing'")
+        assert search_providers(conn, 'old name') == []
+        assert [row['name'] for row in search_providers(conn, 'harbour')] == ['Harbourfront Plumbing']
+        conn.execute('DELETE FROM service_providers')
+        assert search_providers(conn, 'harbour') == []
@@ -0,0 +1,39 @@
+"""
+Test geospatial provider search for Tradepro Finder Toronto.
+"""
+
+import db_pool
+from schema import migrate
+from geo import providers_within
+from locations import location_point
+
+def add_provider(conn, name, latitude, longitude, category='Plumbing'):
+    conn.execute(
+        'INSERT INTO service_providers (name, category, location, latitude, longitude, dedupe_key) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (name, category, 'Toronto', latitude, longitude, name)
+    )
+
+def test_radius_search_orders_by_distance(tmp_path):
+    """Test that only providers within the radius are returned, nearest first."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        add_provider(conn, 'Vaughan Plumbing', 43.8361, -79.4983)     # Vaughan centre
+        add_provider(conn, 'Thornhill Plumbing', 43.8150, -79.4244)   # about 6.4 km away
+        add_provider(conn, 'Ajax Plumbing', 43.8509, -79.0204)        # about 38 km away
+        add_provider(conn, 'Vaughan Electric', 43.8361, -79.4983, category='Electrical')
+        add_provider(conn, 'Unplaced Plumbing', None, None)
+    with db_pool.connection(db_path) as conn:
+        nearby = providers_within(conn, 43.8361, -79.4983, 10, category='Plumbing')
+        assert [p['name'] for p in nearby] == ['Vaughan Plumbing', 'Thornhill Plumbing']
+        assert 6 < nearby[1]['distance_km'] < 7
+        conn.execute("UPDATE service_providers SET latitude = 43.84, longitude = -79.02 WHERE name = 'Thornhill Plumbing'")
+        assert [p['name'] for p in providers_within(conn, 43.8361, -79.4983, 10)] == ['Vaughan Plumbing', 'Vaughan Electric']
+
+def test_locations_are_placed_from_the_cities_csv():
+    """Test that neighbourhoods, municipalities and boroughs have coordinates."""
+    assert location_point('the-annex') == (43.6703, -79.4070)
+    assert location_point('Vaughan') == (43.8361, -79.4983)
+    assert location_point('Downtown Toronto') == location_point('Toronto')
+    assert location_point('Atlantis') is None
@@ -0,0 +1,286 @@
+"""
+Test Google Places pagination and caching for Tradepro Finder Toronto.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+import google_places_api
+from google_places_api import GooglePlacesAPI
+from api_budget import BudgetScheduler
+from http_client import HTTPClient
+from places_replay import GOOGLE_PREFIXES, ReplayTransport
+
+TOKEN_DELAY = 0.2
+
+def recorded_page(number):
+    return [{'name': f'Plumber {number}-{i}', 'address': f'{i} Page {number} St, Toronto',
+             'rating': 4.5, 'reviews': 10, 'place_id': f'p{number}-{i}'} for i in range(2)]
+
+class FakeTextSearch:
+    """Stands in for the Text Search call: three pages chained by tokens that take TOKEN_DELAY to activate."""
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+        self._issued = {}
+
+    def __call__(self, query, category, location, page_token=None, *args, **kwargs):
+        self.calls.append(page_token)
+        if page_token is None:
+            page = 1
+        elif time.monotonic() - self._issued.get(page_token, 0) < TOKEN_DELAY:
+            return [], None  # INVALID_REQUEST: the token is not active yet
+        else:
+            page = int(page_token.rsplit('-', 1)[1])
+        next_page_token = None
+        if page < len(self.pages):
+            next_page_token = f'token-{len(self.calls)}-{page + 1}'
+            self._issued[next_page_token] = time.monotonic()
+        return [dict(place) for place in self.pages[page - 1]], next_page_token
+
+@pytest.fixture
+def google():
+    return FakeTextSearch([recorded_page(1), recorded_page(2), recorded_page(3)])
+
+@pytest.fixture
+def api(tmp_path, google, monkeypatch):
+    """A Places client on a scratch cache, answered by the fake search, with no prefetching."""
+    monkeypatch.setattr(google_places_api, 'PAGE_TOKEN_DELAY', TOKEN_DELAY)
+    monkeypatch.setattr(google_places_api, 'PREFETCH_NEXT_PAGE', False)
+    places = GooglePlacesAPI(api_key='test', db_path=str(tmp_path / 'providers.db'))
+    places._call_places_api = google
+    return places
+
+def names(results):
+    return [result['name'] for result in results]
+
+def drop_cached_page(api, page):
+    conn = sqlite3.connect(api.db_path)
+    conn.execute('DELETE FROM google_places_cache WHERE page = ?', (page,))
+    conn.commit()
+    conn.close()
+
+def age_cached_page(api, page, seconds):
+    """Backdate a cached page (and so its next_page_token) by the given number of seconds."""
+    conn = sqlite3.connect(api.db_path)
+    timestamp = (datetime.now() - timedelta(seconds=seconds)).isoformat()
+    conn.execute('UPDATE google_places_cache SET timestamp = ? WHERE page = ?', (timestamp, page))
+    conn.commit()
+    conn.close()
+
+def test_pages_follow_next_page_token_after_activation_delay(api, google):
+    """Test that page 2 uses page 1's cached token once it is active, and the last page ends paging."""
+    results, from_cache = api.search('', 'Plumbing', 'Toronto', page=1)
+    assert names(results) == names(recorded_page(1)) and not from_cache
+    assert api.has_next_page('', 'Plumbing', 'Toronto', page=1)
+
+    started = time.monotonic()
+    results, _ = api.search('', 'Plumbing', 'Toronto', page=2)
+    assert time.monotonic() - started >= TOKEN_DELAY * 0.9
+    assert names(results) == names(recorded_page(2))
+
+    results, _ = api.search('', 'Plumbing', 'Toronto', page=3)
+    assert names(results) == names(recorded_page(3))
+    assert not api.has_next_page('', 'Plumbing', 'Toronto', page=3)
+    assert len(google.calls) == 3
+    assert api._fetch_page('', 'Plumbing', 'Toronto', 4) == ([], None)
+    assert len(google.calls) == 3
+
+def test_old_or_missing_token_refetches_previous_page(api, google):
+    """Test that a token past PAGE_TOKEN_MAX_AGE, or no cached previous page, refetches that page first."""
+    api.search('', 'Plumbing', 'Toronto', page=1)
+    age_cached_page(api, 1, google_places_api.PAGE_TOKEN_MAX_AGE + 60)
+    results, _ = api.search('', 'Plumbing', 'Toronto', page=2)
+    assert names(results) == names(recorded_page(2))
+    assert len(google.calls) == 3
+    assert google.calls[1] is None  # page 1 again for a fresh token, then page 2
+
+    drop_cached_page(api, 1)
+    results, next_page_token = api._fetch_page('', 'Plumbing', 'Toronto', 2)
+    assert names(results) == names(recorded_page(2))
+    assert next_page_token
+    assert len(google.calls) == 5
+
+def test_cache_key_folds_case_and_whitespace():
+    """Test that case and spacing variants of a search share a key, while pages and queries do not."""
+    key = google_places_api.cache_key('', 'Plumbing', 'North York')
+    assert google_places_api.cache_key('', ' plumbing', 'NORTH  YORK ') == key
+    assert google_places_api.cache_key('', 'Plumbing', 'north-york') == key
+    assert google_places_api.cache_key('', 'Plumbing', 'North York', page=2) != key
+    assert google_places_api.cache_key('emergency', 'Plumbing', 'North York') != key
+
+def test_store_upserts_one_row_per_search(tmp_path):
+    """Test that storing a page again, under any spelling, replaces its row."""
+    api = GooglePlacesAPI(api_key='test', db_path=str(tmp_path / 'providers.db'))
+    api._store_in_cache('', 'Plumbing', 'Toronto', recorded_page(1), next_page_token='first')
+    api._store_in_cache('', 'plumbing ', 'TORONTO', recorded_page(2), next_page_token='second')
+    conn = sqlite3.connect(api.db_path)
+    assert conn.execute('SELECT COUNT(*), next_page_token FROM google_places_cache').fetchone() == (1, 'second')
+    conn.close()
+    assert names(api._get_from_cache('', 'Plumbing', 'Toronto')[0]) == names(recorded_page(2))
+
+def test_older_cache_keeps_newest_row_per_key(tmp_path):
+    """Test that a cache from before cache_key keeps only the newest row of each search."""
+    db_path = str(tmp_path / 'providers.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE google_places_cache (id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT NOT NULL, '
+                 'category TEXT NOT NULL, location TEXT NOT NULL, response TEXT NOT NULL, timestamp TEXT NOT NULL)')
+    conn.executemany('INSERT INTO google_places_cache (query, category, location, response, timestamp) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [('', 'Plumbing', 'Toronto', '[{"name": "Old"}]', '2025-01-01T00:00:00'),
+                      ('', 'PLUMBING', ' toronto', '[{"name": "New"}]', '2025-02-01T00:00:00'),
+                      ('', 'Roofing', 'Toronto', '[{"name": "Roof"}]', '2025-01-01T00:00:00')])
+    conn.commit()
+    conn.close()
+
+    api = GooglePlacesAPI(api_key='test', db_path=db_path)
+    assert names(api._get_from_cache('', 'plumbing', 'Toronto', max_age=None)[0]) == ['New']
+    assert names(api._get_from_cache('', 'Roofing', 'Toronto', max_age=None)[0]) == ['Roof']
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM google_places_cache').fetchone()[0] == 2
+    conn.close()
+
+def test_in_process_compaction_waits_an_interval_and_skips_vacuum(api):
+    """Test that a new instance does not compact right away, and compaction only deletes expired rows."""
+    assert api._next_compaction > time.monotonic() + google_places_api.COMPACT_INTERVAL_HOURS * 3600 - 60
+    api._store_in_cache('', 'Plumbing', 'Toronto', recorded_page(1))
+    api._store_in_cache('', 'Roofing', 'Toronto', recorded_page(2))
+    conn = sqlite3.connect(api.db_path)
+    conn.execute("UPDATE google_places_cache SET timestamp = '2000-01-01T00:00:00' WHERE category = 'Roofing'")
+    conn.commit()
+    conn.close()
+
+    result = api.compact()
+    assert result['deleted'] == 1
+    assert result['vacuumed'] is False
+    assert api._get_from_cache('', 'Plumbing', 'Toronto') is not None
+
+class UsedUpMonitor:
+    """Reports the month's budget as spent, so only cached answers may be served."""
+    def get_monthly_usage(self, api_name=None):
+        return {"total_requests": 100}
+
+def stale_api(api):
+    """Cache page 1 and age it past the one-day soft TTL, within the two-day hard TTL."""
+    api.stale_while_revalidate = True
+    api.category_ttls = {'plumbing': (1, 2)}
+    api._store_in_cache('', 'Plumbing', 'Toronto', recorded_page(9))
+    age_cached_page(api, 1, 86400 + 60)
+    return api
+
+def test_stale_hit_is_served_while_one_refresh_runs(api, google):
+    """Test that stale hits answer at once with stale=True and share a single background refresh."""
+    stale_api(api)
+    release = threading.Event()
+    def slow_google(*args, **kwargs):
+        release.wait(5)
+        return google(*args, **kwargs)
+    api._call_places_api = slow_google
+
+    for _ in range(3):
+        results, from_cache = api.search('', 'Plumbing', 'Toronto')
+        assert from_cache
+        assert names(results) == names(recorded_page(9))
+        assert all(result['stale'] for result in results)
+    stats = api.stats()
+    assert (stats['stale_served'], stats['refreshes_scheduled'], stats['refreshes_skipped']) == (3, 1, 2)
+
+    with api._refresh_lock:
+        pending = api._refreshing[('', 'Plumbing', 'Toronto', 1)]
+    release.set()
+    pending.result(timeout=5)
+    assert google.calls == [None]
+    assert api.stats()['refreshes_completed'] == 1
+    results, from_cache = api.search('', 'Plumbing', 'Toronto')
+    assert names(results) == names(recorded_page(1))
+    assert from_cache and not any('stale' in result for result in results)
+
+def test_spent_budget_falls_back_to_cache_of_any_age(api, google):
+    """Test that with the budget spent, stale and expired pages are served and Google is not called."""
+    stale_api(api)
+    api.budget = BudgetScheduler(UsedUpMonitor(), monthly_budget=100)
+
+    results, from_cache = api.search('', 'Plumbing', 'Toronto')
+    assert from_cache and all(result['stale'] for result in results)
+    assert api.stats()['refreshes_scheduled'] == 0
+
+    age_cached_page(api, 1, 3 * 86400)
+    results, from_cache = api.search('', 'Plumbing', 'Toronto')
+    assert names(results) == names(recorded_page(9))
+    assert from_cache and all(result['stale'] for result in results)
+    assert api.stats()['budget_fallbacks'] == 1
+
+    assert api.search('', 'Roofing', 'Toronto') == ([], False)
+    assert google.calls == []
+
+V1_RECORDING = {'searches': {'plumbing in toronto': {
+    'query': '', 'category': 'Plumbing', 'location': 'Toronto',
+    'pages': [[{'name': 'Toronto Plumbing Experts', 'address': '1 Main St, Toronto', 'rating': 4.8,
+                'reviews': 120, 'place_id': 'p1', 'latitude': 43.65, 'longitude': -79.38}],
+              [{'name': 'Drain Doctors', 'address': '5 Queen St, Toronto', 'place_id': 'p2'}]]
+}}, 'details': {'p1': {'phone': '416-555-0100', 'website': 'https://example.com'}}}
+
+class RecordingTransport(ReplayTransport):
+    """Replays Google and keeps every request it was sent."""
+    def __init__(self, recording):
+        super().__init__(recording, latency_ms=0, jitter_ms=0)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        return super().send(request, **kwargs)
+
+@pytest.fixture
+def v1(tmp_path):
+    """A Places (New) client on a scratch cache whose HTTP calls go to a recording replay."""
+    transport = RecordingTransport(V1_RECORDING)
+    http = HTTPClient(timeout=5, max_retries=0)
+    for prefix in GOOGLE_PREFIXES:
+        http.mount(prefix, transport)
+    places = GooglePlacesAPI(api_key='test', db_path=str(tmp_path / 'providers.db'), http=http, backend='v1',
+                             budget=BudgetScheduler(monthly_budget=0))
+    return places, transport
+
+def test_v1_search_sends_field_mask_and_biased_body(v1):
+    """Test that searchText is posted with the key, the field mask and a location-biased body."""
+    places, transport = v1
+    places._call_places_api('emergency', 'Plumbing', 'Etobicoke')
+    request = transport.sent[0]
+    assert request.method == 'POST' and request.url == google_places_api.V1_SEARCH_URL
+    assert request.headers['X-Goog-Api-Key'] == 'test'
+    assert request.headers['X-Goog-FieldMask'] == google_places_api.V1_SEARCH_FIELDS
+    assert json.loads(request.body) == {
+        'textQuery': 'emergency Plumbing in Etobicoke',
+        'locationBias': {'circle': {'center': {'latitude': 43.6205, 'longitude': -79.5132}, 'radius': 15000.0}},
+        'pageSize': 20,
+        'languageCode': 'en'
+    }
+
+    places._call_places_api('', 'Plumbing', 'The Annex', page_token='next')
+    body = json.loads(transport.sent[1].body)
+    assert body['pageToken'] == 'next'
+    assert body['locationBias']['circle'] == {'center': {'latitude': 43.6532, 'longitude': -79.3832},
+                                              'radius': 50000.0}
+
+def test_v1_results_map_to_result_cards(v1):
+    """Test that searchText places become our results, contact info and coordinates included, across pages."""
+    places, transport = v1
+    assert places.returns_contact_info
+    results, from_cache = places.search('', 'Plumbing', 'Toronto')
+    assert not from_cache
+    result = results[0]
+    assert {field: result[field] for field in ('name', 'address', 'phone', 'website', 'rating', 'reviews',
+                                               'place_id', 'latitude', 'longitude')} == {
+        'name': 'Toronto Plumbing Experts', 'address': '1 Main St, Toronto', 'phone': '416-555-0100',
+        'website': 'https://example.com', 'rating': 4.8, 'reviews': 120, 'place_id': 'p1',
+        'latitude': 43.65, 'longitude': -79.38
+    }
+
+    results, _ = places.search('', 'Plumbing', 'Toronto', page=2)
+    assert names(results) == ['Drain Doctors']
+    assert results[0]['phone'] == '' and 'latitude' not in results[0]
+    assert json.loads(transport.sent[-1].body)['pageToken']
+    assert not places.has_next_page('', 'Plumbing', 'Toronto', page=2)
@@ -0,0 +1,99 @@
+"""
+Test retries and the circuit breaker of the Places HTTP client for Tradepro Finder Toronto.
+"""
+
+import time
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, HTTPClient
+
+SEARCH_URL = 'https://maps.googleapis.com/maps/api/place/textsearch/json?query=plumbing+in+toronto'
+
+class ScriptedTransport(BaseAdapter):
+    """Answers each request with the next (status, headers) in the script, then 200s."""
+    def __init__(self, script=()):
+        super().__init__()
+        self.script = list(script)
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        response = requests.Response()
+        response.status_code = status
+        response._content = b'{"status": "OK", "results": []}'
+        response.headers = CaseInsensitiveDict(headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def make_client(transport, max_retries=2, failure_threshold=2, reset_timeout=0.1):
+    client = HTTPClient(timeout=5, max_retries=max_retries,
+                        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout))
+    client.session.mount('https://maps.googleapis.com/', transport)
+    return client
+
+def test_rate_limited_call_waits_for_retry_after():
+    """Test that a 429 is retried after the Retry-After delay and then succeeds."""
+    transport = ScriptedTransport([(429, {'Retry-After': '1'})])
+    client = make_client(transport)
+
+    started = time.monotonic()
+    assert client.get(SEARCH_URL).json()['status'] == 'OK'
+    assert time.monotonic() - started >= 1.0
+    assert transport.requests == 2
+    assert client.stats()['retries'] == 1
+    assert client.stats()['circuit_state'] == 'closed'
+
+def test_non_retryable_error_is_not_retried():
+    """Test that a 4xx other than 429 fails at once and does not count against the breaker."""
+    transport = ScriptedTransport([(400, {})])
+    client = make_client(transport, failure_threshold=1)
+    with pytest.raises(requests.HTTPError):
+        client.get(SEARCH_URL)
+    assert transport.requests == 1
+    assert client.breaker.state == 'closed'
+
+def test_circuit_opens_fails_fast_and_recovers(monkeypatch):
+    """Test closed -> open after repeated 503s, short-circuiting while open, and half-open -> closed."""
+    monkeypatch.setattr(http_client, 'BACKOFF_BASE', 0.001)
+    transport = ScriptedTransport([(503, {})] * 6)
+    client = make_client(transport)
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get(SEARCH_URL)
+    assert transport.requests == 6  # first attempt plus two retries, twice
+    assert client.breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        client.get(SEARCH_URL)
+    assert transport.requests == 6
+    assert client.stats()['short_circuited'] == 1
+
+    time.sleep(0.15)
+    assert client.breaker.state == 'half-open'
+    assert client.get(SEARCH_URL).status_code == 200
+    assert client.breaker.state == 'closed'
+    assert client.stats()['circuit_opened'] == 1
+
+def test_failed_trial_call_reopens_circuit():
+    """Test that only one half-open trial goes out and a failed trial opens the circuit again."""
+    transport = ScriptedTransport([(503, {})])
+    client = make_client(transport, max_retries=0, failure_threshold=1)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(SEARCH_URL)
+    time.sleep(0.15)
+    assert client.breaker.allow()
+    assert not client.breaker.allow()  # a trial is already in flight
+    client.breaker.record_failure()
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client.get(SEARCH_URL)
@@ -0,0 +1,73 @@
+"""
+Test the tiered local cache for Tradepro Finder Toronto.
+"""
+
+import sqlite3
+import time
+from datetime import timedelta
+import pytest
+import serialization
+from local_cache import LocalCache, utc_now
+
+@pytest.fixture
+def cache(tmp_path):
+    """A cache on a scratch database that probes for other workers' changes on every read."""
+    return LocalCache(db_path=str(tmp_path / 'local_cache.db'), check_interval=0)
+
+def store(cache, key, results, ttl_seconds=60):
+    """Store results under key with an expiry ttl_seconds from now."""
+    now = utc_now()
+    return cache.replace_one({'cache_key': key}, {
+        'cache_key': key,
+        'results': results,
+        'timestamp': now,
+        'expiry': now + timedelta(seconds=ttl_seconds)
+    })
+
+def test_replace_one_writes_through_to_memory_and_disk(cache):
+    """Test that a stored value is served from memory here and from SQLite to a new worker."""
+    assert store(cache, 'plumbing|toronto', [{'name': 'Toronto Plumbing Experts'}])
+    assert cache.find_one({'cache_key': 'plumbing|toronto'})['results'] == [{'name': 'Toronto Plumbing Experts'}]
+    assert cache.stats()['memory_hits'] == 1
+
+    other_worker = LocalCache(db_path=cache.db_path, check_interval=0)
+    assert other_worker.find_one({'cache_key': 'plumbing|toronto'})['results'] == [{'name': 'Toronto Plumbing Experts'}]
+    assert other_worker.stats()['disk_hits'] == 1
+
+def test_delete_one_removes_every_tier(cache):
+    """Test that a deleted key misses in memory and on disk."""
+    store(cache, 'plumbing|toronto', [{'name': 'A'}])
+    assert cache.delete_one({'cache_key': 'plumbing|toronto'})
+    assert cache.find_one({'cache_key': 'plumbing|toronto'}) is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['misses'] == 1
+
+def test_stored_expiry_is_honoured(cache):
+    """Test that an entry stops being served once its own expiry passes, in memory and on disk."""
+    store(cache, 'short', [{'name': 'A'}], ttl_seconds=0.2)
+    store(cache, 'long', [{'name': 'B'}], ttl_seconds=60)
+    assert cache.find_one({'cache_key': 'short'}) is not None
+    time.sleep(0.3)
+    assert cache.find_one({'cache_key': 'short'}) is None
+    assert cache.find_one({'cache_key': 'long'}) is not None
+
+    other_worker = LocalCache(db_path=cache.db_path, check_interval=0)
+    assert other_worker.find_one({'cache_key': 'short'}) is None
+
+def test_change_from_another_connection_evicts_memory_entry(cache):
+    """Test that a row replaced outside this process bumps its version and drops the memory copy."""
+    store(cache, 'plumbing|toronto', [{'name': 'Old'}])
+    store(cache, 'roofing|toronto', [{'name': 'Untouched'}])
+
+    conn = sqlite3.connect(cache.db_path)
+    conn.execute('UPDATE cached_results SET results = ? WHERE cache_key = ?',
+                 (serialization.dumps([{'name': 'New'}]), 'plumbing|toronto'))
+    conn.commit()
+    conn.close()
+
+    assert cache.find_one({'cache_key': 'plumbing|toronto'})['results'] == [{'name': 'New'}]
+    assert cache.find_one({'cache_key': 'roofing|toronto'})['results'] == [{'name': 'Untouched'}]
+    stats = cache.stats()
+    assert stats['invalidations'] == 1
+    assert stats['disk_hits'] == 1
+    assert stats['memory_hits'] == 1
@@ -0,0 +1,81 @@
+"""
+Test the rendered service page cache for Tradepro Finder Toronto.
+"""
+
+import gzip
+from page_cache import PageCache
+from taxonomy import normalize_pair
+
+class PairVersions:
+    """Stands in for the taxonomy snapshot's per-pair versions."""
+    def __init__(self):
+        self.versions = {}
+
+    def pair_version(self, category, location):
+        return self.versions.get(normalize_pair(category, location), 0)
+
+    def bump(self, category, location):
+        key = normalize_pair(category, location)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+def page(size):
+    return 'x' * size
+
+def test_byte_budget_evicts_least_recently_used_pages():
+    """Test that pages beyond the byte budget evict the least recently read page first."""
+    cache = PageCache(max_bytes=300, ttl=60, compress=False, versions=PairVersions())
+    for location in ('Toronto', 'North York', 'Etobicoke'):
+        cache.put('Plumbing', location, page(100))
+    assert cache.get('plumbing', 'TORONTO') is not None  # slug variants share an entry
+    cache.put('Plumbing', 'Scarborough', page(100))
+
+    assert cache.get('Plumbing', 'North York') is None
+    assert cache.get('Plumbing', 'Toronto') is not None
+    stats = cache.stats()
+    assert stats['bytes'] == 300
+    assert stats['evictions'] == 1
+
+    oversized = cache.put('Plumbing', 'Vaughan', page(400))
+    assert oversized.body == page(400).encode('utf-8')
+    assert cache.get('Plumbing', 'Vaughan') is None
+    assert cache.stats()['bytes'] == 300
+
+def test_gzipped_copy_counts_towards_the_budget():
+    """Test that large pages carry a gzipped copy and both are counted."""
+    cache = PageCache(max_bytes=10_000, ttl=60, compress=True, versions=PairVersions())
+    entry = cache.put('Plumbing', 'Toronto', page(2000))
+    assert gzip.decompress(entry.gzipped) == entry.body
+    assert cache.stats()['bytes'] == len(entry.body) + len(entry.gzipped)
+
+def test_write_to_the_pair_invalidates_its_page():
+    """Test that a page is dropped once its pair's version moves, and other pairs are kept."""
+    versions = PairVersions()
+    cache = PageCache(max_bytes=10_000, ttl=60, compress=False, versions=versions)
+    cache.put('Plumbing', 'Toronto', page(10))
+    cache.put('Roofing', 'Toronto', page(10))
+    versions.bump('Plumbing', 'Toronto')
+    assert cache.get('Plumbing', 'Toronto') is None
+    assert cache.get('Roofing', 'Toronto') is not None
+    assert cache.stats()['invalidations'] == 1
+
+def test_fallback_page_tracks_the_municipality():
+    """Test that a neighbourhood page showing its municipality's providers is dropped when either pair changes."""
+    versions = PairVersions()
+    cache = PageCache(max_bytes=10_000, ttl=60, compress=False, versions=versions)
+    cache.put('Plumbing', 'The Annex', page(10), fallback_location='Toronto')
+    assert cache.get('Plumbing', 'The Annex') is not None
+
+    versions.bump('Plumbing', 'Toronto')
+    assert cache.get('Plumbing', 'The Annex') is None
+
+    cache.put('Plumbing', 'The Annex', page(10), fallback_location='Toronto')
+    versions.bump('Plumbing', 'The Annex')
+    assert cache.get('Plumbing', 'The Annex') is None
+    assert cache.stats()['invalidations'] == 2
+
+def test_pages_expire_after_ttl():
+    """Test that an entry past its TTL is a miss."""
+    cache = PageCache(max_bytes=10_000, ttl=0, compress=False, versions=PairVersions())
+    cache.put('Plumbing', 'Toronto', page(10))
+    assert cache.get('Plumbing', 'Toronto') is None
+    assert cache.stats()['expirations'] == 1
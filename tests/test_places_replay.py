@@ -0,0 +1,93 @@
+"""
+Test the offline Google Places replay for Tradepro Finder Toronto.
+"""
+
+import time
+import pytest
+import requests
+import db_pool
+from enrichment import ensure_details_table
+from google_places_api import GooglePlacesAPI
+from places_replay import GOOGLE_PREFIXES, ReplayTransport, record
+
+LEGACY_SEARCH = 'https://maps.googleapis.com/maps/api/place/textsearch/json'
+V1_SEARCH = 'https://places.googleapis.com/v1/places:searchText'
+
+RECORDING = {
+    'searches': {'plumbing in toronto': {
+        'query': '', 'category': 'Plumbing', 'location': 'Toronto',
+        'pages': [
+            [{'name': 'Toronto Plumbing Experts', 'address': '1 Main St, Toronto', 'rating': 4.8,
+              'reviews': 120, 'place_id': 'p1', 'latitude': 43.65, 'longitude': -79.38}],
+            [{'name': 'Drain Doctors', 'address': '5 Queen St, Toronto', 'rating': 4.2,
+              'reviews': 30, 'place_id': 'p2'}]
+        ]
+    }},
+    'details': {'p1': {'phone': '416-555-0100', 'website': 'https://example.com'}}
+}
+
+@pytest.fixture
+def transport():
+    return ReplayTransport(RECORDING, latency_ms=0, jitter_ms=0, token_delay=0.2)
+
+@pytest.fixture
+def session(transport):
+    """A requests session whose Google calls are answered by the replay."""
+    replay_session = requests.Session()
+    for prefix in GOOGLE_PREFIXES:
+        replay_session.mount(prefix, transport)
+    return replay_session
+
+def test_legacy_pages_and_token_activation(session, transport):
+    """Test that legacy search pages chain by token, and a token is refused until it activates."""
+    first = session.get(LEGACY_SEARCH, params={'query': 'Plumbing  in TORONTO'}).json()
+    assert first['status'] == 'OK'
+    assert first['results'][0]['formatted_address'] == '1 Main St, Toronto'
+    assert first['results'][0]['geometry']['location'] == {'lat': 43.65, 'lng': -79.38}
+
+    token = first['next_page_token']
+    assert session.get(LEGACY_SEARCH, params={'pagetoken': token}).json()['status'] == 'INVALID_REQUEST'
+    time.sleep(0.25)
+    second = session.get(LEGACY_SEARCH, params={'pagetoken': token}).json()
+    assert [place['name'] for place in second['results']] == ['Drain Doctors']
+    assert 'next_page_token' not in second
+
+    assert session.get(LEGACY_SEARCH, params={'query': 'Roofing in Toronto'}).json()['status'] == 'ZERO_RESULTS'
+
+def test_v1_search_honours_field_mask(session):
+    """Test that searchText requires a field mask, returns only masked fields and fills contact details."""
+    body = {'textQuery': 'plumbing in toronto'}
+    assert session.post(V1_SEARCH, json=body).status_code == 400
+
+    mask = 'places.displayName,places.nationalPhoneNumber,nextPageToken'
+    payload = session.post(V1_SEARCH, json=body, headers={'X-Goog-FieldMask': mask}).json()
+    assert payload['places'] == [{'displayName': {'text': 'Toronto Plumbing Experts', 'languageCode': 'en'},
+                                  'nationalPhoneNumber': '416-555-0100'}]
+    # Places API (New) tokens need no activation delay
+    second = session.post(V1_SEARCH, json={'pageToken': payload['nextPageToken']},
+                          headers={'X-Goog-FieldMask': mask}).json()
+    assert second['places'][0]['displayName']['text'] == 'Drain Doctors'
+
+    details = session.get('https://places.googleapis.com/v1/places/p1',
+                          headers={'X-Goog-FieldMask': 'websiteUri'}).json()
+    assert details == {'websiteUri': 'https://example.com'}
+    assert session.get('https://places.googleapis.com/v1/places/missing').status_code == 404
+
+def test_record_exports_replayable_pages(tmp_path):
+    """Test that cached pages and details are exported, keeping only a run of pages starting at 1."""
+    db_path = str(tmp_path / 'providers.db')
+    api = GooglePlacesAPI(api_key='test', db_path=db_path)
+    api._store_in_cache('', 'Plumbing', 'Toronto', RECORDING['searches']['plumbing in toronto']['pages'][0],
+                        page=1, next_page_token='token')
+    api._store_in_cache('', 'Plumbing', 'Toronto', [{'name': 'Orphan'}], page=3)
+    api._store_in_cache('', 'Roofing', 'Toronto', [{'name': 'No First Page'}], page=2)
+    with db_pool.connection(db_path) as conn:
+        ensure_details_table(conn)
+        conn.execute("INSERT INTO place_details_cache VALUES ('p1', '416-555-0100', NULL, '2025-07-10')")
+
+    recording = record(db_path)
+    assert list(recording['searches']) == ['plumbing in toronto']
+    assert recording['searches']['plumbing in toronto']['pages'] == [
+        RECORDING['searches']['plumbing in toronto']['pages'][0]
+    ]
+    assert recording['details'] == {'p1': {'phone': '416-555-0100', 'website': ''}}
@@ -0,0 +1,47 @@
+"""
+Test materialized provider rankings for Tradepro Finder Toronto.
+"""
+
+import db_pool
+from schema import migrate
+from ranking import rank_changed_pairs, rank_pair, top_providers
+
+def add_provider(conn, name, rating, reviews, location='North York'):
+    conn.execute(
+        'INSERT INTO service_providers (name, category, location, address, rating, reviews, dedupe_key) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (name, 'Plumbing', location, f'{name} St', rating, reviews, name)
+    )
+
+def test_ranking_weighs_rating_by_review_count(tmp_path):
+    """Test that a high rating from few reviews ranks below a slightly lower one from many."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        add_provider(conn, 'Few Reviews', 5.0, 2)
+        add_provider(conn, 'Many Reviews', 4.8, 300)
+        add_provider(conn, 'Average', 4.0, 40)
+        add_provider(conn, 'Elsewhere', 5.0, 900, location='Etobicoke')
+        rank_pair(conn, 'Plumbing', 'North York')
+    with db_pool.connection(db_path) as conn:
+        names = [row['name'] for row in top_providers(conn, 'Plumbing', 'North York')]
+    assert names == ['Many Reviews', 'Few Reviews', 'Average']
+
+def test_reads_do_not_write_and_changed_pairs_are_re_ranked(tmp_path):
+    """Test that readers only read, and a refresh re-ranks pairs changed by other writers."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        add_provider(conn, 'First', 4.9, 100)
+        add_provider(conn, 'Second', 4.5, 100)
+        rank_pair(conn, 'Plumbing', 'North York')
+    with db_pool.connection(db_path) as conn:
+        conn.execute("UPDATE service_providers SET rating = 5.0, reviews = 500 WHERE name = 'Second'")
+    with db_pool.connection(db_path) as conn:
+        assert top_providers(conn, 'Plumbing', 'North York', limit=1)[0]['name'] == 'First'
+        assert top_providers(conn, 'Plumbing', 'Atlantis') == []
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM provider_ranking_versions').fetchone()[0] == 1
+    with db_pool.connection(db_path) as conn:
+        assert rank_changed_pairs(conn) == 1
+        assert top_providers(conn, 'Plumbing', 'North York', limit=1)[0]['name'] == 'Second'
@@ -0,0 +1,41 @@
+"""
+Test category and location resolution for Tradepro Finder Toronto.
+"""
+
+from taxonomy import Taxonomy
+from resolver import Resolver
+
+class FixedSnapshot:
+    """A taxonomy snapshot with fixed contents."""
+    def __init__(self, categories, locations):
+        self.taxonomy = Taxonomy(1, tuple(categories), tuple(locations), b'[]', b'[]')
+
+    def get(self):
+        return self.taxonomy
+
+def make_resolver():
+    return Resolver(FixedSnapshot(['Plumbing', 'HVAC', 'Electrical', 'Roofing'],
+                                  ['Downtown Toronto', 'North York', 'Toronto']))
+
+def test_slugs_resolve_to_stored_names():
+    """Test that slug words reach the stored spelling instead of a title-cased guess."""
+    resolver = make_resolver()
+    assert resolver.resolve_slug('top-hvac-in-north-york')[:2] == ('HVAC', 'North York')
+    assert resolver.resolve_slug('best-plumbers-in-downtown-toronto')[:2] == ('Plumbing', 'Downtown Toronto')
+    assert resolver.resolve_slug('roofing-contractors-toronto')[:2] == ('Roofing', 'Toronto')
+    assert resolver.resolve_slug('plumbing') is None
+
+def test_keyword_aliases_and_misspellings():
+    """Test that keyword CSV phrases, plurals and close misspellings map to a category."""
+    resolver = make_resolver()
+    assert resolver.resolve_category('AC repair') == 'HVAC'
+    assert resolver.resolve_category('Electricians') == 'Electrical'
+    assert resolver.resolve_category('plumbng') == 'Plumbing'
+    assert resolver.resolve_category('  Dog  Walking ') == 'Dog Walking'
+
+def test_neighbourhoods_know_their_municipality():
+    """Test that neighbourhoods from the cities CSV fall back to the municipality around them."""
+    resolver = make_resolver()
+    assert resolver.resolve('hvac', 'kleinburg') == ('HVAC', 'Kleinburg', 'Vaughan')
+    assert resolver.municipality('The Annex') == 'Toronto'
+    assert resolver.municipality('Markham') == 'Markham'
@@ -0,0 +1,83 @@
+"""
+Test provider dedupe keys and Google result upserts for Tradepro Finder Toronto.
+"""
+
+import os
+import subprocess
+import sys
+import db_pool
+from schema import MIGRATIONS, migrate, provider_key
+from search_service import SearchService
+
+class ScratchDatabase:
+    """Stands in for DatabaseManager with a connection to a scratch database."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def connection(self):
+        return db_pool.connection(self.db_path)
+
+def google_result(name, address, rating=4.5, reviews=10, phone='', place_id=None):
+    return {
+        'name': name, 'address': address, 'phone': phone, 'website': '', 'rating': rating,
+        'reviews': reviews, 'image_url': '', 'timestamp': '2025-07-10T12:00:00', 'place_id': place_id
+    }
+
+def test_provider_key_folds_case_and_whitespace():
+    """Test that names and addresses differing only in case or spacing share a key."""
+    assert provider_key(' Toronto  Plumbing ', '1 Main St') == provider_key('toronto plumbing', '1  MAIN st')
+    assert provider_key('Toronto Plumbing', '1 Main St') != provider_key('Toronto Plumbing', '2 Main St')
+    assert provider_key(None, None) == '|'
+
+def test_backfill_keys_first_of_duplicate_rows(tmp_path):
+    """Test that migrating older rows keys the first of each duplicate and leaves the rest unkeyed."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        for number, _, step in MIGRATIONS:
+            if number < 4:
+                step(conn)
+        conn.execute('PRAGMA user_version = 3')
+        conn.executemany(
+            'INSERT INTO service_providers (name, category, location, address) VALUES (?, ?, ?, ?)',
+            [('Toronto Plumbing', 'Plumbing', 'Toronto', '1 Main St'),
+             ('toronto  plumbing', 'Plumbing', 'Toronto', '1 MAIN ST'),
+             ('Roof Pros', 'Roofing', 'Toronto', '9 King St')]
+        )
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        rows = conn.execute('SELECT name, dedupe_key FROM service_providers ORDER BY id').fetchall()
+        indexes = [row[1] for row in conn.execute('PRAGMA index_list(service_providers)') if row[2]]
+    assert [tuple(row) for row in rows] == [
+        ('Toronto Plumbing', 'toronto plumbing|1 main st'),
+        ('toronto  plumbing', None),
+        ('Roof Pros', 'roof pros|9 king st')
+    ]
+    assert 'idx_service_providers_dedupe_key' in indexes
+
+def test_google_results_upsert_by_dedupe_key(tmp_path):
+    """Test that a stored business is updated in place and keeps contact details Google omitted."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+    service = SearchService.__new__(SearchService)
+    service.db_manager = ScratchDatabase(db_path)
+
+    service._store_google_results([google_result('Toronto Plumbing', '1 Main St', phone='416-555-0100')],
+                                  'Plumbing', 'Toronto')
+    service._store_google_results([google_result('TORONTO PLUMBING', '1 main st', rating=4.9, reviews=80, place_id='p1'),
+                                   google_result('Drain Doctors', '5 Queen St')], 'Plumbing', 'Toronto')
+
+    with db_pool.connection(db_path) as conn:
+        rows = conn.execute('SELECT name, rating, reviews, phone, place_id FROM service_providers ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [
+        ('Toronto Plumbing', 4.9, 80, '416-555-0100', 'p1'),
+        ('Drain Doctors', 4.5, 10, '', None)
+    ]
+
+def test_schema_imports_only_storage_modules():
+    """Test that migrating does not import the Google client and its HTTP and budget stack."""
+    check = ("import sys, schema; "
+             "print(sorted({'google_places_api', 'http_client', 'api_budget', 'requests'} & set(sys.modules)))")
+    loaded = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert loaded.stdout.strip() == '[]'
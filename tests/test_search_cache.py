@@ -0,0 +1,103 @@
+"""
+Test the /api/search result cache for Tradepro Finder Toronto.
+"""
+
+import sqlite3
+import pytest
+from flask import Flask
+import routes
+import search_cache
+
+@pytest.fixture
+def cache_db(tmp_path, monkeypatch):
+    """Point the search cache and its writer at a scratch database."""
+    db_path = str(tmp_path / 'search_cache.db')
+    monkeypatch.setattr(search_cache, 'SEARCH_CACHE_DB', db_path)
+    writer = search_cache.WriteBehindQueue(db_path, search_cache.search_cache_writer.statement,
+                                           encode=search_cache._encode_row)
+    monkeypatch.setattr(search_cache, 'search_cache_writer', writer)
+    conn = sqlite3.connect(db_path)
+    search_cache.ensure_table(conn)
+    conn.close()
+    return db_path
+
+def test_older_table_is_rebuilt_with_query_column(tmp_path):
+    """Test that a table keyed by (service, location) gains the query column."""
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.execute('CREATE TABLE search_cache (id INTEGER PRIMARY KEY, service TEXT, location TEXT, '
+                 'results TEXT, timestamp TEXT, UNIQUE(service, location))')
+    search_cache.ensure_table(conn)
+    assert 'query' in [row[1] for row in conn.execute('PRAGMA table_info(search_cache)')]
+    conn.close()
+
+def test_lookup_returns_stored_results_for_equivalent_searches(cache_db):
+    """Test that stored results are found by a case and spacing variant but not by another query."""
+    search_cache.store('Plumbing', 'North York', '', {'providers': [{'name': 'A'}]})
+    search_cache.search_cache_writer.drain()
+    results, age = search_cache.lookup('plumbing', ' north-york ')
+    assert results == {'providers': [{'name': 'A'}]}
+    assert age < 5
+    assert search_cache.lookup('Plumbing', 'North York', 'emergency') is None
+    assert search_cache.lookup('Plumbing', 'North York', max_age=0) is None
+
+class StubSearchService:
+    """Answers /api/search with fixed providers and counts the calls."""
+    def __init__(self, providers):
+        self.providers = providers
+        self.calls = 0
+
+    def search_service_providers(self, category, location, query='', page=1):
+        self.calls += 1
+        return [dict(provider) for provider in self.providers]
+
+    def has_more(self, category, location, query='', page=1):
+        return False
+
+@pytest.fixture
+def search_app(cache_db, monkeypatch):
+    """A Flask app serving the routes with a stub search service and the scratch search cache."""
+    monkeypatch.setattr(routes.resolver, 'resolve_category', lambda text: text)
+    monkeypatch.setattr(routes.resolver, 'resolve_location', lambda text: text)
+    app = Flask(__name__)
+    app.register_blueprint(routes.main)
+    app.search_service = StubSearchService([{'name': 'Toronto Plumbing Experts', 'rating': 4.8}])
+    return app
+
+SEARCH = '/api/search?category=Plumbing&location=Toronto'
+
+def test_search_answers_with_etag_and_304_for_a_matching_copy(search_app):
+    """Test that a search is cached with an ETag, and a repeat with If-None-Match gets a 304 from the cache."""
+    client = search_app.test_client()
+    response = client.get(SEARCH)
+    assert response.status_code == 200
+    assert response.get_json()['providers'][0]['name'] == 'Toronto Plumbing Experts'
+    assert f'max-age={search_cache.SEARCH_MAX_AGE}' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+
+    search_cache.search_cache_writer.drain()
+    repeat = client.get(SEARCH, headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+    assert client.get(SEARCH, headers={'If-None-Match': '"other"'}).status_code == 200
+    assert search_app.search_service.calls == 1
+
+def test_empty_search_is_not_cached(search_app):
+    """Test that an empty answer is sent with max-age=0 and not written to the search cache."""
+    search_app.search_service.providers = []
+    response = search_app.test_client().get(SEARCH)
+    assert response.status_code == 200
+    assert 'max-age=0' in response.headers['Cache-Control']
+    search_cache.search_cache_writer.drain()
+    assert search_cache.lookup('Plumbing', 'Toronto') is None
+    assert search_cache.search_cache_writer.stats()['queued'] == 0
+
+def test_unreadable_cache_row_is_a_miss(search_app, cache_db):
+    """Test that a row with a bad timestamp or encoding falls through to the search service."""
+    conn = sqlite3.connect(cache_db)
+    conn.execute('INSERT INTO search_cache (service, location, query, results, timestamp) VALUES (?, ?, ?, ?, ?)',
+                 (*search_cache.cache_key('Plumbing', 'Toronto', ''), b'\x1f', 'yesterday'))
+    conn.commit()
+    conn.close()
+    assert search_cache.lookup('Plumbing', 'Toronto') is None
+    assert search_app.test_client().get(SEARCH).status_code == 200
+    assert search_app.search_service.calls == 1
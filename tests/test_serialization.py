@@ -0,0 +1,88 @@
+"""
+Test cache value serialization for Tradepro Finder Toronto.
+"""
+
+import importlib
+import json
+import sys
+import pytest
+import db_pool
+import serialization
+
+VALUE = [{'name': 'Toronto Plumbing Experts', 'rating': 4.8, 'reviews': 120, 'phone': '',
+          'address': '1 Main St, Toronto — Unit 5'}] * 20
+
+def round_trip(fmt):
+    data = serialization.dumps(VALUE, fmt)
+    assert serialization.format_name(data) == fmt
+    assert serialization.loads(data) == VALUE
+    return data
+
+def test_values_start_with_their_format_byte():
+    """Test that dumps prefixes the format byte, and unknown bytes are refused."""
+    assert serialization.dumps(VALUE, 'json')[0] == 1
+    assert serialization.dumps(VALUE, 'json+zlib')[0] == 2
+    with pytest.raises(ValueError):
+        serialization.loads(b'\x1f{}')
+    with pytest.raises(ValueError):
+        serialization.register(ord('{'), 'braces', json.dumps, json.loads)
+
+def test_legacy_json_rows_still_decode():
+    """Test that JSON written before format bytes reads back as text or as a blob."""
+    legacy = json.dumps(VALUE)
+    assert serialization.loads(legacy) == VALUE
+    assert serialization.loads(legacy.encode('utf-8')) == VALUE
+    assert serialization.format_name(legacy) == 'legacy-json'
+
+def test_json_and_zlib_round_trip_and_compress():
+    """Test that the always-available formats round trip and zlib shrinks repetitive pages."""
+    assert len(round_trip('json+zlib')) < len(round_trip('json'))
+
+def test_msgpack_round_trips():
+    """Test msgpack with and without compression, when msgpack is installed."""
+    pytest.importorskip('msgpack')
+    assert len(round_trip('msgpack')) < len(serialization.dumps(VALUE, 'json'))
+    round_trip('msgpack+zlib')
+
+def test_zstd_round_trips():
+    """Test zstd-compressed JSON (and msgpack, if installed), when zstandard is installed."""
+    pytest.importorskip('zstandard')
+    round_trip('json+zstd')
+    if 'msgpack' in serialization.available_formats():
+        round_trip('msgpack+zstd')
+
+def test_missing_libraries_fall_back_to_json_zlib(monkeypatch):
+    """Test that without msgpack and zstandard their formats are not offered and the default falls back."""
+    try:
+        with monkeypatch.context() as patch:
+            patch.setitem(sys.modules, 'msgpack', None)
+            patch.setitem(sys.modules, 'zstandard', None)
+            patch.setenv('CACHE_SERIALIZER', 'msgpack+zstd')
+            importlib.reload(serialization)
+
+            assert serialization.available_formats() == ['json', 'json+zlib']
+            assert serialization.DEFAULT_FORMAT == 'json+zlib'
+            assert serialization.dumps(VALUE)[0] == 2
+            assert serialization.dumps(VALUE, 'msgpack')[0] == 2
+    finally:
+        importlib.reload(serialization)
+
+def test_migrate_rewrites_rows_in_the_target_format(tmp_path, monkeypatch):
+    """Test that migrate re-encodes legacy and other-format rows and leaves undecodable ones alone."""
+    db_path = str(tmp_path / 'cache.db')
+    with db_pool.connection(db_path) as conn:
+        conn.execute('CREATE TABLE cached_results (results BLOB)')
+        conn.executemany('INSERT INTO cached_results (results) VALUES (?)', [
+            (json.dumps(VALUE),), (serialization.dumps(VALUE, 'json'),),
+            (serialization.dumps(VALUE, 'json+zlib'),), (b'\x1fbroken',), (None,)
+        ])
+    monkeypatch.setattr(serialization, 'CACHE_COLUMNS', [
+        (db_path, 'cached_results', 'results'), (str(tmp_path / 'missing.db'), 'search_cache', 'results')
+    ])
+
+    assert serialization.migrate('json+zlib') == {'cached_results': 2, 'search_cache': 0}
+    with db_pool.connection(db_path) as conn:
+        stored = [row[0] for row in conn.execute('SELECT results FROM cached_results ORDER BY rowid')]
+    assert [serialization.format_name(value) for value in stored[:3]] == ['json+zlib'] * 3
+    assert all(serialization.loads(value) == VALUE for value in stored[:3])
+    assert stored[3:] == [b'\x1fbroken', None]
@@ -0,0 +1,54 @@
+"""
+Test single-flight coalescing of Google lookups for Tradepro Finder Toronto.
+"""
+
+import sqlite3
+import pytest
+import db_pool
+from schema import migrate
+from google_places_api import GooglePlacesAPI
+from enrichment import PlaceEnricher
+from search_service import SearchService
+from single_flight import SingleFlight
+
+PLACES = [{'name': 'Toronto Plumbing', 'address': '1 King St, Toronto', 'rating': 4.5, 'reviews': 10,
+           'place_id': 'p1'}]
+
+@pytest.fixture
+def service(tmp_path):
+    """A search service on a scratch database, counting every lease row written."""
+    db_path = str(tmp_path / 'providers.db')
+    with db_pool.connection(db_path) as conn:
+        migrate(conn)
+        conn.execute('CREATE TABLE lease_writes (lease_key TEXT)')
+        conn.execute('CREATE TRIGGER count_lease_writes AFTER INSERT ON search_leases '
+                     'BEGIN INSERT INTO lease_writes VALUES (NEW.lease_key); END')
+    service = SearchService.__new__(SearchService)
+    service.google_places = GooglePlacesAPI(api_key='test', db_path=db_path, stale_while_revalidate=False)
+    service.google_places._call_places_api = lambda *args, **kwargs: ([], None)
+    service.single_flight = SingleFlight(db_path=db_path)
+    service.enricher = PlaceEnricher(service.google_places, db_path=db_path, mode='off')
+    return service
+
+def lease_writes(service):
+    conn = sqlite3.connect(service.google_places.db_path)
+    count = conn.execute('SELECT COUNT(*) FROM lease_writes').fetchone()[0]
+    conn.close()
+    return count
+
+def test_cache_hit_takes_no_lease(service):
+    """Test that a cached page, first or later, is served without writing a lease row."""
+    for page in (1, 2):
+        service.google_places._store_in_cache('', 'Plumbing', 'Toronto', PLACES, page)
+        results, from_cache = service._fetch_google_page('Plumbing', 'Toronto', '', page)
+        assert from_cache
+        assert [result['name'] for result in results] == ['Toronto Plumbing']
+    assert lease_writes(service) == 0
+    assert service.single_flight.leaders == 0
+
+def test_cache_miss_goes_through_the_lease(service):
+    """Test that a miss is still coalesced under the cross-worker lease."""
+    results, from_cache = service._fetch_google_page('Roofing', 'Toronto', '')
+    assert results == [] and not from_cache
+    assert lease_writes(service) == 1
+    assert service.single_flight.leaders == 1
@@ -0,0 +1,79 @@
+"""
+Test search-as-you-type suggestions for Tradepro Finder Toronto.
+"""
+
+import pytest
+from flask import Flask
+import db_pool
+import routes
+from schema import migrate
+from taxonomy import TaxonomySnapshot
+from resolver import Resolver
+from suggest import SuggestIndex
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'providers.db')
+    with db_pool.connection(path) as conn:
+        migrate(conn)
+        for name, category, location in [
+            ('North York Plumbing Pros', 'Plumbing', 'North York'),
+            ('Yorkdale Electric', 'Electrical', 'North York'),
+        ]:
+            add_provider(conn, name, category, location)
+    return path
+
+def add_provider(conn, name, category, location):
+    conn.execute('INSERT INTO service_providers (name, category, location, dedupe_key) VALUES (?, ?, ?, ?)',
+                 (name, category, location, name))
+
+def make_index(db_path, refresh_interval=60):
+    snapshot = TaxonomySnapshot(db_path, check_interval=0)
+    return SuggestIndex(snapshot=snapshot, resolver=Resolver(snapshot), refresh_interval=refresh_interval)
+
+def texts(completions):
+    return [completion.text for completion in completions]
+
+def test_categories_rank_before_phrases_and_whole_names_before_words(db_path):
+    """Test that a category beats the keyword phrases resolving to it, and phrases match from any word."""
+    completions = make_index(db_path).suggest('plumb', limit=20)
+    assert completions[0] == ('Plumbing', 'category', 'Plumbing')
+    assert completions[1].text == 'Plumbers'  # a phrase starting with the prefix
+    assert 'emergency plumbers' in texts(completions[2:])
+    assert {completion.value for completion in completions} == {'Plumbing'}
+
+def test_word_starts_and_kind_filter(db_path):
+    """Test that later words complete, mid-word text does not, and the kind filter applies."""
+    index = make_index(db_path)
+    assert texts(index.suggest('york', kind='location')) == ['Yorkville', 'North York']
+    assert index.suggest('ork') == []
+    assert index.suggest('york', kind='category') == []
+    assert index.suggest('emergency plu', kind='category')[0].value == 'Plumbing'
+    assert index.suggest('   ') == []
+    assert 'Yorkdale Electric' not in texts(index.suggest('yorkd', limit=20))
+
+def test_index_is_rebuilt_when_the_taxonomy_changes(db_path):
+    """Test that new provider data rebuilds the index, at most once per refresh interval."""
+    throttled, index = make_index(db_path), make_index(db_path, refresh_interval=0)
+    assert index.suggest('zamboni') == [] and throttled.suggest('zamboni') == []
+    with db_pool.connection(db_path) as conn:
+        add_provider(conn, 'Rink Services', 'Zamboni Repair', 'Scarborough')
+
+    assert texts(index.suggest('zamboni')) == ['Zamboni Repair']
+    assert index.stats()['rebuilds'] == 2
+    assert throttled.suggest('zamboni') == []
+    assert throttled.stats()['rebuilds'] == 1
+
+def test_suggest_route_rejects_bad_parameters(db_path, monkeypatch):
+    """Test that /api/suggest answers 400 for an unknown kind or limit, and completes otherwise."""
+    monkeypatch.setattr(routes, 'suggestions', make_index(db_path))
+    app = Flask(__name__)
+    app.register_blueprint(routes.main)
+    client = app.test_client()
+
+    assert client.get('/api/suggest?q=york&kind=provider').status_code == 400
+    assert client.get('/api/suggest?q=york&kind=everything').status_code == 400
+    assert client.get('/api/suggest?q=york&limit=many').status_code == 400
+    response = client.get('/api/suggest?q=york&kind=location&limit=1')
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == [{'text': 'Yorkville', 'kind': 'location', 'value': 'Yorkville'}]
@@ -0,0 +1,66 @@
+"""
+Test the in-memory taxonomy snapshot for Tradepro Finder Toronto.
+"""
+
+import json
+import pytest
+import db_pool
+from schema import migrate
+from taxonomy import Taxonomy, TaxonomySnapshot
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'providers.db')
+    with db_pool.connection(path) as conn:
+        migrate(conn)
+        add_provider(conn, 'Toronto Plumbing', 'Plumbing', 'Toronto')
+    return path
+
+def add_provider(conn, name, category, location):
+    conn.execute('INSERT INTO service_providers (name, category, location, dedupe_key) VALUES (?, ?, ?, ?)',
+                 (name, category, location, name))
+
+def test_snapshot_is_reused_while_data_version_is_unchanged(db_path):
+    """Test that repeated reads share one snapshot until service_providers is written."""
+    taxonomy = TaxonomySnapshot(db_path=db_path, check_interval=0)
+    first = taxonomy.get()
+    assert first.categories == ('Plumbing',)
+    assert json.loads(first.locations_json) == ['Toronto']
+    assert taxonomy.get() is first
+    assert taxonomy.rebuilds == 1
+
+def test_insert_and_update_rebuild_snapshot_and_bump_pairs(db_path):
+    """Test that the triggers move the version on insert and update, and the pair counters follow."""
+    taxonomy = TaxonomySnapshot(db_path=db_path, check_interval=0)
+    taxonomy.get()
+    toronto = taxonomy.pair_version('plumbing', ' TORONTO')
+
+    with db_pool.connection(db_path) as conn:
+        add_provider(conn, 'Roof Pros', 'Roofing', 'Etobicoke')
+    assert taxonomy.get().categories == ('Plumbing', 'Roofing')
+    assert taxonomy.pair_version('Roofing', 'Etobicoke') == 1
+    assert taxonomy.pair_version('Plumbing', 'Toronto') == toronto
+
+    with db_pool.connection(db_path) as conn:
+        conn.execute("UPDATE service_providers SET location = 'North York' WHERE name = 'Toronto Plumbing'")
+    snapshot = taxonomy.get()
+    assert snapshot.locations == ('Etobicoke', 'North York')
+    assert taxonomy.pair_version('Plumbing', 'Toronto') == toronto + 1
+    assert taxonomy.pair_version('Plumbing', 'North York') == 1
+    assert taxonomy.rebuilds == 3
+
+def test_writes_are_seen_after_the_check_interval_or_invalidate(db_path):
+    """Test that the version is probed at most once per interval, unless this process invalidates."""
+    taxonomy = TaxonomySnapshot(db_path=db_path, check_interval=60)
+    first = taxonomy.get()
+    with db_pool.connection(db_path) as conn:
+        add_provider(conn, 'Roof Pros', 'Roofing', 'Etobicoke')
+    assert taxonomy.get() is first
+    taxonomy.invalidate()
+    assert taxonomy.get().categories == ('Plumbing', 'Roofing')
+
+def test_pair_versions_are_read_only():
+    """Test that snapshots do not share a mutable default for their pair versions."""
+    snapshot = Taxonomy(None, (), (), b'[]', b'[]')
+    with pytest.raises(TypeError):
+        snapshot.pair_versions[('plumbing', 'toronto')] = 1
@@ -0,0 +1,75 @@
+"""
+Test the write-behind queue for Tradepro Finder Toronto.
+"""
+
+import time
+import db_pool
+from write_behind import WriteBehindQueue
+
+def make_queue(db_path, **kwargs):
+    """Create a queue writing (name, value) rows to a fresh table."""
+    with db_pool.connection(db_path) as conn:
+        conn.execute('CREATE TABLE items (name TEXT PRIMARY KEY, value TEXT)')
+    return WriteBehindQueue(db_path, 'INSERT OR REPLACE INTO items (name, value) VALUES (?, ?)', **kwargs)
+
+def read_items(db_path):
+    with db_pool.connection(db_path) as conn:
+        return dict(conn.execute('SELECT name, value FROM items').fetchall())
+
+def test_drain_writes_queued_rows_in_one_batch(tmp_path):
+    """Test that rows are coalesced by key and written together on drain."""
+    db_path = str(tmp_path / 'queue.db')
+    queue = make_queue(db_path, flush_interval_ms=60000)
+    assert queue.put('a', ('a', '1'))
+    assert queue.put('b', ('b', '2'))
+    assert queue.put('a', ('a', '3'))
+    queue.drain()
+    assert read_items(db_path) == {'a': '3', 'b': '2'}
+    stats = queue.stats()
+    assert stats['written'] == 2
+    assert stats['coalesced'] == 1
+    assert stats['batches'] == 1
+
+def test_full_batch_flushes_early(tmp_path):
+    """Test that a full batch is written without waiting for the interval."""
+    db_path = str(tmp_path / 'queue.db')
+    queue = make_queue(db_path, flush_interval_ms=60000, batch_size=3)
+    for name in 'abc':
+        queue.put(name, (name, name))
+    deadline = time.monotonic() + 2
+    while queue.stats()['written'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(read_items(db_path)) == 3
+    queue.drain()
+
+def test_full_queue_drops_rows(tmp_path):
+    """Test that back-pressure drops rows once the queue stays full."""
+    db_path = str(tmp_path / 'queue.db')
+    queue = make_queue(db_path, flush_interval_ms=60000, max_pending=2, put_timeout=0.01)
+    assert queue.put('a', ('a', '1'))
+    assert queue.put('b', ('b', '2'))
+    assert not queue.put('c', ('c', '3'))
+    queue.drain()
+    assert queue.stats()['dropped'] == 1
+    assert read_items(db_path) == {'a': '1', 'b': '2'}
+
+def test_flush_waits_for_the_batch_the_writer_took(tmp_path):
+    """Test that flush() returns only after a batch already taken by the writer is written."""
+    db_path = str(tmp_path / 'queue.db')
+    with db_pool.connection(db_path) as conn:
+        conn.execute('CREATE TABLE items (name TEXT PRIMARY KEY, value TEXT)')
+
+    def slow_write(conn, rows):
+        time.sleep(0.2)
+        conn.executemany('INSERT OR REPLACE INTO items (name, value) VALUES (?, ?)', rows)
+
+    written = []
+    queue = WriteBehindQueue(db_path, slow_write, on_written=written.extend, flush_interval_ms=1, batch_size=1)
+    queue.put('a', ('a', '1'))
+    while queue.stats()['pending']:
+        time.sleep(0.001)
+    queue.put('b', ('b', '2'))
+    queue.flush()
+    assert read_items(db_path) == {'a': '1', 'b': '2'}
+    assert sorted(written) == [('a', '1'), ('b', '2')]
+    queue.drain()
@@ -0,0 +1,251 @@
+"""
+Write-behind queue for cache writes in Tradepro Finder Toronto.
+
+/api/search used to encode its results, write them to data/search_cache.db
+and wait for the commit before answering, so every search paid for an fsync
+and concurrent searches queued on SQLite's write lock. Writes now go through
+a queue instead:
+
+1. put() only records the row and returns; rows for the same key replace each
+   other while they wait, so a hot search is written once per flush
+2. A writer thread per process encodes the rows and flushes them in one
+   transaction every flush interval, or sooner once a batch fills up
+3. Back-pressure: when max_pending rows are waiting, put() blocks for at most
+   put_timeout seconds and then drops the row (it is only a cache)
+4. drain() flushes what is left and stops the writer; create_app registers it
+   to run at exit and gunicorn.conf.py calls it when a worker exits
+
+The /api/search queue itself lives in search_cache.py; api_monitor.py queues
+its API call log the same way, with a write function that also maintains the
+rollup tables in the same transaction.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Union
+import db_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Defaults only; each queue's owner reads its own settings and passes them in
+FLUSH_INTERVAL_MS = 250
+BATCH_SIZE = 50
+MAX_PENDING = 1000
+PUT_TIMEOUT = 0.1
+
+
+class WriteBehindQueue:
+    """Batches row writes for one statement onto a background writer thread."""
+
+    def __init__(self, db_path: str, statement: Union[str, Callable[[Any, List[Sequence]], None]],
+                 encode: Optional[Callable[[Sequence], Sequence]] = None,
+                 on_written: Optional[Callable[[List[Sequence]], None]] = None,
+                 flush_interval_ms: float = FLUSH_INTERVAL_MS, batch_size: int = BATCH_SIZE,
+                 max_pending: int = MAX_PENDING, put_timeout: float = PUT_TIMEOUT):
+        """Initialize the queue.
+
+        Args:
+            db_path: Database the rows are written to
+            statement: SQL run with executemany for each batch, or a function called
+                with (connection, rows) that writes the batch itself
+            encode: Turns a queued row into statement parameters (runs on the writer thread)
+            on_written: Called with each batch's rows once its transaction has ended, even if it failed
+            flush_interval_ms: Longest time a row waits before being written
+            batch_size: Rows that trigger an early flush
+            max_pending: Rows allowed to wait before put() applies back-pressure
+            put_timeout: Seconds put() blocks on a full queue before dropping the row
+        """
+        self.db_path = db_path
+        self.statement = statement
+        self.encode = encode
+        self.on_written = on_written
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+
+        self._pending: "OrderedDict[Hashable, Sequence]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = False
+        # Batches taken by the writer thread, and how many of them have been written
+        self._taken = 0
+        self._done = 0
+
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    def _ensure_writer(self) -> None:
+        """Start the writer thread for this process (call with _cond held)."""
+        if self._pid != os.getpid():
+            # A forked worker inherits neither the thread nor the parent's pending rows
+            self._pending.clear()
+            self._thread = None
+            self._stopping = False
+            self._taken = self._done = 0
+            self._pid = os.getpid()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def put(self, key: Hashable, row: Sequence) -> bool:
+        """Queue a row; a queued row with the same key is replaced.
+
+        Args:
+            key: Identity of the row (e.g. the cache table's unique columns)
+            row: Row to write (passed through encode, if given)
+
+        Returns:
+            False if the row was dropped because the queue stayed full or is draining
+        """
+        with self._cond:
+            if self._stopping and self._pid == os.getpid():
+                self.dropped += 1
+                return False
+            self._ensure_writer()
+            if key in self._pending:
+                self._pending[key] = row
+                self.coalesced += 1
+                return True
+            deadline = time.monotonic() + self.put_timeout
+            while len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.dropped += 1
+                    logger.warning(f"Write-behind queue for {self.db_path} is full; dropping a row")
+                    return False
+                self._cond.wait(remaining)
+            self._pending[key] = row
+            self.queued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _take_batch(self) -> Dict[Hashable, Sequence]:
+        """Wait for rows to flush and remove them from the queue (call with _cond held)."""
+        deadline = None
+        while not self._stopping:
+            if self._pending and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(self._pending) >= self.batch_size:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self._cond.wait(None if deadline is None else deadline - time.monotonic())
+        batch = self._pending
+        self._pending = OrderedDict()
+        if batch:
+            self._taken += 1
+        # Wake producers waiting for room
+        self._cond.notify_all()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+                stopping = self._stopping
+            if batch:
+                self._flush(list(batch.values()))
+                with self._cond:
+                    self._done += 1
+                    self._cond.notify_all()
+            if stopping:
+                with self._cond:
+                    if not self._pending:
+                        return
+
+    def _flush(self, rows) -> None:
+        """Write rows in one transaction (on the writer thread, or the caller of flush or drain)."""
+        started = time.perf_counter()
+        written = False
+        try:
+            params = [self.encode(row) for row in rows] if self.encode else rows
+            with db_pool.connection(self.db_path) as conn:
+                if callable(self.statement):
+                    self.statement(conn, params)
+                else:
+                    conn.executemany(self.statement, params)
+            written = True
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} queued rows to {self.db_path}: {str(e)}")
+        finally:
+            if self.on_written:
+                self.on_written(rows)
+        with self._cond:
+            if written:
+                self.written += len(rows)
+                self.batches += 1
+            else:
+                self.failures += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Write everything queued so far; the writer keeps running.
+
+        Rows still waiting are written on the calling thread; a batch the writer
+        thread has already taken is waited for, so once this returns every row
+        put before the call has been written (or has failed).
+
+        Args:
+            timeout: Seconds to wait for the writer thread's batch in progress
+        """
+        with self._cond:
+            rows = list(self._pending.values())
+            self._pending.clear()
+            taken = self._taken
+            self._cond.notify_all()
+        if rows:
+            self._flush(rows)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._done < taken and self._pid == os.getpid():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def drain(self, timeout: float = 5.0) -> None:
+        """Write everything still queued and stop the writer (safe to call more than once).
+
+        Args:
+            timeout: Seconds to wait for the writer to finish
+        """
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            leftover = list(self._pending.values())
+            self._pending.clear()
+        if leftover:
+            self._flush(leftover)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and write counters."""
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "queued": self.queued,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "written": self.written,
+                "batches": self.batches,
+                "failures": self.failures,
+                "last_flush_ms": round(self.last_flush_ms, 2)
+            }
+